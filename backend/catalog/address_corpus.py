@@ -0,0 +1,93 @@
+"""
+Генератор корпуса адресов для замеров сопоставления тарифов.
+
+Адреса строятся из населенных пунктов справочника так, как их пишут
+покупатели: «с.»/«д.», район и республика, «ё», скобки, регистр, опечатки.
+Плюс адреса за пределами справочника, где тарифа быть не должно. Корпус
+детерминирован (seed), поэтому прогоны можно сравнивать между собой.
+"""
+from __future__ import annotations
+
+import random
+from typing import NamedTuple
+
+from .delivery_tariffs import Tariff
+
+STREETS = (
+    'ул. Ленина', 'ул. Мира', 'Советская улица', 'ул. Центральная', 'Молодежная ул.',
+    'ул. Школьная', 'Садовая', 'ул. Салавата Юлаева', 'Трактовая улица', 'пер. Ключевой',
+)
+DISTRICTS = (
+    'Альшеевский', 'Давлекановский', 'Белебеевский', 'Чишминский', 'Буздякский', 'Кармаскалинский',
+)
+PREFIXES = ('с.', 'д.', 'село', 'деревня', 'пос.', 'п.', '')
+# Куда доставка по прайсу не считается.
+OUTSIDE = (
+    'Москва, Тверская улица', 'Санкт-Петербург, Невский проспект', 'Екатеринбург, ул. Малышева',
+    'Самара, ул. Куйбышева', 'Оренбург, ул. Советская', 'Пермь, Комсомольский проспект',
+)
+
+KINDS = ('csv', 'prefix', 'region', 'yo', 'brackets', 'case', 'typo', 'outside')
+
+
+class CorpusAddress(NamedTuple):
+    address: str
+    expected: str | None
+    kind: str
+
+
+def _house(rnd: random.Random) -> str:
+    number = rnd.randint(1, 120)
+    return f'{number}{rnd.choice(("", "", "", "А", "/2"))}'
+
+
+def _typo(rnd: random.Random, word: str) -> str:
+    if len(word) < 4:
+        return word
+    position = rnd.randrange(1, len(word) - 1)
+    operation = rnd.choice(('drop', 'swap', 'double'))
+    if operation == 'drop':
+        return word[:position] + word[position + 1:]
+    if operation == 'swap':
+        return word[:position] + word[position + 1] + word[position] + word[position + 2:]
+    return word[:position] + word[position] + word[position:]
+
+
+def _with_yo(word: str) -> str:
+    if 'ё' in word:
+        return word.replace('ё', 'е')
+    index = word.find('е')
+    return word if index < 0 else word[:index] + 'ё' + word[index + 1:]
+
+
+def generate_address_corpus(tariffs: list[Tariff], size: int = 5000, seed: int = 42) -> list[CorpusAddress]:
+    """`size` адресов: сначала все пункты справочника как есть, затем вариации."""
+    rnd = random.Random(seed)
+    corpus = [CorpusAddress(label, label, 'csv') for _aliases, _cost, label in tariffs]
+    if not tariffs:
+        return corpus[:size]
+
+    generated_kinds = KINDS[1:]
+    while len(corpus) < size:
+        kind = generated_kinds[len(corpus) % len(generated_kinds)]
+        _aliases, _cost, label = rnd.choice(tariffs)
+        street = f'{rnd.choice(STREETS)}, {_house(rnd)}'
+        district = rnd.choice(DISTRICTS)
+
+        if kind == 'prefix':
+            address = f'{rnd.choice(PREFIXES)} {label}, {street}'.strip()
+        elif kind == 'region':
+            address = f'Республика Башкортостан, {district} район, с. {label}, {street}'
+        elif kind == 'yo':
+            address = f'{_with_yo(label)}, {street}'
+        elif kind == 'brackets':
+            address = f'{label} ({district} р-н), {street} (домофон не работает)'
+        elif kind == 'case':
+            address = rnd.choice((str.upper, str.lower))(f'{label} {street}')
+        elif kind == 'typo':
+            address = f'с. {_typo(rnd, label)}, {street}'
+        else:
+            corpus.append(CorpusAddress(f'{rnd.choice(OUTSIDE)}, {_house(rnd)}', None, kind))
+            continue
+        corpus.append(CorpusAddress(address, label, kind))
+    return corpus
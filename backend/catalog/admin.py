@@ -6,8 +6,10 @@ from django.utils.html import format_html
 from telegram_bot.sender import send_message
 from .models import (
     Category, Product, ProductImage, Review, Order, OrderItem, BotAdmin,
-    SiteSettings, HeroSection, PromoBanner, DeliveryInfo, TransferPaymentTemplate
+    SiteSettings, HeroSection, PromoBanner, DeliveryInfo, TransferPaymentTemplate, ImageJob,
+    DeliveryTariff, GeocodeCacheEntry, CustomerProfile, DailySalesSummary, OrderArchive,
 )
+from .sales_summary import sales_report
 
 
 class ProductImageInline(admin.TabularInline):
@@ -158,6 +160,21 @@ class OrderAdmin(admin.ModelAdmin):
         return redirect(f'../../{order.id}/change/')
 
 
+@admin.register(OrderArchive)
+class OrderArchiveAdmin(admin.ModelAdmin):
+    list_display = ['id', 'customer_name', 'phone', 'status', 'total_price', 'created_at', 'archived_at']
+    list_filter = ['status', 'payment_status']
+    search_fields = ['id', 'customer_name', 'phone', 'phone_normalized', 'telegram_user_id', 'telegram_username']
+    date_hierarchy = 'created_at'
+
+    # Архив только для просмотра: заказы попадают сюда через manage.py archive_orders.
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(BotAdmin)
 class BotAdminAdmin(admin.ModelAdmin):
     list_display = ['username', 'telegram_user_id', 'is_active', 'note', 'created_at']
@@ -185,6 +202,101 @@ class TransferPaymentTemplateAdmin(admin.ModelAdmin):
 admin.site.register(ProductImage)
 
 
+@admin.register(DeliveryTariff)
+class DeliveryTariffAdmin(admin.ModelAdmin):
+    list_display = ['label', 'cost', 'priority', 'is_active', 'short_aliases', 'updated_at']
+    list_display_links = ['label']
+    list_filter = ['is_active']
+    search_fields = ['label', 'aliases']
+    list_editable = ['cost', 'priority', 'is_active']
+
+    def short_aliases(self, obj):
+        return ', '.join(obj.alias_tuple()[:5])
+
+    short_aliases.short_description = 'Алиасы'
+
+
+@admin.register(GeocodeCacheEntry)
+class GeocodeCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ['query', 'kind', 'is_empty', 'hits', 'last_hit_at', 'expires_at']
+    list_filter = ['kind', 'is_empty']
+    search_fields = ['query']
+    readonly_fields = ['key_hash', 'kind', 'query', 'response', 'is_empty', 'hits', 'created_at', 'last_hit_at', 'expires_at']
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(CustomerProfile)
+class CustomerProfileAdmin(admin.ModelAdmin):
+    list_display = ['key', 'kind', 'order_count', 'completed_count', 'lifetime_spend', 'last_order_id', 'updated_at']
+    list_filter = ['kind']
+    search_fields = ['key', 'phone_normalized']
+    readonly_fields = [
+        'kind', 'key', 'order_count', 'completed_count', 'lifetime_spend',
+        'last_order_id', 'phone_normalized', 'updated_at',
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(DailySalesSummary)
+class DailySalesSummaryAdmin(admin.ModelAdmin):
+    list_display = [
+        'date', 'orders_count', 'completed_count', 'cancelled_count', 'expired_count',
+        'revenue', 'average_check_display', 'delivery_revenue',
+    ]
+    date_hierarchy = 'date'
+    readonly_fields = [
+        'date', 'orders_count', 'new_count', 'processing_count', 'ready_count', 'completed_count',
+        'cancelled_count', 'expired_count', 'revenue', 'delivery_revenue', 'updated_at',
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        report = sales_report(30)
+        top = ', '.join(f"{item['product_name']} ({item['quantity']})" for item in report['top_products'])
+        self.message_user(
+            request,
+            f"За 30 дней: заказов {report['orders_count']}, завершено {report['completed_count']} "
+            f"({report['conversion']:.0%}), выручка {report['revenue']} ₽, "
+            f"средний чек {report['average_check']:.2f} ₽. Топ: {top or '—'}",
+            level=messages.INFO,
+        )
+        return super().changelist_view(request, extra_context)
+
+    def average_check_display(self, obj):
+        return f"{obj.average_check:.2f}"
+
+    average_check_display.short_description = 'Средний чек'
+
+
+@admin.register(ImageJob)
+class ImageJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'model_label', 'object_id', 'field_name', 'source_name', 'status', 'attempts', 'updated_at']
+    list_filter = ['status', 'model_label']
+    search_fields = ['source_name']
+    readonly_fields = [
+        'model_label', 'object_id', 'field_name', 'source_name', 'status',
+        'attempts', 'error', 'locked_at', 'created_at', 'updated_at',
+    ]
+    actions = ['requeue_jobs']
+
+    def has_add_permission(self, request):
+        return False
+
+    def requeue_jobs(self, request, queryset):
+        updated = queryset.exclude(status=ImageJob.STATUS_PROCESSING).update(
+            status=ImageJob.STATUS_PENDING, attempts=0, error='', locked_at=None,
+        )
+        self.message_user(request, f"Возвращено в очередь: {updated}.", level=messages.SUCCESS)
+
+    requeue_jobs.short_description = 'Повторить обработку'
+
+
 @admin.register(SiteSettings)
 class SiteSettingsAdmin(admin.ModelAdmin):
     list_display = ['site_name', 'phone', 'promo_enabled', 'promo_discount_percent']
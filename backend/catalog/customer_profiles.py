@@ -0,0 +1,160 @@
+"""
+Сводки по клиентам: заказов, завершенных, сумма завершенных, последний заказ.
+
+Сводка ведется на Telegram-пользователя и на нормализованный телефон.
+Обновляется по событиям заказа — создание (order_post_save) и вход в
+«Завершен» или выход из него (хук в order_state.py) — одним UPDATE с F().
+Правки суммы или телефона в уже созданном заказе и удаление заказов так не
+отслеживаются: их догоняет `manage.py rebuild_customer_profiles`. Перенос в
+архив (catalog/order_archive.py) сводки не меняет, пересборка читает и архив.
+"""
+from __future__ import annotations
+
+from decimal import Decimal
+
+from django.db import IntegrityError, router, transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.utils import timezone
+
+from .bulk_insert import insert_rows
+from .models import CustomerProfile, Order
+
+
+def profile_keys(order) -> list[tuple[str, str]]:
+    keys = []
+    if order.telegram_user_id:
+        keys.append((CustomerProfile.KIND_TELEGRAM, str(order.telegram_user_id)))
+    if order.phone_normalized:
+        keys.append((CustomerProfile.KIND_PHONE, order.phone_normalized))
+    return keys
+
+
+def _bump(kind: str, key: str, **changes) -> None:
+    """UPDATE строки сводки; если строки нет — создаем ее и повторяем."""
+    changes['updated_at'] = timezone.now()
+    profiles = CustomerProfile.objects.filter(kind=kind, key=key)
+    if profiles.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            CustomerProfile.objects.create(kind=kind, key=key)
+    except IntegrityError:
+        pass  # строку успел создать параллельный запрос
+    profiles.update(**changes)
+
+
+def _completed_changes(order, sign: int) -> dict:
+    amount = order.total_price or Decimal('0')
+    return {
+        'completed_count': F('completed_count') + sign,
+        'lifetime_spend': F('lifetime_spend') + sign * amount,
+    }
+
+
+def record_order_created(order) -> None:
+    for kind, key in profile_keys(order):
+        changes = {'order_count': F('order_count') + 1, 'last_order_id': order.id}
+        if kind == CustomerProfile.KIND_TELEGRAM:
+            changes['phone_normalized'] = order.phone_normalized
+        if order.status == 'completed':
+            changes.update(_completed_changes(order, 1))
+        _bump(kind, key, **changes)
+
+
+def record_status_change(order, previous_status: str) -> None:
+    entered = order.status == 'completed'
+    left = previous_status == 'completed'
+    if entered == left:
+        return
+    for kind, key in profile_keys(order):
+        if entered:
+            _bump(kind, key, **_completed_changes(order, 1))
+        else:
+            CustomerProfile.objects.filter(kind=kind, key=key, completed_count__gt=0).update(
+                updated_at=timezone.now(), **_completed_changes(order, -1),
+            )
+
+
+def get_profile(kind: str, key) -> CustomerProfile | None:
+    if not key:
+        return None
+    try:
+        return CustomerProfile.objects.get(kind=kind, key=str(key))
+    except CustomerProfile.DoesNotExist:
+        return None
+
+
+def phone_has_completed_orders(phone_normalized: str) -> bool:
+    profile = get_profile(CustomerProfile.KIND_PHONE, phone_normalized)
+    return bool(profile and profile.completed_count)
+
+
+def user_has_completed_orders(telegram_user_id: int) -> bool:
+    """Есть ли завершенные заказы по телефону из последнего заказа пользователя."""
+    profile = get_profile(CustomerProfile.KIND_TELEGRAM, telegram_user_id)
+    return bool(profile and phone_has_completed_orders(profile.phone_normalized))
+
+
+_PROFILE_COLUMNS = (
+    'kind', 'key', 'order_count', 'completed_count', 'lifetime_spend', 'last_order_id', 'phone_normalized',
+    'updated_at',
+)
+
+
+def rebuild_customer_profiles(
+    order_model=Order, profile_model=CustomerProfile, batch_size: int = 1000, archive_model=None,
+) -> int:
+    """Пересобрать все сводки по заказам (и архиву, если он передан); модели передаются из миграции."""
+    completed = Q(status='completed')
+    now = timezone.now()
+    sources = [order_model] if archive_model is None else [order_model, archive_model]
+
+    def aggregate(field, exclude_blank=False) -> dict:
+        totals = {}
+        for model in sources:
+            queryset = model.objects.exclude(**{field: ''}) if exclude_blank else model.objects.all()
+            rows = (
+                queryset.order_by()
+                .values_list(field)
+                .annotate(
+                    order_count=Count('id'),
+                    completed_count=Count('id', filter=completed),
+                    lifetime_spend=Sum('total_price', filter=completed),
+                    last_order_id=Max('id'),
+                )
+            )
+            for key, orders, done, spend, last_id in rows.iterator():
+                spend = spend or Decimal('0')
+                total = totals.get(key)
+                if total is None:
+                    totals[key] = [orders, done, spend, last_id]
+                else:
+                    total[0] += orders
+                    total[1] += done
+                    total[2] += spend
+                    total[3] = max(total[3], last_id)
+        return totals
+
+    users = aggregate('telegram_user_id')
+    last_ids = [total[3] for total in users.values()]
+    phones = {}
+    for model in sources:
+        for start in range(0, len(last_ids), batch_size):
+            phones.update(
+                model.objects.filter(id__in=last_ids[start:start + batch_size])
+                .values_list('id', 'phone_normalized')
+            )
+
+    rows = [
+        ('telegram', str(user_id), orders, done, spend, last_id, phones.get(last_id, ''), now)
+        for user_id, (orders, done, spend, last_id) in users.items()
+    ]
+    rows.extend(
+        ('phone', phone, orders, done, spend, last_id, '', now)
+        for phone, (orders, done, spend, last_id) in aggregate('phone_normalized', exclude_blank=True).items()
+    )
+
+    with transaction.atomic(using=router.db_for_write(profile_model)):
+        profile_model.objects.all().delete()
+        insert_rows(profile_model, _PROFILE_COLUMNS, rows, batch_size)
+    return len(rows)
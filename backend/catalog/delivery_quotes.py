@@ -0,0 +1,212 @@
+"""
+Асинхронный расчет доставки для бота.
+
+Логика та же, что у TaxiDeliveryIntegration.calculate_delivery_cost, но
+запросы к геокодеру и такси идут через общий aiohttp-пул прямо в event loop,
+независимые геокодирования выполняются одновременно, а весь расчет ограничен
+DELIVERY_QUOTE_DEADLINE_MS: не уложились — заказ уходит в ручной расчет, и
+оформление не ждет медленный внешний сервис.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+import aiohttp
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .delivery_tariffs import tariff_registry
+from .geocoder_cache import cache_enabled, forward_query, geocoder_cache
+from .models import GeocodeCacheEntry
+from .route_quotes import known_origin, remember_origin, route_quote_cache
+from .taxi_integration import (
+    YANDEX_TAXI_ESTIMATE_URL, fixed_tariff_quote, geocoded_tariff_quote, geocoder_params, geocoder_url,
+    manual_quote, parse_address_candidates, parse_point, parse_reverse_address, parse_yandex_taxi_estimate,
+    reverse_geocode_request, yandex_taxi_payload,
+)
+
+logger = logging.getLogger(__name__)
+
+DEADLINE_NOTE = 'Расчет доставки занял слишком много времени - введите стоимость сами'
+_GEOCODER_TIMEOUT = aiohttp.ClientTimeout(total=5)
+_TAXI_TIMEOUT = aiohttp.ClientTimeout(total=10)
+
+# Сессия (и пул соединений) живет столько же, сколько event loop бота.
+_sessions: dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+
+
+def deadline_seconds() -> float | None:
+    deadline_ms = int(getattr(settings, 'DELIVERY_QUOTE_DEADLINE_MS', 4000))
+    return deadline_ms / 1000 if deadline_ms > 0 else None
+
+
+def http_session() -> aiohttp.ClientSession:
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        for stale_loop in [item for item in _sessions if item.is_closed()]:
+            del _sessions[stale_loop]
+        connector = aiohttp.TCPConnector(
+            limit=max(1, int(getattr(settings, 'DELIVERY_HTTP_POOL_SIZE', 20))),
+            ttl_dns_cache=300,
+        )
+        session = aiohttp.ClientSession(connector=connector)
+        _sessions[loop] = session
+    return session
+
+
+async def close_http_session() -> None:
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
+
+
+class DeliveryQuoteEngine:
+    """Расчет стоимости доставки и геокодирование без блокировки event loop."""
+
+    def __init__(self):
+        self.yandex_taxi_api_key = getattr(settings, 'YANDEX_TAXI_API_KEY', '')
+        self.geocoder_api_key = getattr(settings, 'YANDEX_GEOCODER_API_KEY', '')
+        self.delivery_service = getattr(settings, 'TAXI_DELIVERY_SERVICE', 'yandex')
+
+    async def quote(self, from_address: str, to_address: str, order_weight=1) -> dict:
+        """Тот же dict, что у calculate_delivery_cost; не дольше дедлайна."""
+        # Снимок тарифов берем один на весь расчет (см. TariffRegistry).
+        tariffs = await tariff_registry.asnapshot()
+        fixed_tariff = fixed_tariff_quote(tariffs.matcher.match(to_address))
+        if fixed_tariff:
+            return fixed_tariff
+
+        started = time.monotonic()
+        try:
+            return await asyncio.wait_for(
+                self._remote_quote(tariffs, from_address, to_address, order_weight),
+                timeout=deadline_seconds(),
+            )
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Расчет доставки до %s не уложился в %.1f с, нужен ручной расчет",
+                to_address, time.monotonic() - started,
+            )
+            return manual_quote(DEADLINE_NOTE)
+
+    async def reverse_geocode(self, lat, lon) -> dict | None:
+        """Координаты → адрес (как TaxiDeliveryIntegration.reverse_geocode)."""
+        cache_query, params = reverse_geocode_request(lat, lon)
+        try:
+            data = await asyncio.wait_for(
+                self._geocoder_request(GeocodeCacheEntry.KIND_REVERSE, cache_query, params),
+                timeout=deadline_seconds(),
+            )
+            return parse_reverse_address(data)
+        except Exception as exc:
+            logger.error("Ошибка обратного геокодирования координат %s, %s: %s", lat, lon, exc)
+        return None
+
+    async def _remote_quote(self, tariffs, from_address, to_address, order_weight) -> dict:
+        # Координаты для такси нужны, только если справочника тарифов нет.
+        # Тогда геокодируем адрес вместе с поиском населенного пункта, а
+        # магазин — только если его координаты еще неизвестны.
+        needs_route = (
+            not tariffs.tariffs
+            and self.delivery_service == 'yandex'
+            and bool(self.yandex_taxi_api_key)
+        )
+        from_coords = known_origin(from_address) if needs_route else None
+        lookups = [self._address_candidates(to_address)]
+        if needs_route:
+            lookups.append(self._geocode_point(to_address))
+            if from_coords is None:
+                lookups.append(self._geocode_point(from_address))
+        candidates, *points = await asyncio.gather(*lookups)
+
+        # Если адрес написан свободным текстом, уточняем локацию через геокодер
+        # и пытаемся сопоставить по населенному пункту/району.
+        for geocoded_text in candidates:
+            fixed_tariff = fixed_tariff_quote(tariffs.matcher.match(geocoded_text))
+            if fixed_tariff:
+                return geocoded_tariff_quote(fixed_tariff, geocoded_text)
+
+        # Справочник тарифов — источник истины, неугаданный адрес считаем вручную.
+        if not needs_route:
+            return manual_quote()
+        to_coords = points[0]
+        if from_coords is None:
+            from_coords = points[1]
+            remember_origin(from_address, from_coords)
+        if not from_coords or not to_coords:
+            return manual_quote()
+
+        cache_key = route_quote_cache.key(from_coords, to_coords, order_weight)
+        cached = route_quote_cache.get(cache_key)
+        if cached:
+            return cached
+        estimate = await self._yandex_taxi(from_coords, to_coords, order_weight)
+        if not estimate.get('requires_manual_price'):
+            route_quote_cache.set(cache_key, estimate)
+        return estimate
+
+    async def _geocoder_request(self, kind: str, cache_query: str, params: dict) -> dict | None:
+        """GET к геокодеру через кэш; None — ошибка HTTP."""
+        use_cache = cache_enabled()
+        if use_cache:
+            cached = geocoder_cache.peek(kind, cache_query)
+            if cached is None:
+                cached = await sync_to_async(geocoder_cache.get)(kind, cache_query)
+            if cached is not None:
+                return cached
+
+        async with http_session().get(
+            geocoder_url(), params=geocoder_params(params), timeout=_GEOCODER_TIMEOUT,
+        ) as response:
+            if response.status >= 400:
+                return None
+            data = await response.json(content_type=None)
+        if use_cache and isinstance(data, dict) and 'response' in data:
+            await sync_to_async(geocoder_cache.set)(kind, cache_query, data)
+        return data
+
+    async def _address_candidates(self, address: str) -> list[str]:
+        if not self.geocoder_api_key:
+            return []
+        try:
+            data = await self._geocoder_request(
+                GeocodeCacheEntry.KIND_FORWARD,
+                forward_query(address, results=1),
+                {'geocode': address, 'results': 1},
+            )
+            return parse_address_candidates(data)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError, TypeError) as exc:
+            logger.warning("Ошибка геокодирования текстового адреса %s: %s", address, exc)
+            return []
+
+    async def _geocode_point(self, address: str) -> dict | None:
+        try:
+            data = await self._geocoder_request(
+                GeocodeCacheEntry.KIND_FORWARD,
+                forward_query(address),
+                {'geocode': address},
+            )
+            return parse_point(data)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError, TypeError) as exc:
+            logger.error("Ошибка геокодирования адреса %s: %s", address, exc)
+            return None
+
+    async def _yandex_taxi(self, from_coords: dict, to_coords: dict, order_weight) -> dict:
+        headers = {'Authorization': f'Bearer {self.yandex_taxi_api_key}'}
+        try:
+            async with http_session().post(
+                YANDEX_TAXI_ESTIMATE_URL,
+                json=yandex_taxi_payload(from_coords, to_coords, order_weight),
+                headers=headers,
+                timeout=_TAXI_TIMEOUT,
+            ) as response:
+                if response.status == 200:
+                    estimate = parse_yandex_taxi_estimate(await response.json(content_type=None))
+                    if estimate:
+                        return estimate
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError, TypeError) as exc:
+            logger.error("Ошибка расчета доставки через Yandex Taxi: %s", exc)
+        return manual_quote()
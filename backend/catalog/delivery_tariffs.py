@@ -3,11 +3,16 @@ from __future__ import annotations
 import csv
 import logging
 import re
+import threading
+import time
+from collections import deque
 from decimal import Decimal, InvalidOperation
-from functools import lru_cache
 from pathlib import Path
+from typing import Callable, NamedTuple
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.db import DatabaseError, connections
 
 logger = logging.getLogger(__name__)
 
@@ -94,8 +99,73 @@ def build_aliases(place_name: str) -> tuple[str, ...]:
     return tuple(sorted(aliases, key=len, reverse=True))
 
 
-@lru_cache(maxsize=1)
-def load_delivery_tariffs() -> list[tuple[tuple[str, ...], Decimal | None, str]]:
+class TariffFileFormatError(ValueError):
+    """CSV без колонок aliases,cost,label или Населенный_пункт,Стоимость."""
+
+
+def parse_tariffs_csv(path: Path, merged: dict[str, dict] | None = None) -> dict[str, dict]:
+    """
+    Разобрать CSV тарифов в словарь {нормализованная метка: {aliases, cost, label}}.
+    Строки с одинаковой меткой объединяются, из цен берется большая.
+    """
+    merged = {} if merged is None else merged
+    with path.open("r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        fieldnames = set(reader.fieldnames or [])
+        flat_format = {"aliases", "cost", "label"}.issubset(fieldnames)
+        source_format = {"Населенный_пункт", "Стоимость"}.issubset(fieldnames)
+        if not flat_format and not source_format:
+            raise TariffFileFormatError(
+                "Нужны колонки aliases,cost,label или Буква,Населенный_пункт,Стоимость. "
+                f"Сейчас: {reader.fieldnames}"
+            )
+
+        for row in reader:
+            if flat_format:
+                aliases_raw = (row.get("aliases") or "").strip()
+                cost_raw = (row.get("cost") or "").strip()
+                label_raw = (row.get("label") or aliases_raw).strip()
+                aliases = tuple(
+                    a for a in (normalize_address_text(part) for part in aliases_raw.split("|")) if a
+                )
+            else:
+                place_name = (row.get("Населенный_пункт") or "").strip()
+                cost_raw = (row.get("Стоимость") or "").strip()
+                label_raw = place_name
+                aliases = build_aliases(place_name)
+
+            if not aliases or not label_raw:
+                continue
+
+            cost = parse_cost_value(cost_raw)
+            key = normalize_address_text(label_raw)
+            if not key:
+                continue
+
+            item = merged.get(key)
+            if not item:
+                merged[key] = {
+                    "aliases": set(aliases),
+                    "cost": cost,
+                    "label": label_raw,
+                }
+                continue
+
+            item["aliases"].update(aliases)
+            existing_cost = item["cost"]
+            if existing_cost is None:
+                item["cost"] = cost
+            elif cost is not None:
+                item["cost"] = max(existing_cost, cost)
+    return merged
+
+
+def _max_alias_length(aliases: tuple[str, ...]) -> int:
+    return max((len(a) for a in aliases), default=0)
+
+
+def read_delivery_tariffs() -> list[tuple[tuple[str, ...], Decimal | None, str]]:
+    """Прочитать тарифы из CSV (без кэша; обычно нужен `load_delivery_tariffs`)."""
     path = _resolve_tariffs_file()
     if not path.exists():
         logger.warning("Файл тарифов доставки не найден: %s. Используются тарифы по умолчанию.", path)
@@ -104,56 +174,10 @@ def load_delivery_tariffs() -> list[tuple[tuple[str, ...], Decimal | None, str]]
     merged: dict[str, dict] = {}
     _seed_defaults(merged)
     try:
-        with path.open("r", encoding="utf-8-sig", newline="") as f:
-            reader = csv.DictReader(f)
-            fieldnames = set(reader.fieldnames or [])
-            flat_format = {"aliases", "cost", "label"}.issubset(fieldnames)
-            source_format = {"Населенный_пункт", "Стоимость"}.issubset(fieldnames)
-            if not flat_format and not source_format:
-                logger.warning(
-                    "Неизвестный формат CSV %s. Нужны колонки aliases,cost,label "
-                    "или Буква,Населенный_пункт,Стоимость. Используются тарифы по умолчанию.",
-                    path,
-                )
-                return _default_tariffs_copy()
-
-            for idx, row in enumerate(reader, start=2):
-                if flat_format:
-                    aliases_raw = (row.get("aliases") or "").strip()
-                    cost_raw = (row.get("cost") or "").strip()
-                    label_raw = (row.get("label") or aliases_raw).strip()
-                    aliases = tuple(
-                        a for a in (normalize_address_text(part) for part in aliases_raw.split("|")) if a
-                    )
-                else:
-                    place_name = (row.get("Населенный_пункт") or "").strip()
-                    cost_raw = (row.get("Стоимость") or "").strip()
-                    label_raw = place_name
-                    aliases = build_aliases(place_name)
-
-                if not aliases or not label_raw:
-                    continue
-
-                cost = parse_cost_value(cost_raw)
-                key = normalize_address_text(label_raw)
-                if not key:
-                    continue
-
-                item = merged.get(key)
-                if not item:
-                    merged[key] = {
-                        "aliases": set(aliases),
-                        "cost": cost,
-                        "label": label_raw,
-                    }
-                    continue
-
-                item["aliases"].update(aliases)
-                existing_cost = item["cost"]
-                if existing_cost is None:
-                    item["cost"] = cost
-                elif cost is not None:
-                    item["cost"] = max(existing_cost, cost)
+        parse_tariffs_csv(path, merged)
+    except TariffFileFormatError as exc:
+        logger.warning("Неизвестный формат CSV %s. %s Используются тарифы по умолчанию.", path, exc)
+        return _default_tariffs_copy()
     except Exception as exc:
         logger.warning("Не удалось прочитать файл тарифов %s: %s. Используются тарифы по умолчанию.", path, exc)
         return _default_tariffs_copy()
@@ -162,11 +186,252 @@ def load_delivery_tariffs() -> list[tuple[tuple[str, ...], Decimal | None, str]]
         logger.warning("Файл тарифов %s пустой/некорректный. Используются тарифы по умолчанию.", path)
         return _default_tariffs_copy()
 
+    return _tariffs_from_merged(merged)
+
+
+def _tariffs_from_merged(merged: dict[str, dict]) -> list[tuple[tuple[str, ...], Decimal | None, str]]:
     parsed: list[tuple[tuple[str, ...], Decimal | None, str]] = []
     for item in merged.values():
         aliases = tuple(sorted(item["aliases"], key=len, reverse=True))
         parsed.append((aliases, item["cost"], item["label"]))
 
     # Сначала самые специфичные алиасы (длиннее), чтобы "уфа аэропорт" не матчился как "уфа".
-    parsed.sort(key=lambda x: max((len(a) for a in x[0]), default=0), reverse=True)
+    parsed.sort(key=lambda x: _max_alias_length(x[0]), reverse=True)
     return parsed
+
+
+def read_tariffs_file(path: Path) -> list[tuple[tuple[str, ...], Decimal | None, str]]:
+    """Тарифы из указанного CSV так, как их загрузит бот; ошибки формата — исключением."""
+    merged: dict[str, dict] = {}
+    _seed_defaults(merged)
+    parse_tariffs_csv(path, merged)
+    return _tariffs_from_merged(merged)
+
+
+def read_db_tariffs() -> list[tuple[tuple[str, ...], Decimal | None, str]]:
+    """Активные тарифы из модели DeliveryTariff: приоритет, затем длина алиасов."""
+    from .models import DeliveryTariff
+
+    ranked = []
+    for tariff in DeliveryTariff.objects.filter(is_active=True).order_by("id"):
+        aliases = tariff.alias_tuple()
+        if aliases:
+            ranked.append((tariff.priority, (aliases, tariff.cost, tariff.label)))
+    ranked.sort(key=lambda item: (item[0], _max_alias_length(item[1][0])), reverse=True)
+    return [tariff for _priority, tariff in ranked]
+
+
+def load_tariffs_source() -> list[tuple[tuple[str, ...], Decimal | None, str]]:
+    """Тарифы из БД, если они заведены, иначе из CSV."""
+    try:
+        tariffs = read_db_tariffs()
+    except DatabaseError as exc:
+        # Например, до применения миграций.
+        logger.info("Тарифы доставки из БД недоступны: %s", exc)
+        tariffs = []
+    return tariffs or read_delivery_tariffs()
+
+
+Tariff = tuple[tuple[str, ...], Decimal | None, str]
+
+
+class TariffMatcher:
+    """
+    Автомат Ахо-Корасик по нормализованным алиасам тарифов.
+
+    Адрес проходится один раз; из всех найденных алиасов выигрывает тариф,
+    стоящий раньше в списке `load_delivery_tariffs()` (там самые длинные и
+    специфичные алиасы идут первыми) — так же, как при переборе по порядку.
+    """
+
+    __slots__ = ("tariffs", "_goto", "_fail", "_best")
+
+    _NO_MATCH = -1
+
+    def __init__(self, tariffs: list[Tariff]):
+        self.tariffs = list(tariffs)
+        goto: list[dict[str, int]] = [{}]
+        own_rank: list[int] = [self._NO_MATCH]
+
+        for rank, (aliases, _cost, _label) in enumerate(self.tariffs):
+            for alias in aliases:
+                normalized = normalize_address_text(alias)
+                if not normalized:
+                    continue
+                state = 0
+                for char in normalized:
+                    nxt = goto[state].get(char)
+                    if nxt is None:
+                        nxt = len(goto)
+                        goto[state][char] = nxt
+                        goto.append({})
+                        own_rank.append(self._NO_MATCH)
+                    state = nxt
+                if own_rank[state] == self._NO_MATCH or rank < own_rank[state]:
+                    own_rank[state] = rank
+
+        # best[s] — лучший (минимальный) ранг среди алиасов, оканчивающихся в s,
+        # с учетом суффиксных ссылок. Считаем в порядке BFS: родитель раньше потомка.
+        fail = [0] * len(goto)
+        best = list(own_rank)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            inherited = best[fail[state]]
+            if inherited != self._NO_MATCH and (best[state] == self._NO_MATCH or inherited < best[state]):
+                best[state] = inherited
+            for char, nxt in goto[state].items():
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                candidate = goto[fallback].get(char, 0)
+                fail[nxt] = candidate if candidate != nxt else 0
+                queue.append(nxt)
+
+        self._goto = goto
+        self._fail = fail
+        self._best = best
+
+    def match_normalized(self, normalized_address: str) -> Tariff | None:
+        goto, fail, best = self._goto, self._fail, self._best
+        found = self._NO_MATCH
+        state = 0
+        for char in normalized_address:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            rank = best[state]
+            if rank != self._NO_MATCH and (found == self._NO_MATCH or rank < found):
+                found = rank
+                if found == 0:
+                    break
+        return self.tariffs[found] if found != self._NO_MATCH else None
+
+    def match(self, address: str) -> Tariff | None:
+        normalized = normalize_address_text(address)
+        if not normalized:
+            return None
+        return self.match_normalized(normalized)
+
+
+def tariffs_file_version() -> tuple | None:
+    """Версия CSV для горячей перезагрузки: путь, mtime и размер."""
+    path = _resolve_tariffs_file()
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return str(path), stat.st_mtime_ns, stat.st_size
+
+
+def tariffs_source_version() -> tuple:
+    """Счетчик версии тарифов в БД (растет при любом изменении) + версия CSV."""
+    from .models import DeliveryTariffVersion
+
+    try:
+        db_version = DeliveryTariffVersion.current()
+    except DatabaseError:
+        db_version = None
+    return db_version, tariffs_file_version()
+
+
+class TariffSnapshot(NamedTuple):
+    version: object
+    tariffs: list[Tariff]
+    matcher: TariffMatcher
+    loaded_at: float
+
+
+class TariffRegistry:
+    """
+    Текущие тарифы и собранный по ним автомат.
+
+    Раз в DELIVERY_TARIFFS_RELOAD_SECONDS поиск запускает фоновый поток,
+    который сверяет версию источника (счетчик DeliveryTariffVersion и mtime
+    CSV). Если она изменилась, поток собирает новый снимок и подменяет старый
+    одной записью атрибута. Сам поиск в БД и файловую систему не ходит и
+    пересборки не ждет: начатый на старом снимке доиграет на нем.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], list[Tariff]] = load_tariffs_source,
+        version_func: Callable[[], object] = tariffs_source_version,
+    ):
+        self._loader = loader
+        self._version_func = version_func
+        self._snapshot: TariffSnapshot | None = None
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self._checked_at = 0.0
+
+    def _reload_interval(self) -> float:
+        return float(getattr(settings, "DELIVERY_TARIFFS_RELOAD_SECONDS", 5))
+
+    def _build(self) -> TariffSnapshot:
+        # Версию берем до чтения: если файл поменяют во время сборки,
+        # следующая проверка увидит расхождение и соберет снимок еще раз.
+        version = self._version_func()
+        tariffs = self._loader()
+        return TariffSnapshot(version, tariffs, TariffMatcher(tariffs), time.time())
+
+    def snapshot(self) -> TariffSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = self._build()
+                    self._checked_at = time.monotonic()
+                return self._snapshot
+
+        interval = self._reload_interval()
+        now = time.monotonic()
+        if interval > 0 and now - self._checked_at >= interval:
+            self._checked_at = now
+            self._schedule_refresh()
+        return snapshot
+
+    async def asnapshot(self) -> TariffSnapshot:
+        """snapshot() для event loop: первая сборка идет к БД, поэтому в потоке."""
+        if self._snapshot is None:
+            return await sync_to_async(self.snapshot)()
+        return self.snapshot()
+
+    def _schedule_refresh(self) -> None:
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._refresh, name="delivery-tariffs-reload", daemon=True).start()
+
+    def _refresh(self) -> None:
+        try:
+            if self._version_func() == self._snapshot.version:
+                return
+            snapshot = self._build()
+            self._snapshot = snapshot
+            logger.info("Тарифы доставки перезагружены: %s шт.", len(snapshot.tariffs))
+        except Exception as exc:
+            logger.warning("Не удалось перезагрузить тарифы доставки: %s", exc)
+        finally:
+            self._rebuilding = False
+            # Соединения с БД у Django на поток — закрываем свое.
+            connections.close_all()
+
+    def reload(self) -> TariffSnapshot:
+        """Синхронно пересобрать снимок (команды, админка)."""
+        snapshot = self._build()
+        self._snapshot = snapshot
+        self._checked_at = time.monotonic()
+        return snapshot
+
+
+tariff_registry = TariffRegistry()
+
+
+def load_delivery_tariffs() -> list[Tariff]:
+    return tariff_registry.snapshot().tariffs
+
+
+def load_tariff_matcher() -> TariffMatcher:
+    return tariff_registry.snapshot().matcher
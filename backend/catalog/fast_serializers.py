@@ -0,0 +1,227 @@
+"""
+Быстрый путь сериализации для горячих read-эндпоинтов.
+
+Строки собираются из `.values_list()` без создания моделей и без обхода
+DRF-полей на каждый объект. Формат ответа совпадает с `serializers.py`
+байт в байт — это проверяет FastSerializerParityTests в catalog/tests.py,
+а `check_fast_serializers` сверяет и замеряет на живых данных.
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Callable, Iterable
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.utils.encoding import filepath_to_uri
+
+from .models import (
+    Category, Product, Review,
+    SiteSettings, HeroSection, PromoBanner, DeliveryInfo
+)
+from .serializers import (
+    ProductListSerializer, ReviewSerializer,
+    SiteSettingsSerializer, HeroSectionSerializer, PromoBannerSerializer, DeliveryInfoSerializer
+)
+from .thumbnails import build_srcset
+
+
+def fast_serializers_enabled() -> bool:
+    return bool(getattr(settings, 'FAST_SERIALIZERS_ENABLED', False))
+
+
+@lru_cache(maxsize=1)
+def _media_url_builder() -> Callable[[str], str | None]:
+    storage = default_storage
+    if isinstance(storage, FileSystemStorage):
+        # base_url у FileSystemStorage всегда оканчивается на "/", поэтому
+        # urljoin() из FileSystemStorage.url() сводится к конкатенации.
+        prefix = storage.base_url
+
+        def build(name: str) -> str | None:
+            return prefix + filepath_to_uri(name).lstrip('/')
+        return build
+
+    def build_generic(name: str) -> str | None:
+        try:
+            return storage.url(name)
+        except Exception:
+            return None
+    return build_generic
+
+
+def media_url_for_name(name: str | None) -> str | None:
+    """Аналог `serializers.media_url` для имени файла из `.values()`."""
+    if not name:
+        return None
+    return _media_url_builder()(name)
+
+
+def media_srcset_for_name(name: str | None, variants: dict | None) -> dict | None:
+    """Аналог `serializers.media_srcset` для значений из `.values()`."""
+    if not name:
+        return None
+    return build_srcset(name, variants, _media_url_builder())
+
+
+@lru_cache(maxsize=None)
+def _representation(serializer_class, field_name: str) -> Callable:
+    return serializer_class().fields[field_name].to_representation
+
+
+# ── Категории ────────────────────────────────────────────────────
+
+CATEGORY_VALUES = ('id', 'name', 'slug', 'description', 'image', 'image_variants', 'order')
+
+
+def serialize_category_rows(rows: Iterable[tuple]) -> list[dict]:
+    media = media_url_for_name
+    srcset = media_srcset_for_name
+    return [
+        {
+            'id': pk,
+            'name': name,
+            'slug': slug,
+            'description': description,
+            'image': media(image),
+            'image_srcset': srcset(image, image_variants),
+            'order': order,
+        }
+        for pk, name, slug, description, image, image_variants, order in rows
+    ]
+
+
+# ── Товары ───────────────────────────────────────────────────────
+
+PRODUCT_LIST_VALUES = (
+    'id', 'name', 'slug', 'description', 'short_description',
+    'price', 'hide_price', 'image', 'image_variants', 'is_active', 'is_popular', 'order',
+    'category_id', 'category__name', 'category__slug', 'category__description',
+    'category__image', 'category__image_variants', 'category__order',
+)
+
+
+def product_list_values(queryset):
+    return queryset.values_list(*PRODUCT_LIST_VALUES)
+
+
+def serialize_product_rows(rows: Iterable[tuple]) -> list[dict]:
+    media = media_url_for_name
+    srcset = media_srcset_for_name
+    price_repr = _representation(ProductListSerializer, 'price')
+    result = []
+    for (
+        pk, name, slug, description, short_description,
+        price, hide_price, image, image_variants, is_active, is_popular, order,
+        category_id, category_name, category_slug, category_description,
+        category_image, category_image_variants, category_order,
+    ) in rows:
+        if category_id is None:
+            category = None
+        else:
+            category = {
+                'id': category_id,
+                'name': category_name,
+                'slug': category_slug,
+                'description': category_description,
+                'image': media(category_image),
+                'image_srcset': srcset(category_image, category_image_variants),
+                'order': category_order,
+            }
+        result.append({
+            'id': pk,
+            'name': name,
+            'slug': slug,
+            'description': description,
+            'short_description': short_description,
+            'price': None if price is None else price_repr(price),
+            'hide_price': hide_price,
+            'image': media(image),
+            'image_srcset': srcset(image, image_variants),
+            'category': category,
+            'is_active': is_active,
+            'is_popular': is_popular,
+            'order': order,
+        })
+    return result
+
+
+# ── Отзывы ───────────────────────────────────────────────────────
+
+REVIEW_VALUES = (
+    'id', 'name', 'text', 'rating', 'product_id', 'product__name', 'avatar', 'avatar_variants', 'created_at',
+)
+
+
+def serialize_review_rows(rows: Iterable[tuple]) -> list[dict]:
+    media = media_url_for_name
+    srcset = media_srcset_for_name
+    created_repr = _representation(ReviewSerializer, 'created_at')
+    result = []
+    for pk, name, text, rating, product_id, product_name, avatar, avatar_variants, created_at in rows:
+        item = {
+            'id': pk,
+            'name': name,
+            'text': text,
+            'rating': rating,
+            'product': product_id,
+        }
+        # ReviewSerializer пропускает product_name, если товар не указан.
+        if product_id is not None:
+            item['product_name'] = product_name
+        item['avatar_url'] = media(avatar)
+        item['avatar_srcset'] = srcset(avatar, avatar_variants)
+        item['created_at'] = created_repr(created_at)
+        result.append(item)
+    return result
+
+
+# ── Singleton-модели ─────────────────────────────────────────────
+
+def _singleton_data(model, serializer_class, getter, media_fields: tuple[str, ...] = ()) -> dict:
+    fields = serializer_class.Meta.fields
+    srcset_fields = {f'{name}_srcset' for name in media_fields}
+    query_fields = [name for name in fields if name not in srcset_fields]
+    query_fields += [f'{name}_variants' for name in media_fields]
+    row = model.objects.filter(pk=1).values(*query_fields).first()
+    if row is None:
+        # Строки еще нет — создаем как обычно и отдаем через DRF.
+        return dict(serializer_class(getter()).data)
+    for field_name in media_fields:
+        name = row[field_name]
+        row[f'{field_name}_srcset'] = media_srcset_for_name(name, row.pop(f'{field_name}_variants'))
+        row[field_name] = media_url_for_name(name)
+    return {name: row[name] for name in fields}
+
+
+def build_site_content() -> dict:
+    """Аналог ответа `views.site_content` без создания моделей."""
+    site_settings = _singleton_data(SiteSettings, SiteSettingsSerializer, SiteSettings.get_settings)
+    promo_enabled = bool(site_settings['promo_enabled'])
+    hero = _singleton_data(HeroSection, HeroSectionSerializer, HeroSection.get_hero, media_fields=('image',))
+    promo = _singleton_data(PromoBanner, PromoBannerSerializer, PromoBanner.get_promo)
+    delivery = _singleton_data(DeliveryInfo, DeliveryInfoSerializer, DeliveryInfo.get_delivery_info)
+
+    categories = serialize_category_rows(
+        Category.objects.filter(is_active=True).values_list(*CATEGORY_VALUES)
+    )
+    products = serialize_product_rows(product_list_values(
+        Product.objects.filter(is_active=True, is_popular=True).order_by('order', 'name')[:6]
+    ))
+    if not products:
+        products = serialize_product_rows(product_list_values(
+            Product.objects.filter(is_active=True).order_by('order', 'name')[:3]
+        ))
+    reviews = serialize_review_rows(
+        Review.objects.filter(is_published=True).values_list(*REVIEW_VALUES)[:6]
+    )
+
+    return {
+        'settings': site_settings,
+        'hero': hero,
+        'promo': promo if promo['is_active'] and promo_enabled else None,
+        'delivery': delivery,
+        'categories': categories,
+        'products': products,
+        'reviews': reviews,
+    }
@@ -0,0 +1,179 @@
+"""
+Кэш ответов Яндекс.Геокодера.
+
+Ключ — нормализованный адрес (прямое геокодирование) или координаты,
+округленные до 4 знаков, это примерно 10 м (обратное). Перед таблицей
+GeocodeCacheEntry стоит LRU в памяти процесса, поэтому повторный адрес
+обходится без сети и, как правило, без запроса к БД.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import F
+from django.utils import timezone
+
+from .delivery_tariffs import normalize_address_text
+from .models import GeocodeCacheEntry
+
+logger = logging.getLogger(__name__)
+
+COORDINATE_PRECISION = 4
+# Накопленные попадания из памяти пишем в БД пачкой, а не на каждый запрос.
+_HITS_FLUSH_EVERY = 20
+_HITS_FLUSH_SECONDS = 60.0
+
+
+def cache_enabled() -> bool:
+    return bool(getattr(settings, 'GEOCODER_CACHE_ENABLED', True))
+
+
+def forward_query(address: str, **params) -> str:
+    extra = ''.join(f'|{name}={value}' for name, value in sorted(params.items()))
+    return f'{normalize_address_text(address)}{extra}'
+
+
+def round_coordinates(lat: float, lon: float) -> tuple[float, float]:
+    return round(float(lat), COORDINATE_PRECISION), round(float(lon), COORDINATE_PRECISION)
+
+
+def reverse_query(lat: float, lon: float, **params) -> str:
+    lat, lon = round_coordinates(lat, lon)
+    extra = ''.join(f'|{name}={value}' for name, value in sorted(params.items()))
+    return f'{lat:.{COORDINATE_PRECISION}f},{lon:.{COORDINATE_PRECISION}f}{extra}'
+
+
+def _key_hash(kind: str, query: str) -> str:
+    return hashlib.sha256(f'{kind}:{query}'.encode('utf-8')).hexdigest()
+
+
+def is_empty_response(data: dict) -> bool:
+    features = (data.get('response') or {}).get('GeoObjectCollection', {}).get('featureMember')
+    return not features
+
+
+class GeocoderCache:
+    def __init__(self):
+        self._memory: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending_hits: dict[str, int] = {}
+        self._flushed_at = time.monotonic()
+        self.stats = {'memory_hits': 0, 'db_hits': 0, 'misses': 0}
+
+    def _memory_size(self) -> int:
+        return max(0, int(getattr(settings, 'GEOCODER_CACHE_MEMORY_SIZE', 512)))
+
+    def _remember(self, key_hash: str, expires_ts: float, data: dict) -> None:
+        size = self._memory_size()
+        if not size:
+            return
+        with self._lock:
+            self._memory[key_hash] = (expires_ts, data)
+            self._memory.move_to_end(key_hash)
+            while len(self._memory) > size:
+                self._memory.popitem(last=False)
+
+    def _from_memory(self, key_hash: str) -> dict | None:
+        with self._lock:
+            item = self._memory.get(key_hash)
+            if item is None:
+                return None
+            expires_ts, data = item
+            if expires_ts <= time.time():
+                del self._memory[key_hash]
+                return None
+            self._memory.move_to_end(key_hash)
+            self._pending_hits[key_hash] = self._pending_hits.get(key_hash, 0) + 1
+            return data
+
+    def flush_hits(self, force: bool = False) -> None:
+        with self._lock:
+            pending_total = sum(self._pending_hits.values())
+            due = time.monotonic() - self._flushed_at >= _HITS_FLUSH_SECONDS
+            if not pending_total or not (force or due or pending_total >= _HITS_FLUSH_EVERY):
+                return
+            pending, self._pending_hits = self._pending_hits, {}
+            self._flushed_at = time.monotonic()
+        now = timezone.now()
+        try:
+            for key_hash, hits in pending.items():
+                GeocodeCacheEntry.objects.filter(key_hash=key_hash).update(
+                    hits=F('hits') + hits, last_hit_at=now,
+                )
+        except DatabaseError as exc:
+            logger.info("Не удалось записать счетчики кэша геокодера: %s", exc)
+
+    def peek(self, kind: str, query: str) -> dict | None:
+        """Только LRU в памяти, без БД — можно звать из event loop."""
+        data = self._from_memory(_key_hash(kind, query))
+        if data is not None:
+            self.stats['memory_hits'] += 1
+        return data
+
+    def get(self, kind: str, query: str) -> dict | None:
+        key_hash = _key_hash(kind, query)
+        data = self._from_memory(key_hash)
+        if data is not None:
+            self.stats['memory_hits'] += 1
+            self.flush_hits()
+            return data
+
+        now = timezone.now()
+        try:
+            entry = (
+                GeocodeCacheEntry.objects.filter(key_hash=key_hash, expires_at__gt=now)
+                .only('pk', 'response', 'expires_at')
+                .first()
+            )
+            if entry is not None:
+                GeocodeCacheEntry.objects.filter(pk=entry.pk).update(hits=F('hits') + 1, last_hit_at=now)
+        except DatabaseError as exc:
+            logger.info("Кэш геокодера недоступен: %s", exc)
+            entry = None
+
+        if entry is None:
+            self.stats['misses'] += 1
+            return None
+        self.stats['db_hits'] += 1
+        self._remember(key_hash, entry.expires_at.timestamp(), entry.response)
+        return entry.response
+
+    def set(self, kind: str, query: str, data: dict) -> None:
+        empty = is_empty_response(data)
+        if empty:
+            ttl = timedelta(hours=int(getattr(settings, 'GEOCODER_CACHE_EMPTY_TTL_HOURS', 6)))
+        else:
+            ttl = timedelta(days=int(getattr(settings, 'GEOCODER_CACHE_TTL_DAYS', 30)))
+        if ttl.total_seconds() <= 0:
+            return
+        expires_at = timezone.now() + ttl
+        key_hash = _key_hash(kind, query)
+        try:
+            GeocodeCacheEntry.objects.update_or_create(
+                key_hash=key_hash,
+                defaults={
+                    'kind': kind,
+                    'query': query,
+                    'response': data,
+                    'is_empty': empty,
+                    'expires_at': expires_at,
+                },
+            )
+        except DatabaseError as exc:
+            logger.info("Не удалось сохранить ответ геокодера в кэш: %s", exc)
+        self._remember(key_hash, expires_at.timestamp(), data)
+
+    def clear_memory(self) -> None:
+        self.flush_hits(force=True)
+        with self._lock:
+            self._memory.clear()
+
+
+geocoder_cache = GeocoderCache()
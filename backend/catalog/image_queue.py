@@ -0,0 +1,230 @@
+"""
+Очередь подготовки вариантов изображений.
+
+Сохранение в админке только записывает задачу в `ImageJob`, а ресайз и
+перекодирование выполняет `manage.py process_image_jobs` (или
+`backfill_thumbnails`) в пуле процессов — по одному на ядро.
+"""
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import timedelta
+from typing import Callable, Iterable
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import image_worker
+from .models import ImageJob
+from .thumbnails import (
+    delete_variants, variants_are_current, variants_field_name,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def queue_enabled() -> bool:
+    return bool(getattr(settings, 'THUMBNAIL_QUEUE_ENABLED', True))
+
+
+def default_workers() -> int:
+    workers = int(getattr(settings, 'THUMBNAIL_WORKERS', 0) or 0)
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+def _max_attempts() -> int:
+    return max(1, int(getattr(settings, 'THUMBNAIL_JOB_MAX_ATTEMPTS', 3)))
+
+
+def model_label(model) -> str:
+    return model._meta.label
+
+
+def enqueue_variants(instance, field_name: str, force: bool = False) -> ImageJob | None:
+    """Поставить изображение объекта в очередь, если варианты устарели."""
+    file_field = getattr(instance, field_name)
+    source_name = file_field.name if file_field else ''
+    if not source_name:
+        return None
+    if not force and variants_are_current(source_name, getattr(instance, variants_field_name(field_name))):
+        return None
+
+    job, created = ImageJob.objects.get_or_create(
+        model_label=model_label(type(instance)),
+        object_id=instance.pk,
+        field_name=field_name,
+        defaults={'source_name': source_name},
+    )
+    if created:
+        return job
+    if job.source_name == source_name and job.status in (ImageJob.STATUS_PENDING, ImageJob.STATUS_PROCESSING):
+        return job
+    # Новый файл или повторная обработка: задача снова в очереди. Если ее
+    # сейчас обрабатывают, воркер увидит другой source_name и не закроет ее.
+    job.source_name = source_name
+    job.status = ImageJob.STATUS_PENDING
+    job.attempts = 0
+    job.error = ''
+    job.locked_at = None
+    job.save(update_fields=['source_name', 'status', 'attempts', 'error', 'locked_at', 'updated_at'])
+    return job
+
+
+def release_stale_jobs() -> int:
+    """Вернуть в очередь задачи, зависшие после падения воркера."""
+    timeout = int(getattr(settings, 'THUMBNAIL_JOB_TIMEOUT_SECONDS', 600))
+    deadline = timezone.now() - timedelta(seconds=timeout)
+    return ImageJob.objects.filter(
+        status=ImageJob.STATUS_PROCESSING,
+        locked_at__lt=deadline,
+    ).update(status=ImageJob.STATUS_PENDING, locked_at=None)
+
+
+def release_jobs(jobs: Iterable[ImageJob]) -> int:
+    ids = [job.pk for job in jobs]
+    if not ids:
+        return 0
+    return ImageJob.objects.filter(pk__in=ids, status=ImageJob.STATUS_PROCESSING).update(
+        status=ImageJob.STATUS_PENDING, locked_at=None, attempts=F('attempts') - 1,
+    )
+
+
+def job_scope(scope: list[tuple[str, str]] | None) -> Q:
+    """Условие на задачи только для пар (модель, поле) из `scope`; None — все задачи."""
+    if scope is None:
+        return Q()
+    condition = Q(pk__in=[])
+    for label, field_name in scope:
+        condition |= Q(model_label=label, field_name=field_name)
+    return condition
+
+
+def claim_jobs(limit: int, scope: list[tuple[str, str]] | None = None) -> list[ImageJob]:
+    """Забрать из очереди до `limit` задач (безопасно для нескольких воркеров).
+
+    `scope` — пары (модель, поле), задачи других изображений не трогаются.
+    """
+    claimed = []
+    candidates = (
+        ImageJob.objects.filter(job_scope(scope), status=ImageJob.STATUS_PENDING)
+        .order_by('id')
+        .values_list('pk', 'source_name')[:limit]
+    )
+    for pk, source_name in list(candidates):
+        now = timezone.now()
+        updated = ImageJob.objects.filter(
+            pk=pk, status=ImageJob.STATUS_PENDING, source_name=source_name,
+        ).update(status=ImageJob.STATUS_PROCESSING, locked_at=now, attempts=F('attempts') + 1)
+        if updated:
+            claimed.append(ImageJob.objects.get(pk=pk))
+    return claimed
+
+
+def _finish_job(job: ImageJob, **fields) -> bool:
+    """Закрыть задачу, если ее не перезапустили, пока она была в работе."""
+    return bool(ImageJob.objects.filter(
+        pk=job.pk, status=ImageJob.STATUS_PROCESSING, source_name=job.source_name,
+    ).update(locked_at=None, updated_at=timezone.now(), **fields))
+
+
+def apply_job_result(job: ImageJob, variants: dict) -> str:
+    """Записать готовые варианты в объект. Возвращает итог для лога."""
+    model = apps.get_model(job.model_label)
+    variants_attr = variants_field_name(job.field_name)
+    instance = model.objects.filter(pk=job.object_id).only('pk', job.field_name, variants_attr).first()
+    current_source = getattr(instance, job.field_name).name if instance else ''
+
+    if current_source != job.source_name:
+        # Объект удален или изображение заменили — результат уже не нужен.
+        delete_variants(variants, keep=getattr(instance, variants_attr, None) if instance else None)
+        _finish_job(job, status=ImageJob.STATUS_DONE, error='')
+        return 'устарела'
+
+    delete_variants(getattr(instance, variants_attr), keep=variants)
+    model.objects.filter(pk=job.object_id).update(**{variants_attr: variants})
+    _finish_job(job, status=ImageJob.STATUS_DONE, error='')
+    return 'готово'
+
+
+def fail_job(job: ImageJob, error: str) -> str:
+    status = ImageJob.STATUS_FAILED if job.attempts >= _max_attempts() else ImageJob.STATUS_PENDING
+    _finish_job(job, status=status, error=error[:2000])
+    logger.warning("Не удалось обработать изображение %s (%s): %s", job, job.source_name, error)
+    return 'ошибка' if status == ImageJob.STATUS_FAILED else 'повтор'
+
+
+class ImageJobRunner:
+    """Пул процессов для ресайза; результаты пишет в БД родительский процесс."""
+
+    def __init__(self, workers: int | None = None):
+        self.workers = max(1, workers or default_workers())
+        self._executor: ProcessPoolExecutor | None = None
+
+    def __enter__(self):
+        if self.workers > 1:
+            # spawn, а не fork: дочерние процессы не должны унаследовать
+            # открытые соединения с БД (процессы пула создаются лениво).
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=image_worker.init_worker,
+            )
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._executor is not None:
+            self._executor.shutdown(wait=exc_type is None, cancel_futures=True)
+            self._executor = None
+        return False
+
+    def run(self, jobs: list[ImageJob], on_result: Callable[[ImageJob, str, float], None] | None = None) -> None:
+        """Обработать задачи; `on_result(job, итог, секунды)` вызывается по мере готовности."""
+        pending = list(jobs)
+        try:
+            if self._executor is None:
+                while pending:
+                    job = pending[0]
+                    elapsed = 0.0
+                    try:
+                        variants, elapsed = image_worker.render(job.source_name)
+                        outcome = apply_job_result(job, variants)
+                    except Exception as exc:
+                        outcome = fail_job(job, str(exc))
+                    pending.pop(0)
+                    if on_result:
+                        on_result(job, outcome, elapsed)
+                return
+
+            futures = {self._executor.submit(image_worker.render, job.source_name): job for job in pending}
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = futures.pop(future)
+                    elapsed = 0.0
+                    try:
+                        variants, elapsed = future.result()
+                        outcome = apply_job_result(job, variants)
+                    except Exception as exc:
+                        outcome = fail_job(job, str(exc))
+                    pending.remove(job)
+                    if on_result:
+                        on_result(job, outcome, elapsed)
+        except BaseException:
+            # Ctrl+C или падение пула — незавершенные задачи снова в очереди.
+            release_jobs(pending)
+            raise
+
+    def run_pending(self, batch_size: int | None = None,
+                    on_result: Callable[[ImageJob, str, float], None] | None = None,
+                    scope: list[tuple[str, str]] | None = None) -> int:
+        """Обработать одну пачку задач из очереди (только из `scope`, если задан). Возвращает их число."""
+        release_stale_jobs()
+        jobs = claim_jobs(batch_size or self.workers * 2, scope)
+        if jobs:
+            self.run(jobs, on_result=on_result)
+        return len(jobs)
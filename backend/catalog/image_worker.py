@@ -0,0 +1,23 @@
+"""
+Точки входа для процессов пула `image_queue.ImageJobRunner`.
+
+Модуль не импортирует модели на верхнем уровне: процесс, запущенный через
+spawn, распаковывает эти функции до настройки Django.
+"""
+import time
+
+
+def init_worker():
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+def render(source_name: str) -> tuple[dict, float]:
+    from .thumbnails import render_variants
+
+    started = time.monotonic()
+    variants = render_variants(source_name)
+    return variants, time.monotonic() - started
@@ -0,0 +1,39 @@
+"""
+Перенос давно закрытых заказов в архив (OrderArchive).
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.order_archive import DEFAULT_BATCH_SIZE, archive_closed_orders, closed_orders
+
+
+class Command(BaseCommand):
+    help = (
+        "Перенести заказы, закрытые больше N дней назад, из Order в архив пачками; "
+        "история клиента в боте читает обе таблицы"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.ORDER_ARCHIVE_AFTER_DAYS,
+            help='Сколько дней заказ должен быть закрыт (по умолчанию ORDER_ARCHIVE_AFTER_DAYS).',
+        )
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Заказов в одной транзакции.')
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать, сколько заказов уйдет в архив.')
+
+    def handle(self, *args, **options):
+        days = options['days']
+        if days < 1:
+            raise CommandError('--days: нужно хотя бы 1')
+
+        if options['dry_run']:
+            self.stdout.write(f'Будет перенесено: {closed_orders(days).count()}')
+            return
+
+        started = time.perf_counter()
+        count = archive_closed_orders(days, batch_size=max(1, options['batch_size']))
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено в архив: {count} за {time.perf_counter() - started:.2f} с'
+        ))
@@ -0,0 +1,84 @@
+"""
+Подготовка вариантов для уже загруженных изображений.
+
+Задачи хранятся в ImageJob, поэтому прерванный запуск можно просто повторить:
+готовые изображения пропускаются, незавершенные и упавшие снова ставятся в очередь.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.image_queue import ImageJobRunner, default_workers, enqueue_variants, job_scope, model_label
+from catalog.models import ImageJob
+from catalog.thumbnails import THUMBNAIL_FIELDS, variants_field_name
+
+
+class Command(BaseCommand):
+    help = 'Ставит в очередь и обрабатывает все изображения без актуальных вариантов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=0, help='Число процессов (по умолчанию THUMBNAIL_WORKERS или число ядер)')
+        parser.add_argument('--model', action='append', default=[], help='Только эта модель, например catalog.Product (можно несколько)')
+        parser.add_argument('--force', action='store_true', help='Пересобрать варианты даже для актуальных изображений')
+        parser.add_argument('--enqueue-only', action='store_true', help='Только поставить задачи, обработает process_image_jobs')
+
+    def handle(self, *args, **options):
+        models = self._selected_models(options['model'])
+
+        enqueued = 0
+        for model in models:
+            field_name = THUMBNAIL_FIELDS[model]
+            queryset = (
+                model.objects.exclude(**{field_name: ''})
+                .exclude(**{f'{field_name}__isnull': True})
+                .only('pk', field_name, variants_field_name(field_name))
+                .order_by('pk')
+            )
+            for instance in queryset.iterator():
+                if enqueue_variants(instance, field_name, force=options['force']):
+                    enqueued += 1
+
+        # Очередь общая: разбираем только задачи выбранных моделей и полей.
+        scope = [(model_label(model), THUMBNAIL_FIELDS[model]) for model in models]
+        jobs = ImageJob.objects.filter(job_scope(scope))
+
+        pending = jobs.filter(status=ImageJob.STATUS_PENDING)
+        total = pending.count()
+        self.stdout.write(f'Изображений в очереди: {total} (без актуальных вариантов: {enqueued})')
+        if options['enqueue_only'] or not total:
+            return
+
+        workers = options['workers'] or default_workers()
+        self._done = 0
+        self._total = total
+        self._failed = 0
+        with ImageJobRunner(workers) as runner:
+            while self._done < self._total:
+                if not runner.run_pending(on_result=self._report, scope=scope):
+                    break
+
+        failed_total = jobs.filter(status=ImageJob.STATUS_FAILED).count()
+        message = f'Готово: обработано {self._done} из {self._total}'
+        if failed_total:
+            self.stdout.write(self.style.WARNING(
+                f'{message}; с ошибкой: {failed_total} (повторная попытка — при следующем запуске)'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
+
+    def _selected_models(self, labels):
+        if not labels:
+            return list(THUMBNAIL_FIELDS)
+        by_label = {model_label(model).lower(): model for model in THUMBNAIL_FIELDS}
+        models = []
+        for label in labels:
+            model = by_label.get(label.lower())
+            if model is None:
+                raise CommandError(f'Неизвестная модель {label}. Доступны: {", ".join(sorted(by_label))}')
+            models.append(model)
+        return models
+
+    def _report(self, job, outcome, seconds):
+        if outcome != 'повтор':
+            self._done += 1
+        self.stdout.write(
+            f'[{self._done}/{self._total}] {job} {job.source_name}: {outcome} ({seconds:.2f} с)'
+        )
@@ -0,0 +1,200 @@
+"""
+Замер сопоставления тарифов доставки на сгенерированном корпусе адресов.
+"""
+import hashlib
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.address_corpus import KINDS, generate_address_corpus
+from catalog.delivery_tariffs import (
+    TariffFileFormatError, TariffMatcher, build_aliases, normalize_address_text, read_delivery_tariffs,
+    read_tariffs_file,
+)
+from catalog.taxi_integration import fixed_tariff_quote
+
+
+def percentile(sorted_samples: list[int], fraction: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[min(len(sorted_samples) - 1, int(fraction * len(sorted_samples)))]
+
+
+def measure(func, inputs, repeat: int) -> dict:
+    """Задержка одного вызова (p50/p99, мкс) и пропускная способность (вызовов/с)."""
+    clock = time.perf_counter_ns
+    samples = []
+    for _ in range(repeat):
+        for value in inputs:
+            started = clock()
+            func(value)
+            samples.append(clock() - started)
+    samples.sort()
+
+    # Пропускную способность меряем отдельно, без таймера на каждом вызове.
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for value in inputs:
+            func(value)
+    elapsed = time.perf_counter() - started
+    calls = repeat * len(inputs)
+    return {
+        'p50_us': percentile(samples, 0.50) / 1000,
+        'p99_us': percentile(samples, 0.99) / 1000,
+        'ops': calls / elapsed if elapsed else 0.0,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Замер normalize_address_text, build_aliases и поиска тарифа по адресу: "
+        "пропускная способность, p50/p99 и доля совпадений; сравнение с сохраненным прогоном"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=5000, help='Размер корпуса адресов.')
+        parser.add_argument('--seed', type=int, default=42, help='Seed генератора корпуса.')
+        parser.add_argument('--repeat', type=int, default=5, help='Сколько раз прогнать корпус.')
+        parser.add_argument('--tariffs-file', help='CSV тарифов (по умолчанию DELIVERY_TARIFFS_FILE).')
+        parser.add_argument('--dump-corpus', help='Записать корпус в TSV (адрес, ожидаемый тариф, вид).')
+        parser.add_argument('--save-baseline', help='Сохранить результаты прогона в JSON.')
+        parser.add_argument('--baseline', help='Сравнить с прогоном из JSON и упасть при регрессии.')
+        parser.add_argument(
+            '--max-slowdown', type=float, default=1.25,
+            help='Во сколько раз может вырасти p50 относительно сохраненного прогона.',
+        )
+
+    def handle(self, *args, **options):
+        tariffs = self._tariffs(options['tariffs_file'])
+        corpus = generate_address_corpus(tariffs, size=max(1, options['size']), seed=options['seed'])
+        addresses = [item.address for item in corpus]
+        digest = hashlib.sha1('\n'.join(addresses).encode('utf-8')).hexdigest()
+        if options['dump_corpus']:
+            self._dump_corpus(options['dump_corpus'], corpus)
+
+        started = time.perf_counter()
+        matcher = TariffMatcher(tariffs)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        labels = []
+        kinds = {kind: {'total': 0, 'matched': 0, 'correct': 0} for kind in KINDS}
+        for item in corpus:
+            tariff = matcher.match(item.address)
+            label = tariff[2] if tariff else None
+            labels.append(label)
+            counters = kinds[item.kind]
+            counters['total'] += 1
+            counters['matched'] += label is not None
+            counters['correct'] += label == item.expected
+
+        repeat = max(1, options['repeat'])
+        place_names = [label for _aliases, _cost, label in tariffs]
+        benchmarks = {
+            'normalize_address_text': measure(normalize_address_text, addresses, repeat),
+            'build_aliases': measure(build_aliases, place_names, repeat),
+            'TariffMatcher.match': measure(matcher.match, addresses, repeat),
+            '_get_fixed_tariff_by_address': measure(
+                lambda address: fixed_tariff_quote(matcher.match(address)), addresses, repeat,
+            ),
+        }
+
+        result = {
+            'seed': options['seed'],
+            'size': len(corpus),
+            'corpus_digest': digest,
+            'tariffs': len(tariffs),
+            'build_ms': build_ms,
+            'benchmarks': benchmarks,
+            'kinds': {
+                kind: {
+                    'total': counters['total'],
+                    'match_rate': counters['matched'] / counters['total'] if counters['total'] else 0.0,
+                    'accuracy': counters['correct'] / counters['total'] if counters['total'] else 0.0,
+                }
+                for kind, counters in kinds.items()
+            },
+            'labels': labels,
+        }
+        self._print_result(result)
+
+        if options['save_baseline']:
+            Path(options['save_baseline']).write_text(json.dumps(result, ensure_ascii=False, indent=1), 'utf-8')
+            self.stdout.write(f'Прогон сохранен: {options["save_baseline"]}')
+        if options['baseline']:
+            self._compare(result, corpus, options['baseline'], options['max_slowdown'])
+
+    def _tariffs(self, tariffs_file):
+        if not tariffs_file:
+            return read_delivery_tariffs()
+        path = Path(tariffs_file).resolve()
+        if not path.exists():
+            raise CommandError(f'Файл не найден: {path}')
+        try:
+            return read_tariffs_file(path)
+        except TariffFileFormatError as exc:
+            raise CommandError(f'Некорректный CSV {path}: {exc}')
+
+    def _dump_corpus(self, path, corpus):
+        with open(path, 'w', encoding='utf-8') as handle:
+            for item in corpus:
+                handle.write(f'{item.address}\t{item.expected or ""}\t{item.kind}\n')
+        self.stdout.write(f'Корпус записан: {path} ({len(corpus)} адресов)')
+
+    def _print_result(self, result):
+        self.stdout.write(
+            f'Тарифов: {result["tariffs"]}, адресов: {result["size"]} (seed {result["seed"]}); '
+            f'сборка автомата {result["build_ms"]:.1f} мс'
+        )
+        self.stdout.write(f'{"Функция":<30} {"вызовов/с":>12} {"p50, мкс":>10} {"p99, мкс":>10}')
+        for name, bench in result['benchmarks'].items():
+            self.stdout.write(f'{name:<30} {bench["ops"]:>12.0f} {bench["p50_us"]:>10.2f} {bench["p99_us"]:>10.2f}')
+        self.stdout.write(f'{"Вид адреса":<30} {"адресов":>12} {"с тарифом":>10} {"верно":>10}')
+        for kind, stats in result['kinds'].items():
+            self.stdout.write(
+                f'{kind:<30} {stats["total"]:>12} {stats["match_rate"]:>10.1%} {stats["accuracy"]:>10.1%}'
+            )
+
+    def _compare(self, result, corpus, baseline_path, max_slowdown):
+        try:
+            baseline = json.loads(Path(baseline_path).read_text('utf-8'))
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Не удалось прочитать {baseline_path}: {exc}')
+
+        problems = []
+        for name, bench in result['benchmarks'].items():
+            before = baseline.get('benchmarks', {}).get(name)
+            if not before or not before.get('p50_us'):
+                continue
+            ratio = bench['p50_us'] / before['p50_us']
+            self.stdout.write(f'{name}: p50 {before["p50_us"]:.2f} → {bench["p50_us"]:.2f} мкс (×{ratio:.2f})')
+            if ratio > max_slowdown:
+                problems.append(f'{name} медленнее в {ratio:.2f} раза')
+
+        for kind, stats in result['kinds'].items():
+            before = baseline.get('kinds', {}).get(kind)
+            if before and stats['accuracy'] < before['accuracy']:
+                problems.append(f'{kind}: верных совпадений {before["accuracy"]:.1%} → {stats["accuracy"]:.1%}')
+
+        if baseline.get('corpus_digest') == result['corpus_digest']:
+            broken = [
+                (item, was, now)
+                for item, was, now in zip(corpus, baseline['labels'], result['labels'])
+                if was == item.expected and now != item.expected
+            ]
+            fixed = sum(
+                1 for item, was, now in zip(corpus, baseline['labels'], result['labels'])
+                if was != item.expected and now == item.expected
+            )
+            self.stdout.write(f'Адресов исправлено: {fixed}, сломано: {len(broken)}')
+            for item, was, now in broken[:10]:
+                self.stdout.write(f'  {item.address!r}: {was} → {now}')
+            if broken:
+                problems.append(f'сломано адресов: {len(broken)}')
+        else:
+            self.stdout.write('Корпус отличается от сохраненного, построчное сравнение пропущено')
+
+        if problems:
+            raise CommandError('Регрессия: ' + '; '.join(problems))
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,105 @@
+"""
+Сверка быстрого пути сериализации с DRF-сериализаторами + микробенчмарк.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Avg, Q
+from rest_framework.renderers import JSONRenderer
+
+from catalog.fast_serializers import build_site_content, product_list_values, serialize_product_rows
+from catalog.models import (
+    Category, Product, Review,
+    SiteSettings, HeroSection, PromoBanner, DeliveryInfo
+)
+from catalog.serializers import (
+    CategorySerializer, ProductListSerializer, ReviewSerializer,
+    SiteSettingsSerializer, HeroSectionSerializer, PromoBannerSerializer, DeliveryInfoSerializer
+)
+
+
+def _classic_site_content() -> dict:
+    # Повторяет views.site_content без cache_page и Response.
+    site_settings = SiteSettings.get_settings()
+    promo_enabled, _ = SiteSettings.get_promo_config()
+    hero = HeroSection.get_hero()
+    promo = PromoBanner.get_promo()
+    delivery = DeliveryInfo.get_delivery_info()
+    categories = Category.objects.filter(is_active=True)
+    products = Product.objects.filter(is_active=True, is_popular=True).select_related('category').order_by('order', 'name')[:6]
+    if not products.exists():
+        products = Product.objects.filter(is_active=True).select_related('category').order_by('order', 'name')[:3]
+    reviews = Review.objects.filter(is_published=True)[:6]
+    return {
+        'settings': SiteSettingsSerializer(site_settings).data,
+        'hero': HeroSectionSerializer(hero).data,
+        'promo': PromoBannerSerializer(promo).data if promo.is_active and promo_enabled else None,
+        'delivery': DeliveryInfoSerializer(delivery).data,
+        'categories': CategorySerializer(categories, many=True).data,
+        'products': ProductListSerializer(products, many=True).data,
+        'reviews': ReviewSerializer(reviews, many=True).data,
+    }
+
+
+def _products_queryset():
+    return Product.objects.filter(is_active=True).select_related('category').order_by('order', '-is_popular', 'id')
+
+
+def _classic_products() -> list:
+    queryset = _products_queryset().annotate(
+        average_rating=Avg('reviews__rating', filter=Q(reviews__is_published=True))
+    )
+    return ProductListSerializer(queryset, many=True).data
+
+
+def _fast_products() -> list:
+    return serialize_product_rows(product_list_values(_products_queryset()))
+
+
+class Command(BaseCommand):
+    help = "Сравнить JSON быстрого пути и DRF-сериализаторов и замерить скорость."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=200,
+            help="Сколько раз повторять каждый вариант при замере.",
+        )
+
+    def handle(self, *args, **options):
+        repeat = max(1, int(options["repeat"]))
+        renderer = JSONRenderer()
+        cases = [
+            ("site_content", _classic_site_content, build_site_content),
+            ("products", _classic_products, _fast_products),
+        ]
+
+        mismatches = []
+        for name, classic, fast in cases:
+            classic_bytes = renderer.render(classic())
+            fast_bytes = renderer.render(fast())
+            if classic_bytes != fast_bytes:
+                mismatches.append(name)
+                self.stdout.write(self.style.ERROR(f"{name}: JSON отличается"))
+                self.stdout.write(f"  drf:  {classic_bytes[:500]!r}")
+                self.stdout.write(f"  fast: {fast_bytes[:500]!r}")
+                continue
+
+            classic_ms = self._measure(classic, renderer, repeat)
+            fast_ms = self._measure(fast, renderer, repeat)
+            speedup = classic_ms / fast_ms if fast_ms else 0
+            self.stdout.write(self.style.SUCCESS(
+                f"{name}: совпадает ({len(fast_bytes)} байт). "
+                f"drf {classic_ms:.3f} мс, fast {fast_ms:.3f} мс, x{speedup:.1f}"
+            ))
+
+        if mismatches:
+            raise CommandError(f"Расхождения в: {', '.join(mismatches)}")
+
+    @staticmethod
+    def _measure(build, renderer, repeat: int) -> float:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            renderer.render(build())
+        return (time.perf_counter() - started) * 1000 / repeat
@@ -0,0 +1,89 @@
+"""
+Проверка, что горячие запросы бота к заказам идут по индексам.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+
+from catalog.models import Order, OrderArchive
+
+_CURSOR_TIME = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+
+# (запрос, построитель QuerySet, индекс, который должен попасть в план)
+HOT_QUERIES = (
+    (
+        'Мои заказы / акции',
+        lambda: Order.objects.filter(telegram_user_id=123456789).order_by('-created_at')[:10],
+        'order_user_created_idx',
+    ),
+    (
+        'Мои заказы: архив',
+        lambda: OrderArchive.objects.filter(telegram_user_id=123456789).order_by('-created_at')[:10],
+        'orderarchive_user_created_idx',
+    ),
+    (
+        'Скидка постоянного клиента',
+        lambda: Order.objects.filter(phone_normalized='79991234567', status='completed').order_by().values('pk')[:1],
+        'order_phone_completed_idx',
+    ),
+    (
+        'Вебхук YooKassa',
+        lambda: Order.objects.filter(payment_id='2c5d1d5e-000f-5000-9000-1b68e7b15f3f')[:1],
+        'order_payment_id_idx',
+    ),
+    (
+        'Заказы в админке бота: следующая страница',
+        lambda: Order.objects.filter(created_at__lte=_CURSOR_TIME).filter(
+            Q(created_at__lt=_CURSOR_TIME) | Q(id__lt=100000)
+        ).order_by('-created_at', '-id')[:11],
+        'order_created_id_idx',
+    ),
+    (
+        'Заказы в админке бота: фильтр по статусу',
+        lambda: Order.objects.filter(status='processing', created_at__lte=_CURSOR_TIME).filter(
+            Q(created_at__lt=_CURSOR_TIME) | Q(id__lt=100000)
+        ).order_by('-created_at', '-id')[:11],
+        'order_status_created_id_idx',
+    ),
+)
+
+
+def query_plan(queryset) -> str:
+    """EXPLAIN запроса на текущей БД (SQLite или PostgreSQL)."""
+    if connection.vendor == 'sqlite':
+        return queryset.explain()
+    # На маленькой таблице Postgres честно выбирает seq scan; запрещаем
+    # его на время проверки, чтобы увидеть, годится ли индекс вообще.
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+
+class Command(BaseCommand):
+    help = "Показать планы горячих запросов к заказам и упасть, если нужный индекс не используется"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help='Печатать план целиком.')
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if vendor not in {'sqlite', 'postgresql'}:
+            raise CommandError(f'Проверка планов поддерживает SQLite и PostgreSQL, а не {vendor}')
+
+        failed = []
+        for label, build_queryset, index_name in HOT_QUERIES:
+            plan = query_plan(build_queryset())
+            used = index_name in plan
+            mark = self.style.SUCCESS('OK') if used else self.style.ERROR('НЕТ')
+            self.stdout.write(f'{mark} {label}: {index_name}')
+            if options['verbose_plans'] or not used:
+                for line in plan.splitlines():
+                    self.stdout.write(f'    {line}')
+            if not used:
+                failed.append(label)
+
+        if failed:
+            raise CommandError('Индексы не используются: ' + ', '.join(failed))
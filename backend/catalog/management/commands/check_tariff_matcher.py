@@ -0,0 +1,91 @@
+"""
+Сверка и замер автомата тарифов доставки с прежним перебором алиасов.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.delivery_tariffs import TariffMatcher, load_delivery_tariffs, normalize_address_text
+
+
+def legacy_match(tariffs, address):
+    """Прежний алгоритм `_get_fixed_tariff_by_address`: перебор с нормализацией алиасов."""
+    normalized_address = normalize_address_text(address)
+    if not normalized_address:
+        return None
+    for aliases, cost, label in tariffs:
+        for alias in aliases:
+            normalized_alias = normalize_address_text(alias)
+            if normalized_alias and normalized_alias in normalized_address:
+                return aliases, cost, label
+    return None
+
+
+def build_address_corpus(tariffs) -> list[str]:
+    addresses = [
+        '',
+        'Москва, Тверская улица, 1',
+        'ул. Ленина 5, кв 12',
+        'Республика Башкортостан',
+    ]
+    for aliases, _cost, label in tariffs:
+        addresses.append(label)
+        addresses.append(f'Республика Башкортостан, Альшеевский район, {label}, ул. Ленина, д. 5')
+        addresses.append(f'{label.upper().replace("Е", "Ё")} Садовая 3')
+        for alias in aliases:
+            addresses.append(alias)
+            addresses.append(f'с. {alias}, ул. Мира 10')
+    return addresses
+
+
+class Command(BaseCommand):
+    help = 'Проверяет, что автомат тарифов совпадает с прежним перебором, и сравнивает скорость'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Сколько раз прогнать корпус при замере')
+
+    def handle(self, *args, **options):
+        tariffs = load_delivery_tariffs()
+        started = time.perf_counter()
+        matcher = TariffMatcher(tariffs)
+        build_ms = (time.perf_counter() - started) * 1000
+        addresses = build_address_corpus(tariffs)
+
+        mismatches = []
+        matched = 0
+        for address in addresses:
+            expected = legacy_match(tariffs, address)
+            actual = matcher.match(address)
+            if expected is not None:
+                matched += 1
+            if expected != actual:
+                mismatches.append((address, expected and expected[2], actual and actual[2]))
+
+        repeat = max(1, options['repeat'])
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for address in addresses:
+                legacy_match(tariffs, address)
+        legacy_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for address in addresses:
+                matcher.match(address)
+        matcher_seconds = time.perf_counter() - started
+
+        lookups = repeat * len(addresses)
+        self.stdout.write(
+            f'Тарифов: {len(tariffs)}, алиасов: {sum(len(t[0]) for t in tariffs)}, '
+            f'адресов: {len(addresses)} (с тарифом: {matched}); сборка автомата {build_ms:.1f} мс'
+        )
+        self.stdout.write(f'Перебор:  {legacy_seconds / lookups * 1e6:.1f} мкс/адрес')
+        self.stdout.write(f'Автомат:  {matcher_seconds / lookups * 1e6:.1f} мкс/адрес')
+        if matcher_seconds:
+            self.stdout.write(f'Ускорение: x{legacy_seconds / matcher_seconds:.1f}')
+
+        if mismatches:
+            for address, expected, actual in mismatches[:20]:
+                self.stdout.write(self.style.ERROR(f'{address!r}: было {expected!r}, стало {actual!r}'))
+            raise CommandError(f'Расхождений: {len(mismatches)}')
+        self.stdout.write(self.style.SUCCESS('Результаты совпадают'))
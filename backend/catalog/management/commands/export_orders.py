@@ -0,0 +1,51 @@
+"""
+Выгрузка заказов в CSV (та же, что кнопка «Экспорт заказов» в боте).
+"""
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.models import Order
+from catalog.order_export import DEFAULT_CHUNK_SIZE, ExportFilters, export_orders
+
+
+class Command(BaseCommand):
+    help = (
+        "Выгрузить заказы (вместе с архивом) в CSV потоково, пачками по ключу, "
+        "с фильтрами по датам и статусам"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Куда писать (по умолчанию media/exports/orders_latest.csv[.gz]).')
+        parser.add_argument('--from', dest='date_from', help='Заказы с этой даты (YYYY-MM-DD).')
+        parser.add_argument('--to', dest='date_to', help='Заказы по эту дату включительно (YYYY-MM-DD).')
+        parser.add_argument('--status', action='append', default=[], help='Статус заказа (можно несколько раз).')
+        parser.add_argument('--gzip', action='store_true', help='Сжать выгрузку gzip.')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Заказов в одной пачке.')
+
+    def handle(self, *args, **options):
+        statuses = {choice[0] for choice in Order.STATUS_CHOICES}
+        unknown = [status for status in options['status'] if status not in statuses]
+        if unknown:
+            raise CommandError(f'Неизвестный статус: {", ".join(unknown)}')
+        filters = ExportFilters(
+            date_from=self._date(options['date_from'], '--from'),
+            date_to=self._date(options['date_to'], '--to'),
+            statuses=tuple(dict.fromkeys(options['status'])),
+            compress=options['gzip'],
+        )
+
+        started = time.perf_counter()
+        path, count = export_orders(options['output'], filters, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Заказов: {count} ({filters.describe()}) за {time.perf_counter() - started:.2f} с → {path}'
+        ))
+
+    def _date(self, value, option):
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'{option}: ожидается дата в формате YYYY-MM-DD')
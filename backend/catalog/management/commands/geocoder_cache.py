@@ -0,0 +1,37 @@
+"""
+Статистика и обслуживание кэша геокодера.
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from catalog.models import GeocodeCacheEntry
+
+
+class Command(BaseCommand):
+    help = 'Показывает статистику кэша геокодера, удаляет устаревшие записи'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--purge-expired', action='store_true', help='Удалить записи с истекшим сроком')
+        parser.add_argument('--clear', action='store_true', help='Удалить все записи')
+        parser.add_argument('--top', type=int, default=10, help='Сколько самых частых запросов показать')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        if options['clear']:
+            deleted, _ = GeocodeCacheEntry.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS(f'Удалено записей: {deleted}'))
+            return
+        if options['purge_expired']:
+            deleted, _ = GeocodeCacheEntry.objects.filter(expires_at__lte=now).delete()
+            self.stdout.write(self.style.SUCCESS(f'Удалено устаревших записей: {deleted}'))
+
+        for row in GeocodeCacheEntry.objects.values('kind').annotate(entries=Count('id'), hits=Sum('hits')).order_by('kind'):
+            self.stdout.write(f"{row['kind']}: записей {row['entries']}, попаданий {row['hits'] or 0}")
+        expired = GeocodeCacheEntry.objects.filter(expires_at__lte=now).count()
+        empty = GeocodeCacheEntry.objects.filter(is_empty=True).count()
+        self.stdout.write(f'Устаревших: {expired}, пустых ответов: {empty}')
+
+        top = GeocodeCacheEntry.objects.filter(hits__gt=0).order_by('-hits')[:max(0, options['top'])]
+        for entry in top:
+            self.stdout.write(f'  {entry.hits:>5}  {entry.query}')
@@ -0,0 +1,83 @@
+"""
+Переименование уже загруженных изображений в имена с хешем содержимого.
+"""
+import os
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+
+from catalog.models import ImageJob
+from catalog.storage import content_hash, is_hashed_name, is_managed_image_name
+from catalog.thumbnails import variants_field_name
+
+
+class Command(BaseCommand):
+    help = 'Добавляет хеш содержимого в имена загруженных изображений (для immutable-кэширования)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только показать, что будет переименовано')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        # Один файл может быть у нескольких объектов: переименовываем его один раз.
+        renamed: dict[str, str] = {}
+        updated = missing = 0
+
+        for model in apps.get_app_config('catalog').get_models():
+            for field in model._meta.get_fields():
+                if not isinstance(field, models.FileField):
+                    continue
+                variants_attr = variants_field_name(field.name)
+                has_variants = any(f.name == variants_attr for f in model._meta.get_fields())
+                only = ['pk', field.name] + ([variants_attr] if has_variants else [])
+                queryset = (
+                    model.objects.exclude(**{field.name: ''})
+                    .exclude(**{f'{field.name}__isnull': True})
+                    .only(*only)
+                    .order_by('pk')
+                )
+                for obj in queryset.iterator():
+                    file_field = getattr(obj, field.name)
+                    name = file_field.name
+                    if is_hashed_name(name) or not is_managed_image_name(name):
+                        continue
+                    storage = file_field.storage
+
+                    new_name = renamed.get(name)
+                    if new_name is None:
+                        if not storage.exists(name):
+                            missing += 1
+                            self.stdout.write(self.style.WARNING(f'{model._meta.label} #{obj.pk}: нет файла {name}'))
+                            continue
+                        with storage.open(name, 'rb') as fh:
+                            digest = content_hash(fh.read())
+                        new_name = storage.get_available_hashed_name(name, digest, field.max_length)
+
+                    self.stdout.write(f'{model._meta.label} #{obj.pk}.{field.name}: {name} -> {new_name}')
+                    if dry_run:
+                        renamed[name] = new_name
+                        continue
+
+                    changes = {field.name: new_name}
+                    if has_variants:
+                        variants = getattr(obj, variants_attr) or {}
+                        if variants.get('source') == name:
+                            changes[variants_attr] = {**variants, 'source': new_name}
+                    with transaction.atomic():
+                        model.objects.filter(pk=obj.pk).update(**changes)
+                        ImageJob.objects.filter(
+                            model_label=model._meta.label, object_id=obj.pk, field_name=field.name, source_name=name,
+                        ).update(source_name=new_name)
+                        if name not in renamed:
+                            # Файл переносим внутри транзакции: при ошибке БД не укажет на пустое место.
+                            os.replace(storage.path(name), storage.path(new_name))
+                    renamed[name] = new_name
+                    updated += 1
+
+        summary = f'Переименовано файлов: {len(renamed)}, обновлено записей: {updated}'
+        if missing:
+            summary += f', без файла: {missing}'
+        if dry_run:
+            summary += ' (dry-run, ничего не изменено)'
+        self.stdout.write(self.style.SUCCESS(summary))
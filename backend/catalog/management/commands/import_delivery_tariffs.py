@@ -1,14 +1,17 @@
-import csv
-from decimal import Decimal
 from pathlib import Path
 
 from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
-from catalog.delivery_tariffs import parse_cost_value
+from catalog.delivery_tariffs import TariffFileFormatError, parse_tariffs_csv, tariff_registry
+from catalog.models import DeliveryTariff, DeliveryTariffVersion
 
 
 class Command(BaseCommand):
-    help = "Проверить/подготовить CSV тарифов доставки (aliases,cost,label)."
+    help = (
+        "Импортировать тарифы доставки из CSV в БД (aliases,cost,label "
+        "или Буква,Населенный_пункт,Стоимость). Существующие пункты обновляются."
+    )
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -17,53 +20,76 @@ class Command(BaseCommand):
             default="catalog/data/delivery_tariffs.csv",
             help="Путь к CSV файлу тарифов.",
         )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только проверить файл, ничего не записывать.",
+        )
+        parser.add_argument(
+            "--deactivate-missing",
+            action="store_true",
+            help="Выключить тарифы из БД, которых нет в файле.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Размер пачки для bulk_create.",
+        )
 
     def handle(self, *args, **options):
         file_path = Path(options["file_path"]).resolve()
         if not file_path.exists():
             raise CommandError(f"Файл не найден: {file_path}")
 
-        with file_path.open("r", encoding="utf-8-sig", newline="") as f:
-            reader = csv.DictReader(f)
-            fieldnames = set(reader.fieldnames or [])
-            flat_required = {"aliases", "cost", "label"}
-            source_required = {"Населенный_пункт", "Стоимость"}
-            if not flat_required.issubset(fieldnames) and not source_required.issubset(fieldnames):
-                raise CommandError(
-                    "CSV должен содержать колонки aliases,cost,label "
-                    "или Буква,Населенный_пункт,Стоимость. "
-                    f"Сейчас: {reader.fieldnames}"
-                )
-            flat_format = flat_required.issubset(fieldnames)
+        try:
+            merged = parse_tariffs_csv(file_path)
+        except TariffFileFormatError as exc:
+            raise CommandError(f"Некорректный CSV {file_path}: {exc}")
 
-            total = 0
-            valid = 0
-            manual_required = 0
-            for idx, row in enumerate(reader, start=2):
-                total += 1
-                if flat_format:
-                    aliases_raw = (row.get("aliases") or "").strip()
-                    cost_raw = (row.get("cost") or "").strip()
-                    has_place = bool(aliases_raw)
-                else:
-                    place_name = (row.get("Населенный_пункт") or "").strip()
-                    cost_raw = (row.get("Стоимость") or "").strip()
-                    has_place = bool(place_name)
+        tariffs = [
+            DeliveryTariff(
+                label=item["label"],
+                key=key,
+                aliases="|".join(sorted(item["aliases"], key=len, reverse=True)),
+                cost=item["cost"],
+                is_active=True,
+            )
+            for key, item in merged.items()
+        ]
+        manual_required = sum(1 for tariff in tariffs if tariff.cost is None)
+        summary = (
+            f"{len(tariffs)} населенных пунктов в {file_path}. "
+            f"Из них ручной расчет: {manual_required}"
+        )
+        if options["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(f"Ок (dry-run): {summary}"))
+            return
 
-                if not has_place:
-                    continue
-                cost = parse_cost_value(cost_raw)
-                if cost is None:
-                    manual_required += 1
-                else:
-                    try:
-                        Decimal(str(cost))
-                    except Exception:
-                        self.stdout.write(self.style.WARNING(f"Строка {idx}: некорректная цена {cost_raw!r}"))
-                        continue
-                valid += 1
+        existing_keys = set(DeliveryTariff.objects.values_list("key", flat=True))
+        with transaction.atomic():
+            # Приоритет задается в админке, поэтому при повторном импорте его не трогаем.
+            DeliveryTariff.objects.bulk_create(
+                tariffs,
+                batch_size=max(1, options["batch_size"]),
+                update_conflicts=True,
+                unique_fields=["key"],
+                update_fields=["label", "aliases", "cost", "is_active", "updated_at"],
+            )
+            deactivated = 0
+            if options["deactivate_missing"]:
+                deactivated = (
+                    DeliveryTariff.objects.filter(is_active=True)
+                    .exclude(key__in=list(merged))
+                    .update(is_active=False)
+                )
+            # bulk_create не шлет сигналы — версию поднимаем сами.
+            DeliveryTariffVersion.bump()
 
-        self.stdout.write(self.style.SUCCESS(
-            f"Ок: {valid} валидных строк из {total} в {file_path}. "
-            f"Из них ручной расчет: {manual_required}"
-        ))
+        created = len(merged.keys() - existing_keys)
+        updated = len(tariffs) - created
+        tariff_registry.reload()
+        message = f"Импортировано: {summary}. Новых: {created}, обновлено: {updated}"
+        if options["deactivate_missing"]:
+            message += f", выключено отсутствующих: {deactivated}"
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,57 @@
+"""
+Оптимизация уже загруженных изображений в MEDIA_ROOT.
+"""
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from catalog.storage import format_bytes_saved, is_hashed_name, optimize_image_bytes
+
+
+class Command(BaseCommand):
+    help = (
+        'Уменьшает, очищает от EXIF и пережимает уже загруженные изображения (как при новой загрузке). '
+        'Запускать до hash_media_names'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать экономию, файлы не менять')
+        parser.add_argument('paths', nargs='*', help='Подкаталоги MEDIA_ROOT (по умолчанию весь каталог)')
+
+    def handle(self, *args, **options):
+        media_root = Path(settings.MEDIA_ROOT)
+        roots = [media_root / path for path in options['paths']] or [media_root]
+
+        checked = optimized_count = before_total = after_total = 0
+        for root in roots:
+            for path in sorted(root.rglob('*')):
+                if not path.is_file():
+                    continue
+                name = path.relative_to(media_root).as_posix()
+                if is_hashed_name(name):
+                    # Сохранен через OptimizedImageStorage — уже оптимизирован, а
+                    # менять содержимое под неизменяемым URL нельзя.
+                    continue
+                data = path.read_bytes()
+                optimized = optimize_image_bytes(data, name)
+                checked += 1
+                if optimized is None:
+                    continue
+                optimized_count += 1
+                before_total += len(data)
+                after_total += len(optimized)
+                self.stdout.write(f'{name}: {format_bytes_saved(len(data), len(optimized))}')
+                if not options['dry_run']:
+                    # Через временный файл, чтобы не оставить битое изображение при сбое.
+                    tmp_path = path.with_name(f'.{path.name}.tmp')
+                    tmp_path.write_bytes(optimized)
+                    os.replace(tmp_path, path)
+
+        summary = f'Проверено файлов: {checked}, оптимизировано: {optimized_count}'
+        if optimized_count:
+            summary += f'; {format_bytes_saved(before_total, after_total)}'
+        if options['dry_run']:
+            summary += ' (dry-run, файлы не изменены)'
+        self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,37 @@
+"""
+Воркер очереди обработки изображений.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog.image_queue import ImageJobRunner, default_workers
+
+
+class Command(BaseCommand):
+    help = 'Готовит варианты изображений (srcset) из очереди ImageJob в пуле процессов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=0, help='Число процессов (по умолчанию THUMBNAIL_WORKERS или число ядер)')
+        parser.add_argument('--batch-size', type=int, default=0, help='Сколько задач забирать за раз')
+        parser.add_argument('--interval', type=float, default=5.0, help='Пауза между опросами пустой очереди, сек')
+        parser.add_argument('--once', action='store_true', help='Обработать очередь и выйти')
+
+    def handle(self, *args, **options):
+        workers = options['workers'] or default_workers()
+        batch_size = options['batch_size'] or workers * 2
+        self.stdout.write(f'Воркер изображений: процессов {workers}, пачка {batch_size}')
+
+        with ImageJobRunner(workers) as runner:
+            while True:
+                processed = runner.run_pending(batch_size, on_result=self._report)
+                if processed:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS('Очередь изображений пуста'))
+
+    def _report(self, job, outcome, seconds):
+        self.stdout.write(f'{job} {job.source_name}: {outcome} ({seconds:.2f} с)')
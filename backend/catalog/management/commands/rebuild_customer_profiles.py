@@ -0,0 +1,28 @@
+"""
+Пересборка сводок по клиентам из заказов.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog.models import OrderArchive
+from catalog.customer_profiles import rebuild_customer_profiles
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересобрать сводки по клиентам (заказов, завершенных, сумма, последний заказ) "
+        "по всем заказам; нужна после массовых правок заказов мимо бота"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Строк в одной вставке.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = rebuild_customer_profiles(
+            batch_size=max(1, options['batch_size']), archive_model=OrderArchive,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Сводок: {count} за {time.perf_counter() - started:.2f} с'
+        ))
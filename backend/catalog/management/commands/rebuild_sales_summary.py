@@ -0,0 +1,23 @@
+"""
+Пересчет дневных сводок продаж по всей истории заказов.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog.models import OrderArchive
+from catalog.sales_summary import rebuild_sales_summary
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитать сводки продаж по дням и товарам агрегацией в БД; "
+        "нужна после массовых правок заказов мимо бота и админки"
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        days, products = rebuild_sales_summary(archive_model=OrderArchive)
+        self.stdout.write(self.style.SUCCESS(
+            f'Дней: {days}, строк по товарам: {products} за {time.perf_counter() - started:.2f} с'
+        ))
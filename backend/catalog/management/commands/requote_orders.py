@@ -0,0 +1,194 @@
+"""
+Пересчет доставки прошлых заказов по новым тарифам до их публикации.
+"""
+import csv
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from catalog import tariff_worker
+from catalog.delivery_tariffs import (
+    TariffFileFormatError, load_tariffs_source, read_delivery_tariffs, read_tariffs_file,
+)
+from catalog.models import Order
+
+NO_TARIFF_LABEL = '(без тарифа)'
+CSV_HEADER = [
+    'order_id', 'address', 'delivery_price', 'current_label', 'current_cost', 'new_label', 'new_cost', 'delta',
+]
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class _LabelStats:
+    __slots__ = ('orders', 'changed', 'manual', 'moved', 'charged', 'quoted', 'delta')
+
+    def __init__(self):
+        self.orders = self.changed = self.manual = self.moved = 0
+        self.charged = self.quoted = self.delta = Decimal('0')
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитать доставку прошлых заказов по новым тарифам и показать разницу "
+        "по каждому тарифу (заказы читаются потоком, сопоставление — в пуле процессов)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tariffs-file',
+            help='CSV с новыми тарифами. По умолчанию — DELIVERY_TARIFFS_FILE (сравнение БД с файлом).',
+        )
+        parser.add_argument('--csv', dest='csv_path', help='Записать построчный результат в CSV.')
+        parser.add_argument('--only-changed', action='store_true', help='В CSV только заказы с изменениями.')
+        parser.add_argument('--since', help='Только заказы, созданные с этой даты (YYYY-MM-DD).')
+        parser.add_argument('--workers', type=int, default=0, help='Число процессов (по умолчанию — по ядрам).')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Заказов в одной пачке для процесса.')
+
+    def handle(self, *args, **options):
+        current_tariffs = load_tariffs_source()
+        new_tariffs = self._new_tariffs(options['tariffs_file'])
+
+        orders = Order.objects.order_by().values_list('id', 'address', 'delivery_price')
+        if options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d')
+            except ValueError:
+                raise CommandError('--since: ожидается дата в формате YYYY-MM-DD')
+            orders = orders.filter(created_at__gte=timezone.make_aware(since))
+
+        workers = options['workers'] if options['workers'] > 0 else (os.cpu_count() or 1)
+        chunk_size = max(1, options['chunk_size'])
+        csv_file = writer = None
+        if options['csv_path']:
+            csv_file = open(options['csv_path'], 'w', newline='', encoding='utf-8')
+            writer = csv.writer(csv_file)
+            writer.writerow(CSV_HEADER)
+
+        stats: dict[str, _LabelStats] = {}
+        started = time.perf_counter()
+        try:
+            total = 0
+            for rows in self._requote(orders.iterator(chunk_size=chunk_size), current_tariffs, new_tariffs,
+                                      workers, chunk_size):
+                total += len(rows)
+                self._collect(rows, stats, writer, options['only_changed'])
+        finally:
+            if csv_file is not None:
+                csv_file.close()
+        elapsed = time.perf_counter() - started
+
+        self._print_summary(stats)
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Заказов: {total} за {elapsed:.2f} с ({rate:.0f}/с, процессов: {workers})'
+        ))
+        if options['csv_path']:
+            self.stdout.write(f'CSV: {options["csv_path"]}')
+
+    def _new_tariffs(self, tariffs_file):
+        if not tariffs_file:
+            return read_delivery_tariffs()
+        path = Path(tariffs_file).resolve()
+        if not path.exists():
+            raise CommandError(f'Файл не найден: {path}')
+        try:
+            return read_tariffs_file(path)
+        except TariffFileFormatError as exc:
+            raise CommandError(f'Некорректный CSV {path}: {exc}')
+
+    def _requote(self, rows, current_tariffs, new_tariffs, workers, chunk_size):
+        chunks = _chunks(rows, chunk_size)
+        if workers <= 1:
+            tariff_worker.init_worker(current_tariffs, new_tariffs)
+            for chunk in chunks:
+                yield tariff_worker.requote(chunk)
+            return
+
+        # Пачки читаем из БД в этом потоке и держим в работе не больше двух
+        # на процесс, чтобы не тянуть в память всю таблицу.
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=tariff_worker.init_worker,
+            initargs=(current_tariffs, new_tariffs),
+        ) as executor:
+            in_flight = deque()
+            for chunk in chunks:
+                in_flight.append(executor.submit(tariff_worker.requote, chunk))
+                if len(in_flight) >= workers * 2:
+                    yield in_flight.popleft().result()
+            while in_flight:
+                yield in_flight.popleft().result()
+
+    def _collect(self, rows, stats, writer, only_changed):
+        for order_id, address, delivery_price, current, new in rows:
+            charged = delivery_price or Decimal('0')
+            label = new[0] if new else NO_TARIFF_LABEL
+            item = stats.get(label)
+            if item is None:
+                item = stats[label] = _LabelStats()
+            item.orders += 1
+            item.charged += charged
+
+            new_cost = new[1] if new else None
+            delta = None
+            if new_cost is None:
+                item.manual += 1
+            else:
+                delta = new_cost - charged
+                item.quoted += new_cost
+                item.delta += delta
+                if delta:
+                    item.changed += 1
+            moved = (current and current[0]) != (new and new[0])
+            if moved:
+                item.moved += 1
+
+            if writer is not None and (not only_changed or moved or delta):
+                writer.writerow([
+                    order_id,
+                    address,
+                    charged,
+                    current[0] if current else '',
+                    '' if not current or current[1] is None else current[1],
+                    new[0] if new else '',
+                    '' if new_cost is None else new_cost,
+                    '' if delta is None else delta,
+                ])
+
+    def _print_summary(self, stats):
+        header = (
+            f'{"Тариф":<32} {"заказов":>8} {"изменится":>9} {"ручной":>7} {"сменит тариф":>12} '
+            f'{"было, ₽":>12} {"станет, ₽":>12} {"разница, ₽":>12}'
+        )
+        self.stdout.write(header)
+        totals = _LabelStats()
+        for label, item in sorted(stats.items(), key=lambda pair: (-abs(pair[1].delta), pair[0])):
+            self.stdout.write(
+                f'{label[:32]:<32} {item.orders:>8} {item.changed:>9} {item.manual:>7} {item.moved:>12} '
+                f'{item.charged:>12.2f} {item.quoted:>12.2f} {item.delta:>+12.2f}'
+            )
+            for field in _LabelStats.__slots__:
+                setattr(totals, field, getattr(totals, field) + getattr(item, field))
+        self.stdout.write(
+            f'{"Итого":<32} {totals.orders:>8} {totals.changed:>9} {totals.manual:>7} {totals.moved:>12} '
+            f'{totals.charged:>12.2f} {totals.quoted:>12.2f} {totals.delta:>+12.2f}'
+        )
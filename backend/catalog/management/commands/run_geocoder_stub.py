@@ -0,0 +1,103 @@
+"""
+Локальная заглушка Яндекс.Геокодера для разработки и проверок.
+
+    python manage.py run_geocoder_stub --port 8099
+    YANDEX_GEOCODER_URL=http://127.0.0.1:8099/ python manage.py ...
+"""
+import hashlib
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from django.core.management.base import BaseCommand
+
+# Центр Раевского — от него раскладываются "найденные" точки.
+_BASE_LAT = 54.0650
+_BASE_LON = 54.9300
+
+
+def _feature(text: str, lat: float, lon: float, components: list[dict]) -> dict:
+    return {
+        'GeoObject': {
+            'metaDataProperty': {
+                'GeocoderMetaData': {
+                    'text': text,
+                    'Address': {'formatted': text, 'Components': components},
+                },
+            },
+            'Point': {'pos': f'{lon:.6f} {lat:.6f}'},
+        },
+    }
+
+
+def stub_response(query: str) -> dict:
+    query = (query or '').strip()
+    features = []
+    if query and 'нигде' not in query.lower():
+        parts = [part.strip() for part in query.split(',') if part.strip()]
+        try:
+            lon, lat = (float(value) for value in query.split(','))
+            text = f'Россия, Республика Башкортостан, Альшеевский район, село Раевский, точка {lat:.4f} {lon:.4f}'
+            components = [
+                {'kind': 'country', 'name': 'Россия'},
+                {'kind': 'province', 'name': 'Республика Башкортостан'},
+                {'kind': 'area', 'name': 'Альшеевский район'},
+                {'kind': 'locality', 'name': 'село Раевский'},
+            ]
+        except ValueError:
+            digest = int(hashlib.md5(query.encode('utf-8')).hexdigest()[:8], 16)
+            lat = _BASE_LAT + (digest % 2000 - 1000) / 10000
+            lon = _BASE_LON + (digest // 2000 % 2000 - 1000) / 10000
+            text = f'Россия, Республика Башкортостан, {query}'
+            components = [
+                {'kind': 'country', 'name': 'Россия'},
+                {'kind': 'province', 'name': 'Республика Башкортостан'},
+            ] + [{'kind': 'locality', 'name': part} for part in parts[:1]]
+        features.append(_feature(text, lat, lon, components))
+    return {
+        'response': {
+            'GeoObjectCollection': {
+                'metaDataProperty': {'GeocoderResponseMetaData': {'request': query, 'found': str(len(features))}},
+                'featureMember': features,
+            },
+        },
+    }
+
+
+class Command(BaseCommand):
+    help = 'Запускает локальную заглушку Яндекс.Геокодера (адрес "нигде" — пустой ответ)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8099)
+        parser.add_argument('--delay', type=float, default=0.0, help='Искусственная задержка ответа, сек')
+
+    def handle(self, *args, **options):
+        delay = options['delay']
+        stdout = self.stdout
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                params = parse_qs(urlparse(self.path).query)
+                if delay:
+                    time.sleep(delay)
+                body = json.dumps(stub_response((params.get('geocode') or [''])[0]), ensure_ascii=False)
+                payload = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, fmt, *args):
+                stdout.write(f'{self.address_string()} {fmt % args}')
+
+        server = ThreadingHTTPServer((options['host'], options['port']), Handler)
+        self.stdout.write(f"Заглушка геокодера: http://{options['host']}:{options['port']}/")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.1 on 2026-10-19 10:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0014_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_label', models.CharField(max_length=100, verbose_name='Модель')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='ID объекта')),
+                ('field_name', models.CharField(max_length=50, verbose_name='Поле')),
+                ('source_name', models.CharField(max_length=255, verbose_name='Файл')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('processing', 'В работе'), ('done', 'Готово'), ('failed', 'Ошибка')], default='pending', max_length=20, verbose_name='Статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='Взята в работу')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создана')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлена')),
+            ],
+            options={
+                'verbose_name': 'Задача обработки изображения',
+                'verbose_name_plural': 'Очередь обработки изображений',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'id'], name='catalog_ima_status_c40bb2_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='imagejob',
+            constraint=models.UniqueConstraint(fields=('model_label', 'object_id', 'field_name'), name='catalog_imagejob_unique_target'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.0.1 on 2026-10-19 10:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0015_image_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryTariff',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(max_length=200, verbose_name='Населенный пункт')),
+                ('key', models.CharField(editable=False, max_length=200, unique=True, verbose_name='Ключ')),
+                ('aliases', models.TextField(blank=True, help_text='Через | или с новой строки. Если пусто — строятся из названия (с./д., скобки).', verbose_name='Варианты написания')),
+                ('cost', models.DecimalField(blank=True, decimal_places=2, help_text='Пусто — стоимость согласует менеджер', max_digits=10, null=True, verbose_name='Стоимость')),
+                ('priority', models.IntegerField(default=0, help_text='При совпадении нескольких пунктов выигрывает больший приоритет, затем более длинное название', verbose_name='Приоритет')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Активен')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создан')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлен')),
+            ],
+            options={
+                'verbose_name': 'Тариф доставки',
+                'verbose_name_plural': 'Тарифы доставки',
+                'ordering': ['-priority', 'label'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DeliveryTariffVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Версия')),
+            ],
+            options={
+                'verbose_name': 'Версия тарифов доставки',
+                'verbose_name_plural': 'Версия тарифов доставки',
+            },
+        ),
+    ]
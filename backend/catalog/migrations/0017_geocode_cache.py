@@ -0,0 +1,33 @@
+# Generated by Django 5.0.1 on 2026-10-19 10:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0016_delivery_tariff'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodeCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key_hash', models.CharField(max_length=64, unique=True, verbose_name='Хеш ключа')),
+                ('kind', models.CharField(choices=[('forward', 'Адрес → координаты'), ('reverse', 'Координаты → адрес')], max_length=20, verbose_name='Тип')),
+                ('query', models.TextField(verbose_name='Запрос')),
+                ('response', models.JSONField(verbose_name='Ответ геокодера')),
+                ('is_empty', models.BooleanField(default=False, verbose_name='Пустой ответ')),
+                ('hits', models.PositiveIntegerField(default=0, verbose_name='Попаданий')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создан')),
+                ('last_hit_at', models.DateTimeField(blank=True, null=True, verbose_name='Последнее попадание')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Действует до')),
+            ],
+            options={
+                'verbose_name': 'Ответ геокодера',
+                'verbose_name_plural': 'Кэш геокодера',
+                'ordering': ['-hits', '-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.0.1 on 2026-10-19 10:40
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+
+
+def build_customer_profiles(apps, schema_editor):
+    # Своя копия пересборки только на исторических моделях: код
+    # catalog.customer_profiles меняется вместе с живыми моделями. Потом
+    # сводки пересобирает `manage.py rebuild_customer_profiles`.
+    Order = apps.get_model('catalog', 'Order')
+    CustomerProfile = apps.get_model('catalog', 'CustomerProfile')
+    completed = Q(status='completed')
+    now = timezone.now()
+
+    def aggregate(queryset, field):
+        return (
+            queryset.order_by()
+            .values_list(field)
+            .annotate(
+                orders=Count('id'),
+                done=Count('id', filter=completed),
+                spend=Sum('total_price', filter=completed),
+                last_id=Max('id'),
+            )
+        )
+
+    user_rows = list(aggregate(Order.objects.all(), 'telegram_user_id'))
+    last_ids = [row[4] for row in user_rows]
+    phones = {}
+    for start in range(0, len(last_ids), 1000):
+        phones.update(Order.objects.filter(id__in=last_ids[start:start + 1000]).values_list('id', 'phone_normalized'))
+
+    profiles = [
+        CustomerProfile(
+            kind='telegram', key=str(user_id), order_count=orders, completed_count=done,
+            lifetime_spend=spend or Decimal('0'), last_order_id=last_id,
+            phone_normalized=phones.get(last_id, ''), updated_at=now,
+        )
+        for user_id, orders, done, spend, last_id in user_rows
+    ]
+    profiles.extend(
+        CustomerProfile(
+            kind='phone', key=phone, order_count=orders, completed_count=done,
+            lifetime_spend=spend or Decimal('0'), last_order_id=last_id, updated_at=now,
+        )
+        for phone, orders, done, spend, last_id in aggregate(Order.objects.exclude(phone_normalized=''), 'phone_normalized')
+    )
+    CustomerProfile.objects.bulk_create(profiles, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0018_order_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('telegram', 'Telegram ID'), ('phone', 'Телефон')], max_length=20, verbose_name='Ключ')),
+                ('key', models.CharField(max_length=32, verbose_name='Значение ключа')),
+                ('order_count', models.PositiveIntegerField(default=0, verbose_name='Заказов')),
+                ('completed_count', models.PositiveIntegerField(default=0, verbose_name='Завершено')),
+                ('lifetime_spend', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Сумма завершенных')),
+                ('last_order_id', models.BigIntegerField(blank=True, null=True, verbose_name='Последний заказ')),
+                ('phone_normalized', models.CharField(blank=True, max_length=20, verbose_name='Телефон последнего заказа')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлен')),
+            ],
+            options={
+                'verbose_name': 'Профиль клиента',
+                'verbose_name_plural': 'Профили клиентов',
+                'ordering': ['-updated_at'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='customerprofile',
+            constraint=models.UniqueConstraint(fields=('kind', 'key'), name='catalog_customerprofile_unique_key'),
+        ),
+        migrations.RunPython(build_customer_profiles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,121 @@
+# Generated by Django 5.0.1 on 2026-10-19 10:50
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+# Копия catalog.sales_summary.STATUS_COLUMNS на момент миграции.
+STATUS_COLUMNS = {
+    'new_count': ('new',),
+    'processing_count': ('processing', 'confirmed', 'in_progress', 'delivering'),
+    'ready_count': ('ready',),
+    'completed_count': ('completed',),
+    'cancelled_count': ('cancelled',),
+    'expired_count': ('expired',),
+}
+
+
+def build_sales_summary(apps, schema_editor):
+    # Своя копия пересборки только на исторических моделях: код
+    # catalog.sales_summary меняется вместе с живыми моделями. Потом
+    # сводки пересобирает `manage.py rebuild_sales_summary`.
+    Order = apps.get_model('catalog', 'Order')
+    OrderItem = apps.get_model('catalog', 'OrderItem')
+    DailySalesSummary = apps.get_model('catalog', 'DailySalesSummary')
+    DailyProductSales = apps.get_model('catalog', 'DailyProductSales')
+    local_tz = timezone.get_current_timezone()
+    completed = Q(status='completed')
+    now = timezone.now()
+
+    days = (
+        Order.objects.order_by()
+        .annotate(day=TruncDate('created_at', tzinfo=local_tz))
+        .values('day')
+        .annotate(
+            orders_count=Count('id'),
+            revenue=Sum('total_price', filter=completed),
+            delivery_revenue=Sum('delivery_price', filter=completed),
+            **{column: Count('id', filter=Q(status__in=statuses)) for column, statuses in STATUS_COLUMNS.items()},
+        )
+    )
+    DailySalesSummary.objects.bulk_create([
+        DailySalesSummary(
+            date=row.pop('day'),
+            revenue=row.pop('revenue') or Decimal('0'),
+            delivery_revenue=row.pop('delivery_revenue') or Decimal('0'),
+            updated_at=now,
+            **row,
+        )
+        for row in days
+    ], batch_size=1000)
+
+    products = (
+        OrderItem.objects.filter(order__status='completed').order_by()
+        .annotate(day=TruncDate('order__created_at', tzinfo=local_tz))
+        .values_list('day', 'product_name')
+        .annotate(
+            sold=Sum('quantity'),
+            sold_revenue=Sum(ExpressionWrapper(
+                F('price') * F('quantity'), output_field=DecimalField(max_digits=14, decimal_places=2),
+            )),
+        )
+    )
+    DailyProductSales.objects.bulk_create([
+        DailyProductSales(date=day, product_name=name, quantity=quantity or 0, revenue=revenue or Decimal('0'))
+        for day, name, quantity, revenue in products
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0020_order_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='День')),
+                ('product_name', models.CharField(max_length=200, verbose_name='Название товара')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='Количество')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Выручка')),
+            ],
+            options={
+                'verbose_name': 'Продажи товара за день',
+                'verbose_name_plural': 'Продажи товаров по дням',
+                'ordering': ['-date', '-quantity'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySalesSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='День')),
+                ('orders_count', models.PositiveIntegerField(default=0, verbose_name='Заказов')),
+                ('new_count', models.PositiveIntegerField(default=0, verbose_name='Новых')),
+                ('processing_count', models.PositiveIntegerField(default=0, verbose_name='В работе')),
+                ('ready_count', models.PositiveIntegerField(default=0, verbose_name='Готовых')),
+                ('completed_count', models.PositiveIntegerField(default=0, verbose_name='Завершенных')),
+                ('cancelled_count', models.PositiveIntegerField(default=0, verbose_name='Отмененных')),
+                ('expired_count', models.PositiveIntegerField(default=0, verbose_name='Просроченных')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Выручка')),
+                ('delivery_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Выручка за доставку')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлен')),
+            ],
+            options={
+                'verbose_name': 'Продажи за день',
+                'verbose_name_plural': 'Продажи по дням',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyproductsales',
+            constraint=models.UniqueConstraint(fields=('date', 'product_name'), name='catalog_dailyproductsales_unique_day'),
+        ),
+        migrations.RunPython(build_sales_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.0.1 on 2026-10-19 10:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0021_sales_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='Номер заказа')),
+                ('telegram_user_id', models.BigIntegerField(verbose_name='Telegram ID пользователя')),
+                ('telegram_username', models.CharField(blank=True, max_length=100, verbose_name='Telegram username')),
+                ('customer_name', models.CharField(max_length=200, verbose_name='Имя клиента')),
+                ('phone', models.CharField(max_length=20, verbose_name='Телефон')),
+                ('phone_normalized', models.CharField(blank=True, max_length=20, verbose_name='Телефон (нормализованный)')),
+                ('address', models.TextField(verbose_name='Адрес доставки')),
+                ('comment', models.TextField(blank=True, verbose_name='Комментарий')),
+                ('is_preorder', models.BooleanField(default=False, verbose_name='Предзаказ')),
+                ('requested_delivery', models.CharField(blank=True, max_length=120, verbose_name='Желаемая дата/время')),
+                ('status', models.CharField(choices=[('new', 'Новый'), ('processing', 'В работе'), ('ready', 'Готов'), ('completed', 'Завершен'), ('cancelled', 'Отменен'), ('expired', 'Просрочен')], max_length=20, verbose_name='Статус')),
+                ('items_subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Сумма товаров')),
+                ('delivery_price', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Стоимость доставки')),
+                ('total_price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Итоговая цена')),
+                ('discount_percent', models.IntegerField(default=0, verbose_name='Скидка %')),
+                ('has_subscription', models.BooleanField(default=False, verbose_name='Есть подписка')),
+                ('processing_by_username', models.CharField(blank=True, max_length=100, verbose_name='Обрабатывал (username)')),
+                ('ready_photo', models.CharField(blank=True, max_length=255, verbose_name='Фото готового букета')),
+                ('payment_status', models.CharField(choices=[('not_paid', 'Не оплачен'), ('pending', 'Ожидает оплаты'), ('succeeded', 'Оплачен'), ('canceled', 'Отменен')], max_length=20, verbose_name='Статус оплаты')),
+                ('payment_method', models.CharField(choices=[('transfer', 'Перевод'), ('online', 'Онлайн')], max_length=20, verbose_name='Способ оплаты')),
+                ('payment_id', models.CharField(blank=True, max_length=100, verbose_name='ID платежа YooKassa')),
+                ('paid_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата оплаты')),
+                ('items', models.JSONField(default=list, verbose_name='Позиции')),
+                ('created_at', models.DateTimeField(verbose_name='Создан')),
+                ('updated_at', models.DateTimeField(verbose_name='Закрыт')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Перенесен в архив')),
+            ],
+            options={
+                'verbose_name': 'Архивный заказ',
+                'verbose_name_plural': 'Архив заказов',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['telegram_user_id', '-created_at'], name='orderarchive_user_created_idx'), models.Index(fields=['phone_normalized'], name='orderarchive_phone_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.1 on 2026-10-19 11:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0022_order_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderarchive',
+            name='payment_url',
+            field=models.URLField(blank=True, verbose_name='Ссылка на оплату'),
+        ),
+        migrations.AddField(
+            model_name='orderarchive',
+            name='processing_by_user_id',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='Обрабатывал (Telegram ID)'),
+        ),
+        migrations.AddField(
+            model_name='orderarchive',
+            name='service_chat_id',
+            field=models.CharField(blank=True, max_length=100, verbose_name='Служебный чат'),
+        ),
+        migrations.AddField(
+            model_name='orderarchive',
+            name='service_message_id',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='ID служебного сообщения'),
+        ),
+        migrations.AddField(
+            model_name='orderarchive',
+            name='transfer_details',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Реквизиты перевода'),
+        ),
+    ]
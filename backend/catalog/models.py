@@ -1,8 +1,12 @@
 from django.db import models
+from django.db.models import F, Q
+from django.db.models.fields.files import FieldFile
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
 import re
 
+from .delivery_tariffs import build_aliases, normalize_address_text
+
 
 def normalize_phone(value: str) -> str:
     if not value:
@@ -14,6 +18,52 @@ def normalize_phone(value: str) -> str:
     return digits
 
 
+_UNKNOWN = object()
+
+
+class ChangeTracker:
+    """
+    Значения отслеживаемых полей на момент загрузки из БД или последнего
+    сохранения: один кортеж на объект, без копии всей строки. Отложенные
+    (`only()`/`defer()`) поля считаются неизвестными.
+    """
+
+    __slots__ = ('fields', 'values')
+
+    def __init__(self, fields: tuple[str, ...]):
+        self.fields = fields
+        self.values = (_UNKNOWN,) * len(fields)
+
+    @staticmethod
+    def _current(instance, name: str):
+        value = getattr(instance, name)
+        # FieldFile изменяется на месте, поэтому храним только имя файла.
+        return value.name if isinstance(value, FieldFile) else value
+
+    def snapshot(self, instance, only=None) -> None:
+        deferred = instance.get_deferred_fields()
+        values = list(self.values)
+        for index, name in enumerate(self.fields):
+            if only is not None and name not in only:
+                continue
+            values[index] = _UNKNOWN if name in deferred else self._current(instance, name)
+        self.values = tuple(values)
+
+    def knows(self, name: str) -> bool:
+        return self.values[self.fields.index(name)] is not _UNKNOWN
+
+    def previous(self, name: str, default=None):
+        value = self.values[self.fields.index(name)]
+        return default if value is _UNKNOWN else value
+
+    def changed(self, instance) -> set[str]:
+        return {
+            name
+            for name, value in zip(self.fields, self.values)
+            if value is not _UNKNOWN and value != self._current(instance, name)
+        }
+
+
 class SiteSettings(models.Model):
     """Общие настройки сайта (singleton)"""
     site_name = models.CharField('Название сайта', max_length=200, default='Цветочная Лавка')
@@ -69,6 +119,7 @@ class HeroSection(models.Model):
     secondary_button_text = models.CharField('Текст второй кнопки', max_length=100, default='Собрать свой')
     secondary_button_link = models.CharField('Ссылка второй кнопки', max_length=200, blank=True)
     image = models.ImageField('Изображение', upload_to='hero/', blank=True, null=True)
+    image_variants = models.JSONField('Варианты изображения', default=dict, blank=True, editable=False)
     badge_number = models.CharField('Число в бейдже', max_length=50, default='850+')
     badge_text = models.CharField('Текст бейджа', max_length=100, default='довольных клиентов')
     benefit_1 = models.CharField('Преимущество 1', max_length=200, default='Фото букета перед отправкой')
@@ -157,6 +208,7 @@ class Category(models.Model):
     slug = models.SlugField('URL', unique=True)
     description = models.TextField('Описание', blank=True)
     image = models.ImageField('Изображение', upload_to='categories/', blank=True, null=True)
+    image_variants = models.JSONField('Варианты изображения', default=dict, blank=True, editable=False)
     order = models.IntegerField('Порядок', default=0)
     is_active = models.BooleanField('Активна', default=True)
     
@@ -178,6 +230,7 @@ class Product(models.Model):
     price = models.DecimalField('Цена', max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
     hide_price = models.BooleanField('Скрыть цену', default=False, help_text='Если галочка стоит, цена не будет отображаться на сайте')
     image = models.ImageField('Главное изображение', upload_to='products/', blank=True, null=True)
+    image_variants = models.JSONField('Варианты изображения', default=dict, blank=True, editable=False)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='Категория')
     is_active = models.BooleanField('Активен', default=True)
     is_popular = models.BooleanField('Популярный', default=False)
@@ -198,6 +251,7 @@ class ProductImage(models.Model):
     """Дополнительные изображения товара"""
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images', verbose_name='Товар')
     image = models.ImageField('Изображение', upload_to='products/')
+    image_variants = models.JSONField('Варианты изображения', default=dict, blank=True, editable=False)
     order = models.IntegerField('Порядок', default=0)
     
     class Meta:
@@ -222,6 +276,7 @@ class Review(models.Model):
     name = models.CharField('Имя', max_length=100)
     telegram_user_id = models.BigIntegerField('Telegram ID пользователя', blank=True, null=True)
     avatar = models.ImageField('Аватар', upload_to='reviews/avatars/', blank=True, null=True)
+    avatar_variants = models.JSONField('Варианты аватара', default=dict, blank=True, editable=False)
     text = models.TextField('Текст отзыва')
     rating = models.IntegerField('Оценка', choices=RATING_CHOICES, default=5)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, null=True, blank=True, related_name='reviews', verbose_name='Товар')
@@ -301,10 +356,65 @@ class Order(models.Model):
         verbose_name = 'Заказ'
         verbose_name_plural = 'Заказы'
         ordering = ['-created_at']
+        # Под горячие запросы бота; проверка планов — manage.py check_query_plans.
+        indexes = [
+            # «Мои заказы», акции: заказы клиента, новые первыми.
+            models.Index(fields=['telegram_user_id', '-created_at'], name='order_user_created_idx'),
+            # Скидка постоянного клиента: только завершенные заказы.
+            models.Index(
+                fields=['phone_normalized'], condition=Q(status='completed'), name='order_phone_completed_idx',
+            ),
+            # Вебхук YooKassa ищет заказ по платежу.
+            models.Index(fields=['payment_id'], name='order_payment_id_idx'),
+            # Список заказов в админке бота: листание по ключу (created_at, id).
+            models.Index(fields=['-created_at', '-id'], name='order_created_id_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='order_status_created_id_idx'),
+        ]
     
     def __str__(self):
         return f"Заказ #{self.id} от {self.customer_name}"
 
+    # Поля, изменения которых видят сигналы (см. catalog/signals.py).
+    TRACKED_FIELDS = (
+        'status', 'payment_status', 'payment_method', 'items_subtotal', 'delivery_price', 'total_price',
+        'processing_by_user_id', 'ready_photo',
+    )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._tracker = ChangeTracker(cls.TRACKED_FIELDS)
+        instance._tracker.snapshot(instance)
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self.mark_saved(fields)
+
+    def mark_saved(self, fields=None) -> None:
+        """Запомнить текущие значения как сохраненные (все или только `fields`)."""
+        tracker = getattr(self, '_tracker', None)
+        if tracker is None:
+            tracker = self._tracker = ChangeTracker(self.TRACKED_FIELDS)
+            fields = None
+        tracker.snapshot(self, only=fields)
+
+    def tracks(self, name: str) -> bool:
+        """Известно ли сохраненное значение поля без запроса к БД."""
+        tracker = getattr(self, '_tracker', None)
+        return tracker is not None and tracker.knows(name)
+
+    @property
+    def changed_fields(self) -> set[str]:
+        """Отслеживаемые поля, измененные после загрузки или сохранения."""
+        tracker = getattr(self, '_tracker', None)
+        return tracker.changed(self) if tracker is not None else set()
+
+    @property
+    def previous_status(self) -> str | None:
+        tracker = getattr(self, '_tracker', None)
+        return tracker.previous('status') if tracker is not None else None
+
     def clean(self):
         super().clean()
         if self.status == 'ready' and not self.ready_photo:
@@ -377,3 +487,294 @@ class OrderItem(models.Model):
     
     def __str__(self):
         return f"{self.product_name} x{self.quantity}"
+
+
+class ImageJob(models.Model):
+    """Задача фоновой подготовки вариантов изображения (см. catalog/thumbnails.py)."""
+
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'В очереди'),
+        (STATUS_PROCESSING, 'В работе'),
+        (STATUS_DONE, 'Готово'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+
+    model_label = models.CharField('Модель', max_length=100)
+    object_id = models.PositiveBigIntegerField('ID объекта')
+    field_name = models.CharField('Поле', max_length=50)
+    source_name = models.CharField('Файл', max_length=255)
+    status = models.CharField('Статус', max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    error = models.TextField('Ошибка', blank=True)
+    locked_at = models.DateTimeField('Взята в работу', blank=True, null=True)
+    created_at = models.DateTimeField('Создана', auto_now_add=True)
+    updated_at = models.DateTimeField('Обновлена', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Задача обработки изображения'
+        verbose_name_plural = 'Очередь обработки изображений'
+        ordering = ['id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['model_label', 'object_id', 'field_name'],
+                name='catalog_imagejob_unique_target',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.model_label} #{self.object_id}.{self.field_name}"
+
+
+class DeliveryTariff(models.Model):
+    """Фиксированный тариф доставки по населенному пункту."""
+
+    label = models.CharField('Населенный пункт', max_length=200)
+    key = models.CharField('Ключ', max_length=200, unique=True, editable=False)
+    aliases = models.TextField(
+        'Варианты написания',
+        blank=True,
+        help_text='Через | или с новой строки. Если пусто — строятся из названия (с./д., скобки).',
+    )
+    cost = models.DecimalField(
+        'Стоимость', max_digits=10, decimal_places=2, blank=True, null=True,
+        help_text='Пусто — стоимость согласует менеджер',
+    )
+    priority = models.IntegerField(
+        'Приоритет', default=0,
+        help_text='При совпадении нескольких пунктов выигрывает больший приоритет, затем более длинное название',
+    )
+    is_active = models.BooleanField('Активен', default=True)
+    created_at = models.DateTimeField('Создан', auto_now_add=True)
+    updated_at = models.DateTimeField('Обновлен', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Тариф доставки'
+        verbose_name_plural = 'Тарифы доставки'
+        ordering = ['-priority', 'label']
+
+    def __str__(self):
+        return self.label
+
+    @staticmethod
+    def make_key(label: str) -> str:
+        return normalize_address_text(label)
+
+    def alias_tuple(self) -> tuple[str, ...]:
+        aliases = {
+            normalized
+            for normalized in (
+                normalize_address_text(part) for part in re.split(r'[|\n]', self.aliases or '')
+            )
+            if normalized
+        }
+        if not aliases:
+            aliases.update(build_aliases(self.label))
+        return tuple(sorted(aliases, key=len, reverse=True))
+
+    def clean(self):
+        super().clean()
+        if not self.make_key(self.label):
+            raise ValidationError({'label': 'Укажите название населенного пункта.'})
+
+    def save(self, *args, **kwargs):
+        self.key = self.make_key(self.label)
+        super().save(*args, **kwargs)
+
+
+class DeliveryTariffVersion(models.Model):
+    """Счетчик изменений тарифов: по нему процессы пересобирают автомат."""
+
+    version = models.PositiveBigIntegerField('Версия', default=0)
+
+    class Meta:
+        verbose_name = 'Версия тарифов доставки'
+        verbose_name_plural = 'Версия тарифов доставки'
+
+    def __str__(self):
+        return str(self.version)
+
+    @classmethod
+    def current(cls) -> int:
+        return cls.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls) -> None:
+        if not cls.objects.filter(pk=1).update(version=F('version') + 1):
+            cls.objects.get_or_create(pk=1, defaults={'version': 1})
+
+
+class GeocodeCacheEntry(models.Model):
+    """Сохраненный ответ геокодера (см. catalog/geocoder_cache.py)."""
+
+    KIND_FORWARD = 'forward'
+    KIND_REVERSE = 'reverse'
+    KIND_CHOICES = [
+        (KIND_FORWARD, 'Адрес → координаты'),
+        (KIND_REVERSE, 'Координаты → адрес'),
+    ]
+
+    key_hash = models.CharField('Хеш ключа', max_length=64, unique=True)
+    kind = models.CharField('Тип', max_length=20, choices=KIND_CHOICES)
+    query = models.TextField('Запрос')
+    response = models.JSONField('Ответ геокодера')
+    is_empty = models.BooleanField('Пустой ответ', default=False)
+    hits = models.PositiveIntegerField('Попаданий', default=0)
+    created_at = models.DateTimeField('Создан', auto_now_add=True)
+    last_hit_at = models.DateTimeField('Последнее попадание', blank=True, null=True)
+    expires_at = models.DateTimeField('Действует до', db_index=True)
+
+    class Meta:
+        verbose_name = 'Ответ геокодера'
+        verbose_name_plural = 'Кэш геокодера'
+        ordering = ['-hits', '-created_at']
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.query}"
+
+
+class CustomerProfile(models.Model):
+    """Сводка по клиенту (см. catalog/customer_profiles.py).
+
+    Одна строка на Telegram-пользователя и одна на нормализованный телефон:
+    скидка постоянного клиента и «Мои заказы» читают одну строку по ключу
+    вместо обхода заказов.
+    """
+
+    KIND_TELEGRAM = 'telegram'
+    KIND_PHONE = 'phone'
+    KIND_CHOICES = [
+        (KIND_TELEGRAM, 'Telegram ID'),
+        (KIND_PHONE, 'Телефон'),
+    ]
+
+    kind = models.CharField('Ключ', max_length=20, choices=KIND_CHOICES)
+    key = models.CharField('Значение ключа', max_length=32)
+    order_count = models.PositiveIntegerField('Заказов', default=0)
+    completed_count = models.PositiveIntegerField('Завершено', default=0)
+    lifetime_spend = models.DecimalField('Сумма завершенных', max_digits=12, decimal_places=2, default=0)
+    last_order_id = models.BigIntegerField('Последний заказ', blank=True, null=True)
+    phone_normalized = models.CharField('Телефон последнего заказа', max_length=20, blank=True)
+    updated_at = models.DateTimeField('Обновлен', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Профиль клиента'
+        verbose_name_plural = 'Профили клиентов'
+        ordering = ['-updated_at']
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'key'], name='catalog_customerprofile_unique_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.key}"
+
+
+class DailySalesSummary(models.Model):
+    """Продажи за день (см. catalog/sales_summary.py).
+
+    День — локальная дата создания заказа. Счетчики по статусам показывают,
+    чем закончились заказы, оформленные в этот день; выручка — по
+    завершенным из них.
+    """
+
+    date = models.DateField('День', unique=True)
+    orders_count = models.PositiveIntegerField('Заказов', default=0)
+    new_count = models.PositiveIntegerField('Новых', default=0)
+    processing_count = models.PositiveIntegerField('В работе', default=0)
+    ready_count = models.PositiveIntegerField('Готовых', default=0)
+    completed_count = models.PositiveIntegerField('Завершенных', default=0)
+    cancelled_count = models.PositiveIntegerField('Отмененных', default=0)
+    expired_count = models.PositiveIntegerField('Просроченных', default=0)
+    revenue = models.DecimalField('Выручка', max_digits=14, decimal_places=2, default=0)
+    delivery_revenue = models.DecimalField('Выручка за доставку', max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField('Обновлен', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Продажи за день'
+        verbose_name_plural = 'Продажи по дням'
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.date}: {self.orders_count} заказов, {self.revenue} ₽"
+
+    @property
+    def average_check(self):
+        return self.revenue / self.completed_count if self.completed_count else 0
+
+
+class DailyProductSales(models.Model):
+    """Проданные за день букеты: для топа товаров в отчете."""
+
+    date = models.DateField('День')
+    product_name = models.CharField('Название товара', max_length=200)
+    quantity = models.PositiveIntegerField('Количество', default=0)
+    revenue = models.DecimalField('Выручка', max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Продажи товара за день'
+        verbose_name_plural = 'Продажи товаров по дням'
+        ordering = ['-date', '-quantity']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product_name'], name='catalog_dailyproductsales_unique_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.date}: {self.product_name} x{self.quantity}"
+
+
+class OrderArchive(models.Model):
+    """Закрытый заказ, перенесенный из Order (см. catalog/order_archive.py).
+
+    id — номер исходного заказа, позиции лежат в `items` списком словарей.
+    Горячая таблица Order остается маленькой, история клиента читает обе.
+    """
+
+    id = models.BigIntegerField('Номер заказа', primary_key=True)
+    telegram_user_id = models.BigIntegerField('Telegram ID пользователя')
+    telegram_username = models.CharField('Telegram username', max_length=100, blank=True)
+    customer_name = models.CharField('Имя клиента', max_length=200)
+    phone = models.CharField('Телефон', max_length=20)
+    phone_normalized = models.CharField('Телефон (нормализованный)', max_length=20, blank=True)
+    address = models.TextField('Адрес доставки')
+    comment = models.TextField('Комментарий', blank=True)
+    is_preorder = models.BooleanField('Предзаказ', default=False)
+    requested_delivery = models.CharField('Желаемая дата/время', max_length=120, blank=True)
+    status = models.CharField('Статус', max_length=20, choices=Order.STATUS_CHOICES)
+    items_subtotal = models.DecimalField('Сумма товаров', max_digits=10, decimal_places=2, default=0)
+    delivery_price = models.DecimalField('Стоимость доставки', max_digits=10, decimal_places=2, default=0)
+    total_price = models.DecimalField('Итоговая цена', max_digits=10, decimal_places=2)
+    discount_percent = models.IntegerField('Скидка %', default=0)
+    has_subscription = models.BooleanField('Есть подписка', default=False)
+    service_chat_id = models.CharField('Служебный чат', max_length=100, blank=True)
+    service_message_id = models.BigIntegerField('ID служебного сообщения', blank=True, null=True)
+    processing_by_user_id = models.BigIntegerField('Обрабатывал (Telegram ID)', blank=True, null=True)
+    processing_by_username = models.CharField('Обрабатывал (username)', max_length=100, blank=True)
+    ready_photo = models.CharField('Фото готового букета', max_length=255, blank=True)
+    payment_status = models.CharField('Статус оплаты', max_length=20, choices=Order.PAYMENT_STATUS_CHOICES)
+    payment_method = models.CharField('Способ оплаты', max_length=20, choices=Order.PAYMENT_METHOD_CHOICES)
+    transfer_details = models.CharField('Реквизиты перевода', max_length=255, blank=True)
+    payment_id = models.CharField('ID платежа YooKassa', max_length=100, blank=True)
+    payment_url = models.URLField('Ссылка на оплату', blank=True)
+    paid_at = models.DateTimeField('Дата оплаты', blank=True, null=True)
+    items = models.JSONField('Позиции', default=list)
+    created_at = models.DateTimeField('Создан')
+    updated_at = models.DateTimeField('Закрыт')
+    archived_at = models.DateTimeField('Перенесен в архив', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Архивный заказ'
+        verbose_name_plural = 'Архив заказов'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['telegram_user_id', '-created_at'], name='orderarchive_user_created_idx'),
+            models.Index(fields=['phone_normalized'], name='orderarchive_phone_idx'),
+        ]
+
+    def __str__(self):
+        return f"Архивный заказ #{self.id} от {self.customer_name}"
@@ -0,0 +1,107 @@
+"""
+Архив закрытых заказов.
+
+`manage.py archive_orders` переносит заказы, закрытые (завершен, отменен,
+просрочен) больше ORDER_ARCHIVE_AFTER_DAYS дней назад, в OrderArchive:
+пачками по id, каждая пачка — одна транзакция (вставка в архив и удаление
+из Order вместе с позициями). Горячая таблица Order и ее индексы остаются
+маленькими; история клиента («Мои заказы») читает обе таблицы.
+
+Сводки по клиентам и продажам при переносе не меняются, а их пересборка
+учитывает архив.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import timedelta
+from itertools import chain
+
+from django.db import transaction
+from django.utils import timezone
+
+from .bulk_insert import insert_rows
+from .models import Order, OrderArchive, OrderItem
+from .order_state import TERMINAL_STATUSES
+
+# Поля, которые переносятся из Order как есть: все его колонки.
+ARCHIVE_FIELDS = (
+    'id', 'telegram_user_id', 'telegram_username', 'customer_name', 'phone', 'phone_normalized',
+    'address', 'comment', 'is_preorder', 'requested_delivery', 'status', 'items_subtotal',
+    'delivery_price', 'total_price', 'discount_percent', 'has_subscription', 'service_chat_id',
+    'service_message_id', 'processing_by_user_id', 'processing_by_username', 'ready_photo',
+    'payment_status', 'payment_method', 'transfer_details', 'payment_id', 'payment_url', 'paid_at',
+    'created_at', 'updated_at',
+)
+DEFAULT_BATCH_SIZE = 500
+
+
+def closed_orders(older_than_days: int):
+    """Заказы, которые можно переносить: закрыты и не менялись `older_than_days` дней."""
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    return Order.objects.filter(status__in=TERMINAL_STATUSES, updated_at__lt=cutoff)
+
+
+def _archived_items(order_ids: list[int]) -> dict[int, list[dict]]:
+    items = defaultdict(list)
+    rows = (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .order_by('order_id', 'id')
+        .values_list('order_id', 'product_id', 'product_name', 'price', 'quantity')
+    )
+    for order_id, product_id, product_name, price, quantity in rows:
+        items[order_id].append({
+            'product_id': product_id,
+            'product_name': product_name,
+            'price': str(price),
+            'quantity': quantity,
+        })
+    return items
+
+
+def archive_batch(candidates, order_ids: list[int]) -> int:
+    """Перенести заказы `order_ids`, если они все еще подходят под `candidates`."""
+    with transaction.atomic():
+        rows = list(
+            candidates.filter(id__in=order_ids).select_for_update().order_by().values(*ARCHIVE_FIELDS)
+        )
+        if not rows:
+            return 0
+        ids = [row['id'] for row in rows]
+        items = _archived_items(ids)
+        now = timezone.now()
+        archived = []
+        for row in rows:
+            row['ready_photo'] = row['ready_photo'] or ''
+            archived.append((*(row[name] for name in ARCHIVE_FIELDS), items.get(row['id'], []), now))
+        insert_rows(OrderArchive, (*ARCHIVE_FIELDS, 'items', 'archived_at'), archived)
+        # Позиции удаляются каскадом одним DELETE ... WHERE order_id IN (...);
+        # сами заказы коллектору нужны только по id.
+        Order.objects.filter(id__in=ids).only('id').delete()
+    return len(ids)
+
+
+def archive_closed_orders(older_than_days: int, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Перенести все подходящие заказы; сколько перенесено."""
+    candidates = closed_orders(older_than_days)
+    archived = 0
+    last_id = 0
+    while True:
+        order_ids = list(
+            candidates.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not order_ids:
+            return archived
+        archived += archive_batch(candidates, order_ids)
+        last_id = order_ids[-1]
+
+
+def customer_orders(telegram_user_id: int, limit: int = 10) -> list:
+    """Последние заказы клиента из Order и OrderArchive, новые первыми.
+
+    Элементы — Order или OrderArchive; у обоих есть id, status,
+    total_price и created_at.
+    """
+    hot = Order.objects.filter(telegram_user_id=telegram_user_id).order_by('-created_at')[:limit]
+    archived = OrderArchive.objects.filter(telegram_user_id=telegram_user_id).order_by('-created_at')[:limit]
+    orders = sorted(chain(hot, archived), key=lambda order: order.created_at, reverse=True)
+    return orders[:limit]
@@ -0,0 +1,189 @@
+"""
+Потоковая выгрузка заказов в CSV (бот и `manage.py export_orders`).
+
+Заказы читаются пачками по ключу (id < последнего выданного), позиции —
+одним запросом на пачку, строки пишутся в файл сразу. Архив (OrderArchive)
+читается так же, позиции берутся из его JSON, и сливается с Order по id.
+В памяти одновременно не больше одной пачки на таблицу, сколько бы заказов
+ни было. Файл пишется
+во временный и переименовывается в конце, поэтому параллельная выгрузка
+не отдаст наполовину записанный CSV.
+"""
+from __future__ import annotations
+
+import csv
+import gzip
+import heapq
+import os
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from typing import NamedTuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Order, OrderArchive, OrderItem
+
+EXPORT_HEADER = [
+    'id', 'created_at', 'status', 'customer_name', 'phone', 'address',
+    'total_price', 'discount_percent', 'has_subscription', 'items'
+]
+EXPORT_FIELDS = (
+    'id', 'created_at', 'status', 'customer_name', 'phone', 'address',
+    'total_price', 'discount_percent', 'has_subscription',
+)
+# Сколько позиций заказа попадает в колонку items.
+MAX_ITEMS_PER_ORDER = 50
+DEFAULT_CHUNK_SIZE = 500
+
+
+class ExportFilters(NamedTuple):
+    date_from: date | None = None
+    date_to: date | None = None
+    statuses: tuple[str, ...] = ()
+    compress: bool = False
+
+    def describe(self) -> str:
+        parts = []
+        if self.date_from or self.date_to:
+            parts.append(f"{self.date_from or '…'} — {self.date_to or '…'}")
+        if self.statuses:
+            parts.append(', '.join(self.statuses))
+        return '; '.join(parts) or 'все заказы'
+
+
+def parse_export_args(tokens: list[str]) -> ExportFilters:
+    """Аргументы команды бота: даты YYYY-MM-DD (с / по), статусы, gz.
+
+    ValueError — с текстом для пользователя.
+    """
+    statuses = {choice[0] for choice in Order.STATUS_CHOICES}
+    dates, chosen, compress = [], [], False
+    for token in tokens:
+        value = token.strip().lower()
+        if not value:
+            continue
+        if value in {'gz', 'gzip'}:
+            compress = True
+        elif value in statuses:
+            chosen.append(value)
+        else:
+            try:
+                dates.append(datetime.strptime(value, '%Y-%m-%d').date())
+            except ValueError:
+                raise ValueError(f"Непонятный аргумент: {token}")
+    if len(dates) > 2:
+        raise ValueError("Укажите не больше двух дат: с и по")
+    date_from = dates[0] if dates else None
+    date_to = dates[1] if len(dates) > 1 else None
+    if date_from and date_to and date_from > date_to:
+        raise ValueError("Дата «с» позже даты «по»")
+    return ExportFilters(date_from, date_to, tuple(dict.fromkeys(chosen)), compress)
+
+
+def default_export_path(compress: bool = False) -> Path:
+    name = 'orders_latest.csv.gz' if compress else 'orders_latest.csv'
+    return Path(settings.MEDIA_ROOT) / 'exports' / name
+
+
+def _local_midnight(day: date) -> datetime:
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def filtered_orders(filters: ExportFilters, model=Order):
+    """Заказы под фильтр; `model=OrderArchive` — то же по архиву."""
+    orders = model.objects.all()
+    if filters.date_from:
+        orders = orders.filter(created_at__gte=_local_midnight(filters.date_from))
+    if filters.date_to:
+        orders = orders.filter(created_at__lt=_local_midnight(filters.date_to + timedelta(days=1)))
+    if filters.statuses:
+        orders = orders.filter(status__in=filters.statuses)
+    return orders
+
+
+def iter_order_chunks(orders, chunk_size: int = DEFAULT_CHUNK_SIZE, fields=EXPORT_FIELDS):
+    """Пачки строк заказов (новые первыми) по ключу id, без OFFSET."""
+    rows = orders.order_by('-id').values_list(*fields)
+    last_id = None
+    while True:
+        page = rows if last_id is None else rows.filter(id__lt=last_id)
+        chunk = list(page[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        if len(chunk) < chunk_size:
+            return
+        last_id = chunk[-1][0]
+
+
+def _items_by_order(order_ids: list[int]) -> dict[int, list[str]]:
+    items = defaultdict(list)
+    rows = (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .order_by('order_id', 'id')
+        .values_list('order_id', 'product_name', 'quantity')
+    )
+    for order_id, product_name, quantity in rows:
+        order_items = items[order_id]
+        if len(order_items) < MAX_ITEMS_PER_ORDER:
+            order_items.append(f"{product_name} x{quantity}")
+    return items
+
+
+def _hot_rows(filters: ExportFilters, chunk_size: int):
+    for chunk in iter_order_chunks(filtered_orders(filters), chunk_size):
+        items = _items_by_order([row[0] for row in chunk])
+        for row in chunk:
+            yield row, items.get(row[0], ())
+
+
+def _archived_rows(filters: ExportFilters, chunk_size: int):
+    archived = filtered_orders(filters, OrderArchive)
+    for chunk in iter_order_chunks(archived, chunk_size, (*EXPORT_FIELDS, 'items')):
+        for *row, items in chunk:
+            yield tuple(row), [
+                f"{item['product_name']} x{item['quantity']}" for item in items[:MAX_ITEMS_PER_ORDER]
+            ]
+
+
+def iter_export_rows(filters: ExportFilters = ExportFilters(), chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """(строка EXPORT_FIELDS, позиции) из Order и архива, новые первыми."""
+    return heapq.merge(
+        _hot_rows(filters, chunk_size),
+        _archived_rows(filters, chunk_size),
+        key=lambda row: row[0][0],
+        reverse=True,
+    )
+
+
+def export_orders(
+    path: Path | str | None = None,
+    filters: ExportFilters = ExportFilters(),
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> tuple[Path, int]:
+    """Записать выгрузку в `path` (по умолчанию media/exports); (путь, заказов)."""
+    path = Path(path) if path else default_export_path(filters.compress)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+
+    count = 0
+    opener = gzip.open if filters.compress else open
+    try:
+        with opener(tmp_path, 'wt', newline='', encoding='utf-8') as f:
+            w = csv.writer(f)
+            w.writerow(EXPORT_HEADER)
+            for row, items in iter_export_rows(filters, max(1, chunk_size)):
+                order_id, created_at, status, name, phone, address, total, discount, subscribed = row
+                created = timezone.localtime(created_at).strftime('%Y-%m-%d %H:%M:%S')
+                w.writerow([
+                    order_id, created, status, name, phone, address,
+                    str(total), discount, int(subscribed), '; '.join(items),
+                ])
+                count += 1
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return path, count
@@ -0,0 +1,40 @@
+"""
+Оформление заказа: одна транзакция на заказ и все его позиции.
+
+Цены и поля заказа считаются до записи; place_order делает INSERT заказа и
+один bulk INSERT позиций и возвращает заказ вместе с созданными позициями.
+Дальнейшие шаги (оплата, сообщение в служебный чат) работают с ними и не
+перечитывают заказ.
+"""
+from __future__ import annotations
+
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.db import transaction
+
+from .models import Order, OrderItem, Product
+
+
+class OrderLine(NamedTuple):
+    product: Product | None
+    product_name: str
+    price: Decimal
+    quantity: int = 1
+
+
+def place_order(lines: list[OrderLine], **fields) -> tuple[Order, list[OrderItem]]:
+    """Создать Order(**fields) и его позиции `lines` в одной транзакции."""
+    with transaction.atomic():
+        order = Order.objects.create(**fields)
+        items = OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product=line.product,
+                product_name=line.product_name,
+                price=line.price,
+                quantity=line.quantity,
+            )
+            for line in lines
+        ])
+    return order, items
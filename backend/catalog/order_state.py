@@ -0,0 +1,325 @@
+"""
+Переходы статусов заказа и их побочные эффекты.
+
+Какие переходы разрешены и что происходит при входе в статус (уведомление
+клиенту, запрос оплаты, просьба об отзыве), описано здесь один раз. Переход
+применяется одним условным UPDATE ... WHERE status=<прочитанный статус>: если
+заказ успели изменить параллельно (два админа одновременно нажали «Взять в
+работу»), UPDATE не затронет строк и второй получит отказ, а не перезапишет
+первого. Статус оплаты меняется так же — повторный вебхук YooKassa не
+уведомит клиента дважды.
+
+Сохранения через save() (админка Django) проходят через сигнал
+order_post_save, который вызывает те же хуки.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Callable, NamedTuple
+
+from django.conf import settings
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from telegram_bot.constants import CARD_PAYMENT_MAINTENANCE_NOTE
+from telegram_bot.sender import send_message, send_photo
+from . import sales_summary
+from .customer_profiles import record_status_change
+from .models import Order
+from .payments import (
+    create_payment_for_order,
+    get_manual_payment_url,
+    get_return_url,
+    update_order_from_payment,
+    yookassa_enabled,
+)
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = frozenset({'completed', 'cancelled', 'expired'})
+_IN_WORK = frozenset({'ready', 'completed', 'cancelled', 'expired'})
+
+# Откуда куда можно перейти. Старые статусы (confirmed, in_progress,
+# delivering) ведут себя как «В работе». ready -> ready — повторное фото:
+# единственный переход в тот же статус, хуки видят previous_status == status.
+TRANSITIONS: dict[str, frozenset[str]] = {
+    'new': frozenset({'processing', 'ready', 'cancelled', 'expired'}),
+    'processing': _IN_WORK,
+    'ready': _IN_WORK | {'processing'},
+    'confirmed': _IN_WORK | {'processing'},
+    'in_progress': _IN_WORK | {'processing'},
+    'delivering': _IN_WORK | {'processing'},
+}
+
+# Сколько раз перечитать заказ, если его изменили между чтением и UPDATE.
+_MAX_ATTEMPTS = 3
+
+
+class TransitionResult(NamedTuple):
+    ok: bool
+    message: str = ''
+    order: Order | None = None
+    previous_status: str | None = None
+
+
+class OrderStateMachine:
+    """Разрешенные переходы, условные UPDATE и хуки входа в статус."""
+
+    _hooks: list[tuple[frozenset[str], Callable[[Order, str], None]]] = []
+
+    @staticmethod
+    def can(current: str, target: str) -> bool:
+        return target in TRANSITIONS.get(current, ())
+
+    @classmethod
+    def on_enter(cls, *statuses: str):
+        """Декоратор хука hook(order, previous_status); без статусов — на любой."""
+        def register(hook):
+            cls._hooks.append((frozenset(statuses), hook))
+            return hook
+        return register
+
+    @classmethod
+    def run_hooks(cls, order: Order, previous_status: str) -> None:
+        for statuses, hook in cls._hooks:
+            if statuses and order.status not in statuses:
+                continue
+            try:
+                hook(order, previous_status)
+            except Exception:
+                logger.exception("Ошибка обработчика перехода заказа %s в %s", order.id, order.status)
+
+    @classmethod
+    def transition(
+        cls,
+        order_id: int,
+        target: str,
+        *,
+        sources: frozenset[str] | set[str] | None = None,
+        unless_paid: bool = False,
+        values: dict | None = None,
+        refusal: str = 'Нельзя перевести заказ в этот статус',
+    ) -> TransitionResult:
+        """Перевести заказ в `target` условным UPDATE и запустить хуки.
+
+        `sources` сужает статусы, из которых переход разрешен; `unless_paid`
+        запрещает переход для оплаченного заказа; `values` — поля, которые
+        пишутся тем же UPDATE.
+        """
+        for _attempt in range(_MAX_ATTEMPTS):
+            row = Order.objects.filter(pk=order_id).values_list('status', 'payment_status').first()
+            if row is None:
+                return TransitionResult(False, 'Заказ не найден')
+            current, payment_status = row
+            if current in TERMINAL_STATUSES:
+                return TransitionResult(False, 'Заказ уже закрыт')
+            if not cls.can(current, target) or (sources and current not in sources):
+                return TransitionResult(False, refusal)
+            if unless_paid and payment_status == 'succeeded':
+                return TransitionResult(False, 'Заказ уже оплачен')
+
+            queryset = Order.objects.filter(pk=order_id, status=current)
+            if unless_paid:
+                queryset = queryset.exclude(payment_status='succeeded')
+            if queryset.update(status=target, updated_at=timezone.now(), **(values or {})):
+                order = Order.objects.get(pk=order_id)
+                cls.run_hooks(order, current)
+                return TransitionResult(True, '', order, current)
+            # Заказ изменили между чтением и UPDATE — решаем заново по свежему статусу.
+        return TransitionResult(False, 'Заказ изменили одновременно, попробуйте еще раз')
+
+    @staticmethod
+    def update_payment(
+        order: Order,
+        payment_status: str,
+        *,
+        only_from: frozenset[str] | set[str] | None = None,
+        **values,
+    ) -> bool:
+        """Условно сменить статус оплаты (и записать `values`) у загруженного заказа.
+
+        UPDATE идет с WHERE payment_status=<статус в объекте>. `only_from` —
+        из каких статусов оплаты его можно менять; при другом статусе пишутся
+        только `values`. Возвращает True, если статус изменил именно этот
+        вызов; объект `order` обновляется.
+        """
+        now = timezone.now()
+        for _attempt in range(_MAX_ATTEMPTS):
+            expected = order.payment_status
+            changes = dict(values)
+            if payment_status != expected and (only_from is None or expected in only_from):
+                changes['payment_status'] = payment_status
+                if payment_status == 'succeeded' and 'paid_at' not in changes:
+                    changes['paid_at'] = Coalesce(F('paid_at'), Value(now))
+            elif not changes:
+                return False
+            changes['updated_at'] = now
+
+            if Order.objects.filter(pk=order.pk, payment_status=expected).update(**changes):
+                for name, value in changes.items():
+                    if name == 'paid_at' and isinstance(value, Coalesce):
+                        value = order.paid_at or now
+                    setattr(order, name, value)
+                order.mark_saved(list(changes))
+                return 'payment_status' in changes
+
+            current = Order.objects.filter(pk=order.pk).values_list('payment_status', flat=True).first()
+            if current is None:
+                return False
+            order.payment_status = current
+            order.mark_saved(['payment_status'])
+        return False
+
+
+# ── Хуки ─────────────────────────────────────────────────────────
+
+STATUS_ICONS = {
+    'new': '🆕',
+    'processing': '🛠️',
+    'ready': '📦',
+    'completed': '🏁',
+    'cancelled': '❌',
+    'expired': '⌛',
+    # legacy statuses (safety for old rows)
+    'confirmed': '✅',
+    'in_progress': '🛠️',
+    'delivering': '🚚',
+}
+
+
+def _can_notify(order: Order) -> bool:
+    return bool(settings.TELEGRAM_BOT_TOKEN and order.telegram_user_id)
+
+
+def build_transfer_payment_text(order: Order) -> str:
+    details = (order.transfer_details or "").strip()
+    text = (
+        f"💳 Оплата заказа #{order.id}\n\n"
+        f"{CARD_PAYMENT_MAINTENANCE_NOTE}\n"
+        "Сейчас принимаем оплату переводом напрямую магазину.\n"
+        "После перевода отправьте чек/скрин в этот чат.\n\n"
+    )
+    if details:
+        text += f"Реквизиты:\n{details}\n\n"
+    else:
+        text += "Реквизиты менеджер отправит отдельным сообщением.\n\n"
+    text += f"Сумма к оплате: {order.total_price} ₽"
+    return text
+
+
+@OrderStateMachine.on_enter()
+def notify_status_changed(order: Order, previous_status: str) -> None:
+    if not _can_notify(order):
+        return
+    status_labels = dict(Order.STATUS_CHOICES)
+    old_label = status_labels.get(previous_status, previous_status)
+    new_label = status_labels.get(order.status, order.status)
+    text = (
+        f"{STATUS_ICONS.get(order.status, 'ℹ️')} Статус вашего заказа #{order.id} изменен:\n"
+        f"{old_label} -> {new_label}"
+    )
+
+    if previous_status == order.status:
+        # ready -> ready: менеджер прислал новое фото букета.
+        text = f"📦 Ваш заказ #{order.id} готов."
+
+    delivered = False
+    if order.status == 'ready' and getattr(order, 'ready_photo', None):
+        try:
+            photo_path = order.ready_photo.path
+        except Exception:
+            photo_path = None
+
+        if photo_path:
+            delivered = send_photo(order.telegram_user_id, photo_path, caption=text, timeout=10)
+
+    if not delivered:
+        delivered = send_message(order.telegram_user_id, text, timeout=5)
+
+    if not delivered:
+        logger.warning("Не удалось отправить уведомление о статусе заказа %s", order.id)
+
+
+@OrderStateMachine.on_enter('ready')
+def request_payment(order: Order, previous_status: str) -> None:
+    """После статуса «Готов» — запрос оплаты (перевод или онлайн)."""
+    if not _can_notify(order) or previous_status == order.status:
+        return
+    if not order.total_price or order.total_price <= 0 or order.payment_status == 'succeeded':
+        return
+
+    if (order.payment_method or 'transfer') == 'transfer':
+        OrderStateMachine.update_payment(order, 'pending', only_from={'not_paid'})
+        if not send_message(order.telegram_user_id, build_transfer_payment_text(order), timeout=10):
+            logger.warning("Не удалось отправить инструкции перевода по заказу %s", order.id)
+        return
+
+    payment_url = getattr(order, 'payment_url', '')
+    has_yookassa = yookassa_enabled()
+
+    if not payment_url and has_yookassa:
+        payment = create_payment_for_order(
+            order=order,
+            amount=order.total_price,
+            description=f"Оплата заказа #{order.id}",
+            return_url=get_return_url()
+        )
+        if payment:
+            _, payment_url = update_order_from_payment(order, payment)
+
+    if not payment_url:
+        payment_url = get_manual_payment_url(order)
+        if payment_url:
+            OrderStateMachine.update_payment(order, 'pending', only_from={'not_paid'}, payment_url=payment_url)
+
+    if not payment_url:
+        return
+
+    if has_yookassa:
+        pay_text = (
+            f"💳 Ваш букет готов! Пожалуйста, оплатите заказ #{order.id}.\n"
+            "Нажмите кнопку ниже для оплаты через YooKassa."
+        )
+    else:
+        pay_text = (
+            f"💳 Ваш букет готов! Пожалуйста, оплатите заказ #{order.id}.\n"
+            "Нажмите кнопку ниже для перехода к временной оплате."
+        )
+
+    inline_keyboard = [[{"text": "💳 Оплатить онлайн", "url": payment_url}]]
+    if has_yookassa and order.payment_id:
+        inline_keyboard.append(
+            [{"text": "✅ Проверить оплату", "callback_data": f"check_payment_{order.id}"}]
+        )
+    reply_markup = {"inline_keyboard": inline_keyboard}
+    if not send_message(order.telegram_user_id, pay_text, reply_markup=reply_markup, timeout=10):
+        logger.warning("Не удалось отправить ссылку на оплату заказа %s", order.id)
+
+
+@OrderStateMachine.on_enter('completed')
+def request_review(order: Order, previous_status: str) -> None:
+    """После завершения — сразу запросить отзыв со звездами."""
+    if not _can_notify(order):
+        return
+    review_text = (
+        f"🙏 Спасибо! Заказ #{order.id} завершен.\n\n"
+        "Оцените, пожалуйста, наш сервис:"
+    )
+    review_markup = {
+        "inline_keyboard": [[
+            {"text": "⭐️", "callback_data": f"rate_{stars}"} for stars in range(1, 6)
+        ]]
+    }
+    if not send_message(order.telegram_user_id, review_text, reply_markup=review_markup, timeout=10):
+        logger.warning("Не удалось отправить запрос отзыва по заказу %s", order.id)
+
+
+@OrderStateMachine.on_enter()
+def update_customer_profile(order: Order, previous_status: str) -> None:
+    record_status_change(order, previous_status)
+
+
+@OrderStateMachine.on_enter()
+def update_sales_summary(order: Order, previous_status: str) -> None:
+    sales_summary.record_status_change(order, previous_status)
@@ -3,7 +3,6 @@ from decimal import Decimal
 from uuid import uuid4
 
 from django.conf import settings
-from django.utils import timezone
 from telegram_bot.sender import send_message
 
 try:
@@ -119,14 +118,13 @@ def update_order_from_payment(order, payment) -> tuple[str, str | None]:
     confirmation = getattr(payment, 'confirmation', None)
     payment_url = getattr(confirmation, 'confirmation_url', None) if confirmation else None
 
-    order.payment_id = payment_id
-    order.payment_status = payment_status
+    from .order_state import OrderStateMachine
+
+    values = {'payment_id': payment_id}
     if payment_url:
-        order.payment_url = payment_url
-    if payment_status == 'succeeded' and not order.paid_at:
-        order.paid_at = timezone.now()
-    order.save(update_fields=['payment_id', 'payment_status', 'payment_url', 'paid_at', 'updated_at'])
-    return payment_status, payment_url
+        values['payment_url'] = payment_url
+    OrderStateMachine.update_payment(order, payment_status, **values)
+    return order.payment_status, payment_url
 
 
 def fetch_payment(payment_id: str):
@@ -0,0 +1,151 @@
+"""
+Точка отправления и кэш оценок такси.
+
+Магазин не переезжает, поэтому его координаты берутся из SHOP_COORDINATES
+или геокодируются один раз за жизнь процесса. Оценки такси кэшируются в
+памяти по ячейке назначения (координаты, округленные до
+ROUTE_QUOTE_CELL_PRECISION знаков) и интервалу времени суток
+(ROUTE_QUOTE_BUCKET_MINUTES) на ROUTE_QUOTE_CACHE_TTL_SECONDS: цена такси
+зависит от времени, так что дольше держать ее нельзя.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils import timezone
+
+from .delivery_tariffs import normalize_address_text
+
+logger = logging.getLogger(__name__)
+
+# Раз в столько обращений пишем статистику кэша в лог.
+_STATS_LOG_EVERY = 100
+
+_origins: dict[str, dict] = {}
+_origins_lock = threading.Lock()
+
+
+def parse_coordinates(value: str) -> dict | None:
+    """'54.0662,55.0073' (широта, долгота) -> {'lat', 'lon'}."""
+    try:
+        lat, lon = (float(part) for part in str(value).split(','))
+    except ValueError:
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return {'lat': lat, 'lon': lon}
+
+
+def _origin_key(address: str) -> str:
+    return normalize_address_text(address or '')
+
+
+def known_origin(address: str) -> dict | None:
+    """Координаты точки отправления без обращения к геокодеру (или None)."""
+    key = _origin_key(address)
+    configured = (getattr(settings, 'SHOP_COORDINATES', '') or '').strip()
+    if configured and key == _origin_key(getattr(settings, 'SHOP_ADDRESS', '')):
+        coords = parse_coordinates(configured)
+        if coords is None:
+            logger.warning("SHOP_COORDINATES задан некорректно: %r", configured)
+        else:
+            return coords
+    with _origins_lock:
+        return _origins.get(key)
+
+
+def remember_origin(address: str, coords: dict | None) -> None:
+    if coords:
+        with _origins_lock:
+            _origins[_origin_key(address)] = dict(coords)
+
+
+def forget_origins() -> None:
+    with _origins_lock:
+        _origins.clear()
+
+
+class RouteQuoteCache:
+    """LRU оценок такси: (откуда, ячейка назначения, время суток, вес) -> dict."""
+
+    def __init__(self):
+        self._items: OrderedDict[tuple, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'stored': 0}
+
+    def _ttl(self) -> int:
+        return int(getattr(settings, 'ROUTE_QUOTE_CACHE_TTL_SECONDS', 600))
+
+    def _size(self) -> int:
+        return max(0, int(getattr(settings, 'ROUTE_QUOTE_CACHE_SIZE', 1024)))
+
+    def enabled(self) -> bool:
+        return self._ttl() > 0 and self._size() > 0
+
+    def key(self, from_coords: dict, to_coords: dict, order_weight=1, now=None) -> tuple:
+        precision = int(getattr(settings, 'ROUTE_QUOTE_CELL_PRECISION', 3))
+        bucket_minutes = max(1, int(getattr(settings, 'ROUTE_QUOTE_BUCKET_MINUTES', 60)))
+        local = timezone.localtime(now)
+        bucket = (local.hour * 60 + local.minute) // bucket_minutes
+
+        def cell(coords: dict) -> tuple[float, float]:
+            return round(coords['lat'], precision), round(coords['lon'], precision)
+
+        return cell(from_coords), cell(to_coords), bucket, str(order_weight)
+
+    def get(self, key: tuple) -> dict | None:
+        if not self.enabled():
+            return None
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.stats['misses'] += 1
+                quote = None
+            elif item[0] <= time.monotonic():
+                del self._items[key]
+                self.stats['expired'] += 1
+                self.stats['misses'] += 1
+                quote = None
+            else:
+                self._items.move_to_end(key)
+                self.stats['hits'] += 1
+                quote = dict(item[1])
+        self._log_stats()
+        return quote
+
+    def set(self, key: tuple, quote: dict) -> None:
+        if not self.enabled():
+            return
+        with self._lock:
+            self._items[key] = (time.monotonic() + self._ttl(), dict(quote))
+            self._items.move_to_end(key)
+            while len(self._items) > self._size():
+                self._items.popitem(last=False)
+            self.stats['stored'] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def snapshot_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats, size=len(self._items))
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    def _log_stats(self) -> None:
+        lookups = self.stats['hits'] + self.stats['misses']
+        if lookups and lookups % _STATS_LOG_EVERY == 0:
+            stats = self.snapshot_stats()
+            logger.info(
+                "Кэш оценок такси: попаданий %s из %s (%.0f%%), записей %s",
+                stats['hits'], lookups, stats['hit_rate'] * 100, stats['size'],
+            )
+
+
+route_quote_cache = RouteQuoteCache()
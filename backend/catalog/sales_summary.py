@@ -0,0 +1,253 @@
+"""
+Дневные сводки продаж для отчетов в боте и админке.
+
+DailySalesSummary — заказы дня по статусам и выручка завершенных,
+DailyProductSales — сколько каких букетов продано. Обновляются по событиям
+заказа (создание в order_post_save, переходы — хук в order_state.py)
+одним UPDATE с F(); `manage.py rebuild_sales_summary` пересчитывает историю
+агрегацией в БД, вместе с архивом заказов. Отчет читает только эти таблицы, поэтому его стоимость не
+зависит от числа заказов.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum, Value
+from django.db.models.functions import Greatest, TruncDate
+from django.utils import timezone
+
+from .models import DailyProductSales, DailySalesSummary, Order, OrderItem
+
+# Колонка сводки -> статусы заказа. Старые статусы считаем «В работе».
+STATUS_COLUMNS = {
+    'new_count': ('new',),
+    'processing_count': ('processing', 'confirmed', 'in_progress', 'delivering'),
+    'ready_count': ('ready',),
+    'completed_count': ('completed',),
+    'cancelled_count': ('cancelled',),
+    'expired_count': ('expired',),
+}
+_COLUMN_BY_STATUS = {status: column for column, statuses in STATUS_COLUMNS.items() for status in statuses}
+TOP_PRODUCTS = 5
+
+_reports: dict[int, tuple[float, dict]] = {}
+_reports_lock = threading.Lock()
+
+
+def _order_day(order):
+    return timezone.localdate(order.created_at)
+
+
+def _upsert(model, lookup: dict, changes: dict) -> None:
+    """UPDATE строки сводки; если строки нет — создаем ее и повторяем."""
+    rows = model.objects.filter(**lookup)
+    if rows.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup)
+    except IntegrityError:
+        pass  # строку успел создать параллельный запрос
+    rows.update(**changes)
+
+
+def _step(column: str, sign: int):
+    if sign > 0:
+        return F(column) + 1
+    return Greatest(F(column) - 1, Value(0))
+
+
+def _completed_changes(order, sign: int) -> dict:
+    return {
+        'revenue': F('revenue') + sign * (order.total_price or Decimal('0')),
+        'delivery_revenue': F('delivery_revenue') + sign * (order.delivery_price or Decimal('0')),
+    }
+
+
+def _record_products(order, day, sign: int) -> None:
+    sold = defaultdict(lambda: [0, Decimal('0')])
+    for name, quantity, price in OrderItem.objects.filter(order_id=order.id).values_list(
+        'product_name', 'quantity', 'price',
+    ):
+        sold[name][0] += quantity
+        sold[name][1] += (price or Decimal('0')) * quantity
+    for name, (quantity, revenue) in sold.items():
+        lookup = {'date': day, 'product_name': name}
+        if sign > 0:
+            _upsert(DailyProductSales, lookup, {
+                'quantity': F('quantity') + quantity, 'revenue': F('revenue') + revenue,
+            })
+        else:
+            DailyProductSales.objects.filter(**lookup).update(
+                quantity=Greatest(F('quantity') - quantity, Value(0)), revenue=F('revenue') - revenue,
+            )
+
+
+def record_order_created(order) -> None:
+    changes = {'orders_count': F('orders_count') + 1, 'updated_at': timezone.now()}
+    column = _COLUMN_BY_STATUS.get(order.status)
+    if column:
+        changes[column] = _step(column, 1)
+    if order.status == 'completed':
+        # Позиций у только что созданного заказа еще нет: товары догонит rebuild.
+        changes.update(_completed_changes(order, 1))
+    _upsert(DailySalesSummary, {'date': _order_day(order)}, changes)
+    invalidate_reports()
+
+
+def record_status_change(order, previous_status: str) -> None:
+    old_column = _COLUMN_BY_STATUS.get(previous_status)
+    new_column = _COLUMN_BY_STATUS.get(order.status)
+    changes = {}
+    if old_column != new_column:
+        if old_column:
+            changes[old_column] = _step(old_column, -1)
+        if new_column:
+            changes[new_column] = _step(new_column, 1)
+
+    entered = order.status == 'completed'
+    left = previous_status == 'completed'
+    sign = 1 if entered else -1
+    if entered != left:
+        changes.update(_completed_changes(order, sign))
+    if not changes:
+        return
+
+    day = _order_day(order)
+    changes['updated_at'] = timezone.now()
+    _upsert(DailySalesSummary, {'date': day}, changes)
+    if entered != left:
+        _record_products(order, day, sign)
+    invalidate_reports()
+
+
+def rebuild_sales_summary(
+    order_model=Order,
+    item_model=OrderItem,
+    summary_model=DailySalesSummary,
+    product_model=DailyProductSales,
+    archive_model=None,
+) -> tuple[int, int]:
+    """Пересчитать обе сводки агрегацией в БД; модели передаются из миграции.
+
+    Если передан `archive_model`, учитываются и заказы из архива.
+    """
+    local_tz = timezone.get_current_timezone()
+    completed = Q(status='completed')
+    now = timezone.now()
+    sources = [order_model] if archive_model is None else [order_model, archive_model]
+
+    days = defaultdict(lambda: defaultdict(int))
+    for model in sources:
+        rows = (
+            model.objects.order_by()
+            .annotate(day=TruncDate('created_at', tzinfo=local_tz))
+            .values('day')
+            .annotate(
+                orders_count=Count('id'),
+                revenue=Sum('total_price', filter=completed),
+                delivery_revenue=Sum('delivery_price', filter=completed),
+                **{
+                    column: Count('id', filter=Q(status__in=statuses))
+                    for column, statuses in STATUS_COLUMNS.items()
+                },
+            )
+        )
+        for row in rows:
+            totals = days[row.pop('day')]
+            for column, value in row.items():
+                totals[column] += value or 0
+    summaries = [
+        summary_model(
+            date=day,
+            revenue=Decimal(totals.pop('revenue')),
+            delivery_revenue=Decimal(totals.pop('delivery_revenue')),
+            updated_at=now,
+            **totals,
+        )
+        for day, totals in days.items()
+    ]
+
+    sold = defaultdict(lambda: [0, Decimal('0')])
+    products = (
+        item_model.objects.filter(order__status='completed').order_by()
+        .annotate(day=TruncDate('order__created_at', tzinfo=local_tz))
+        .values_list('day', 'product_name')
+        .annotate(
+            sold=Sum('quantity'),
+            sold_revenue=Sum(ExpressionWrapper(
+                F('price') * F('quantity'), output_field=DecimalField(max_digits=14, decimal_places=2),
+            )),
+        )
+    )
+    for day, name, quantity, revenue in products:
+        sold[day, name][0] += quantity or 0
+        sold[day, name][1] += revenue or Decimal('0')
+    if archive_model is not None:
+        # Позиции архивных заказов лежат в JSON: складываем их здесь.
+        archived = archive_model.objects.filter(completed).values_list('created_at', 'items')
+        for created_at, items in archived.iterator():
+            day = timezone.localdate(created_at, local_tz)
+            for item in items:
+                quantity = item.get('quantity') or 0
+                sold[day, item['product_name']][0] += quantity
+                sold[day, item['product_name']][1] += Decimal(item.get('price') or '0') * quantity
+    product_rows = [
+        product_model(date=day, product_name=name, quantity=max(0, quantity), revenue=revenue)
+        for (day, name), (quantity, revenue) in sold.items()
+    ]
+
+    with transaction.atomic():
+        summary_model.objects.all().delete()
+        product_model.objects.all().delete()
+        summary_model.objects.bulk_create(summaries, batch_size=1000)
+        product_model.objects.bulk_create(product_rows, batch_size=1000)
+    invalidate_reports()
+    return len(summaries), len(product_rows)
+
+
+def invalidate_reports() -> None:
+    with _reports_lock:
+        _reports.clear()
+
+
+def sales_report(days: int) -> dict:
+    """Итоги за последние `days` дней (включая сегодня) только по сводкам.
+
+    Кэшируется в памяти на SALES_REPORT_CACHE_SECONDS; локальные изменения
+    сводок сбрасывают кэш сразу.
+    """
+    ttl = int(getattr(settings, 'SALES_REPORT_CACHE_SECONDS', 60))
+    now = time.monotonic()
+    with _reports_lock:
+        cached = _reports.get(days)
+        if cached and cached[0] > now:
+            return cached[1]
+
+    since = timezone.localdate() - timedelta(days=max(1, days) - 1)
+    columns = ['orders_count', 'revenue', 'delivery_revenue', *STATUS_COLUMNS]
+    totals = DailySalesSummary.objects.filter(date__gte=since).aggregate(
+        **{column: Sum(column) for column in columns}
+    )
+    report = {column: totals[column] or 0 for column in columns}
+    report['since'] = since
+    completed_count = report['completed_count']
+    report['average_check'] = report['revenue'] / completed_count if completed_count else Decimal('0')
+    report['conversion'] = completed_count / report['orders_count'] if report['orders_count'] else 0.0
+    report['top_products'] = list(
+        DailyProductSales.objects.filter(date__gte=since)
+        .values('product_name')
+        .annotate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+        .order_by('-quantity', '-revenue')[:TOP_PRODUCTS]
+    )
+
+    if ttl > 0:
+        with _reports_lock:
+            _reports[days] = (now + ttl, report)
+    return report
@@ -3,6 +3,7 @@ from .models import (
     Category, Product, ProductImage, Review,
     SiteSettings, HeroSection, PromoBanner, DeliveryInfo
 )
+from .thumbnails import build_srcset
 
 
 def media_url(file_field):
@@ -14,44 +15,69 @@ def media_url(file_field):
         return None
 
 
+def media_srcset(file_field, variants):
+    if not file_field:
+        return None
+
+    def url_for_name(name):
+        try:
+            return file_field.storage.url(name)
+        except Exception:
+            return None
+
+    return build_srcset(file_field.name, variants, url_for_name)
+
+
 class ProductImageSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = ProductImage
-        fields = ['id', 'image', 'order']
+        fields = ['id', 'image', 'image_srcset', 'order']
 
     def get_image(self, obj):
         return media_url(getattr(obj, 'image', None))
 
+    def get_image_srcset(self, obj):
+        return media_srcset(getattr(obj, 'image', None), obj.image_variants)
+
 
 class CategorySerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Category
-        fields = ['id', 'name', 'slug', 'description', 'image', 'order']
+        fields = ['id', 'name', 'slug', 'description', 'image', 'image_srcset', 'order']
 
     def get_image(self, obj):
         return media_url(getattr(obj, 'image', None))
 
+    def get_image_srcset(self, obj):
+        return media_srcset(getattr(obj, 'image', None), obj.image_variants)
+
 
 class ProductSerializer(serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     images = ProductImageSerializer(many=True, read_only=True)
     average_rating = serializers.SerializerMethodField()
     image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = Product
         fields = [
             'id', 'name', 'slug', 'description', 'short_description',
-            'price', 'hide_price', 'image', 'category', 'is_active', 'is_popular',
+            'price', 'hide_price', 'image', 'image_srcset', 'category', 'is_active', 'is_popular',
             'order', 'images', 'average_rating'
         ]
 
     def get_image(self, obj):
         return media_url(getattr(obj, 'image', None))
+
+    def get_image_srcset(self, obj):
+        return media_srcset(getattr(obj, 'image', None), obj.image_variants)
     
     def get_average_rating(self, obj):
         annotated = getattr(obj, 'average_rating', None)
@@ -66,31 +92,39 @@ class ProductSerializer(serializers.ModelSerializer):
 class ProductListSerializer(serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
         fields = [
             'id', 'name', 'slug', 'description', 'short_description',
-            'price', 'hide_price', 'image', 'category', 'is_active', 'is_popular',
+            'price', 'hide_price', 'image', 'image_srcset', 'category', 'is_active', 'is_popular',
             'order'
         ]
 
     def get_image(self, obj):
         return media_url(getattr(obj, 'image', None))
 
+    def get_image_srcset(self, obj):
+        return media_srcset(getattr(obj, 'image', None), obj.image_variants)
+
 
 class ReviewSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
     avatar_url = serializers.SerializerMethodField()
+    avatar_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Review
-        fields = ['id', 'name', 'text', 'rating', 'product', 'product_name', 'avatar_url', 'created_at']
+        fields = ['id', 'name', 'text', 'rating', 'product', 'product_name', 'avatar_url', 'avatar_srcset', 'created_at']
         read_only_fields = ['created_at']
 
     def get_avatar_url(self, obj):
         return media_url(getattr(obj, 'avatar', None))
 
+    def get_avatar_srcset(self, obj):
+        return media_srcset(getattr(obj, 'avatar', None), obj.avatar_variants)
+
 
 class SiteSettingsSerializer(serializers.ModelSerializer):
     class Meta:
@@ -104,18 +138,22 @@ class SiteSettingsSerializer(serializers.ModelSerializer):
 
 class HeroSectionSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = HeroSection
         fields = [
             'label', 'title', 'subtitle', 'button_text', 'button_link',
-            'secondary_button_text', 'secondary_button_link', 'image',
+            'secondary_button_text', 'secondary_button_link', 'image', 'image_srcset',
             'badge_number', 'badge_text', 'benefit_1', 'benefit_2', 'benefit_3'
         ]
 
     def get_image(self, obj):
         return media_url(getattr(obj, 'image', None))
 
+    def get_image_srcset(self, obj):
+        return media_srcset(getattr(obj, 'image', None), obj.image_variants)
+
 
 class PromoBannerSerializer(serializers.ModelSerializer):
     class Meta:
@@ -1,174 +1,80 @@
 import logging
 
-from django.conf import settings
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 
-from telegram_bot.sender import send_message, send_photo
-from .models import Order, normalize_phone
-from .payments import (
-    yookassa_enabled,
-    create_payment_for_order,
-    update_order_from_payment,
-    get_return_url,
-    get_manual_payment_url,
-)
+from . import sales_summary
+from .customer_profiles import record_order_created
+from .models import DeliveryTariff, DeliveryTariffVersion, ImageJob, Order, normalize_phone
+from .image_queue import enqueue_variants, queue_enabled
+from .order_state import OrderStateMachine
+from .thumbnails import THUMBNAIL_FIELDS, delete_variants, update_instance_variants, variants_field_name
 
 logger = logging.getLogger(__name__)
-CARD_PAYMENT_MAINTENANCE_NOTE = "Оплата по карте временно на техническом обслуживании."
-
-
-def _build_transfer_payment_text(order: Order) -> str:
-    details = (order.transfer_details or "").strip()
-    text = (
-        f"💳 Оплата заказа #{order.id}\n\n"
-        f"{CARD_PAYMENT_MAINTENANCE_NOTE}\n"
-        "Сейчас принимаем оплату переводом напрямую магазину.\n"
-        "После перевода отправьте чек/скрин в этот чат.\n\n"
-    )
-    if details:
-        text += f"Реквизиты:\n{details}\n\n"
-    else:
-        text += "Реквизиты менеджер отправит отдельным сообщением.\n\n"
-    text += f"Сумма к оплате: {order.total_price} ₽"
-    return text
 
 
 @receiver(pre_save, sender=Order)
 def order_pre_save(sender, instance: Order, **kwargs):
     instance.phone_normalized = normalize_phone(instance.phone)
-    if instance.pk:
+    if not instance.pk:
+        instance._previous_status = None
+    elif instance.tracks('status'):
+        # Объект загружен из БД: прежний статус уже известен, SELECT не нужен.
+        instance._previous_status = instance.previous_status
+    else:
+        # Объект собран вручную с pk или статус был отложен через only().
         instance._previous_status = (
             Order.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
         )
-    else:
-        instance._previous_status = None
 
 
 @receiver(post_save, sender=Order)
-def order_post_save(sender, instance: Order, created: bool, **kwargs):
+def order_post_save(sender, instance: Order, created: bool, update_fields=None, **kwargs):
+    previous_status = getattr(instance, '_previous_status', None)
+    # Сразу помечаем записанное как сохраненное: повторный save() в хуках
+    # не должен снова увидеть смену статуса.
+    instance.mark_saved(update_fields)
     if created:
+        record_order_created(instance)
+        sales_summary.record_order_created(instance)
         return
 
-    previous_status = getattr(instance, '_previous_status', None)
     if not previous_status or previous_status == instance.status:
         return
 
-    token = settings.TELEGRAM_BOT_TOKEN
-    if not token or not instance.telegram_user_id:
+    # Смена статуса через save() (админка, фото готового букета): те же
+    # побочные эффекты, что и у переходов OrderStateMachine.
+    OrderStateMachine.run_hooks(instance, previous_status)
+
+
+def image_post_save(sender, instance, raw: bool = False, **kwargs):
+    if raw:
         return
+    field_name = THUMBNAIL_FIELDS[sender]
+    # Ресайз больших фото — в очереди (process_image_jobs), а не в запросе админки.
+    # Если изображение убрали, варианты удаляются сразу: это быстро.
+    if queue_enabled() and getattr(instance, field_name):
+        enqueue_variants(instance, field_name)
+        return
+    update_instance_variants(instance, field_name)
 
-    status_labels = dict(Order.STATUS_CHOICES)
-    status_icons = {
-        'new': '🆕',
-        'processing': '🛠️',
-        'ready': '📦',
-        'completed': '🏁',
-        'cancelled': '❌',
-        'expired': '⌛',
-        # legacy statuses (safety for old rows)
-        'confirmed': '✅',
-        'in_progress': '🛠️',
-        'delivering': '🚚',
-    }
-    old_label = status_labels.get(previous_status, previous_status)
-    new_label = status_labels.get(instance.status, instance.status)
-    new_icon = status_icons.get(instance.status, 'ℹ️')
-
-    text = (
-        f"{new_icon} Статус вашего заказа #{instance.id} изменен:\n"
-        f"{old_label} -> {new_label}"
-    )
-
-    delivered = False
-    if instance.status == 'ready' and getattr(instance, 'ready_photo', None):
-        try:
-            photo_path = instance.ready_photo.path
-        except Exception:
-            photo_path = None
-
-        if photo_path:
-            delivered = send_photo(instance.telegram_user_id, photo_path, caption=text, timeout=10)
-
-    if not delivered:
-        delivered = send_message(instance.telegram_user_id, text, timeout=5)
-
-    if not delivered:
-        logger.warning("Не удалось отправить уведомление о статусе заказа %s", instance.id)
-
-    # После статуса "Готов" — запрос оплаты (перевод или онлайн).
-    if instance.status == 'ready':
-        if not instance.total_price or instance.total_price <= 0:
-            return
-        if instance.payment_status != 'succeeded':
-            if (instance.payment_method or 'transfer') == 'transfer':
-                if instance.payment_status == 'not_paid':
-                    instance.payment_status = 'pending'
-                    instance.save(update_fields=['payment_status', 'updated_at'])
-                pay_text = _build_transfer_payment_text(instance)
-                if not send_message(instance.telegram_user_id, pay_text, timeout=10):
-                    logger.warning("Не удалось отправить инструкции перевода по заказу %s", instance.id)
-                return
-
-            payment_url = getattr(instance, 'payment_url', '')
-            has_yookassa = yookassa_enabled()
-
-            if not payment_url and has_yookassa:
-                payment = create_payment_for_order(
-                    order=instance,
-                    amount=instance.total_price,
-                    description=f"Оплата заказа #{instance.id}",
-                    return_url=get_return_url()
-                )
-                if payment:
-                    _, payment_url = update_order_from_payment(instance, payment)
-
-            if not payment_url:
-                payment_url = get_manual_payment_url(instance)
-                if payment_url:
-                    instance.payment_url = payment_url
-                    if instance.payment_status == 'not_paid':
-                        instance.payment_status = 'pending'
-                    instance.save(update_fields=['payment_url', 'payment_status', 'updated_at'])
-
-            if payment_url:
-                if has_yookassa:
-                    pay_text = (
-                        f"💳 Ваш букет готов! Пожалуйста, оплатите заказ #{instance.id}.\n"
-                        "Нажмите кнопку ниже для оплаты через YooKassa."
-                    )
-                else:
-                    pay_text = (
-                        f"💳 Ваш букет готов! Пожалуйста, оплатите заказ #{instance.id}.\n"
-                        "Нажмите кнопку ниже для перехода к временной оплате."
-                    )
-
-                inline_keyboard = [[{"text": "💳 Оплатить онлайн", "url": payment_url}]]
-                if has_yookassa and instance.payment_id:
-                    inline_keyboard.append(
-                        [{"text": "✅ Проверить оплату", "callback_data": f"check_payment_{instance.id}"}]
-                    )
-
-                reply_markup = {
-                    "inline_keyboard": inline_keyboard
-                }
-                if not send_message(instance.telegram_user_id, pay_text, reply_markup=reply_markup, timeout=10):
-                    logger.warning("Не удалось отправить ссылку на оплату заказа %s", instance.id)
-
-    # После завершения — сразу запросить отзыв со звездами.
-    if instance.status == 'completed':
-        review_text = (
-            f"🙏 Спасибо! Заказ #{instance.id} завершен.\n\n"
-            "Оцените, пожалуйста, наш сервис:"
-        )
-        review_markup = {
-            "inline_keyboard": [[
-                {"text": "⭐️", "callback_data": "rate_1"},
-                {"text": "⭐️", "callback_data": "rate_2"},
-                {"text": "⭐️", "callback_data": "rate_3"},
-                {"text": "⭐️", "callback_data": "rate_4"},
-                {"text": "⭐️", "callback_data": "rate_5"},
-            ]]
-        }
-        if not send_message(instance.telegram_user_id, review_text, reply_markup=review_markup, timeout=10):
-            logger.warning("Не удалось отправить запрос отзыва по заказу %s", instance.id)
+
+def image_post_delete(sender, instance, **kwargs):
+    field_name = THUMBNAIL_FIELDS[sender]
+    delete_variants(getattr(instance, variants_field_name(field_name), None))
+    ImageJob.objects.filter(
+        model_label=sender._meta.label, object_id=instance.pk, field_name=field_name,
+    ).delete()
+
+
+for _model in THUMBNAIL_FIELDS:
+    post_save.connect(image_post_save, sender=_model, dispatch_uid=f'thumbnails_save_{_model.__name__}')
+    post_delete.connect(image_post_delete, sender=_model, dispatch_uid=f'thumbnails_delete_{_model.__name__}')
+
+
+@receiver([post_save, post_delete], sender=DeliveryTariff)
+def delivery_tariff_changed(sender, raw: bool = False, **kwargs):
+    # Процессы увидят новую версию и пересоберут автомат тарифов в фоне.
+    if raw:
+        return
+    DeliveryTariffVersion.bump()
@@ -0,0 +1,194 @@
+"""
+Хранилище медиафайлов с оптимизацией изображений при сохранении.
+
+Оригиналы из админки и бота уменьшаются до IMAGE_UPLOAD_MAX_DIMENSION,
+теряют EXIF/XMP (в том числе геометки) и пережимаются с IMAGE_UPLOAD_QUALITY.
+Формат файла не меняется, а в имя добавляется хеш содержимого
+(`photo~1a2b3c4d5e6f.jpg`): такой URL можно кэшировать навсегда, а замена
+фото в админке дает новый URL. Хеш отделяется `~`: из имен загруженных
+файлов Django этот символ вырезает (get_valid_filename), поэтому такое имя
+может получиться только у хранилища. Варианты для srcset (`thumbs/`) не трогаем —
+их уже готовит catalog/thumbnails.py.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import FileSystemStorage
+from django.utils.crypto import get_random_string
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+_OPTIMIZED_EXTENSIONS = {
+    '.jpg': 'JPEG',
+    '.jpeg': 'JPEG',
+    '.png': 'PNG',
+    '.webp': 'WEBP',
+}
+_SKIP_PREFIXES = ('thumbs/',)
+_METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment', 'photoshop')
+
+HASH_LENGTH = 12
+HASH_SEPARATOR = '~'
+# Снимаем и прежний суффикс `.<хеш>`, чтобы hash_media_names переименовал такие файлы.
+_HASH_SUFFIX_RE = re.compile(r'[~.][0-9a-f]{%d}$' % HASH_LENGTH)
+_HASHED_NAME_RE = re.compile(r'~[0-9a-f]{%d}\.[A-Za-z0-9]+$' % HASH_LENGTH)
+
+
+def optimization_enabled() -> bool:
+    return bool(getattr(settings, 'IMAGE_UPLOAD_OPTIMIZE', True))
+
+
+def hashed_names_enabled() -> bool:
+    return bool(getattr(settings, 'MEDIA_HASHED_NAMES', True))
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.md5(data, usedforsecurity=False).hexdigest()[:HASH_LENGTH]
+
+
+def is_hashed_name(name: str) -> bool:
+    """Имя дало хранилище (или thumbnails) по хешу содержимого, а не пользователь."""
+    return bool(_HASHED_NAME_RE.search(name))
+
+
+def strip_hash(stem: str) -> str:
+    return _HASH_SUFFIX_RE.sub('', stem)
+
+
+def hashed_name(name: str, digest: str, max_length: int | None = None) -> str:
+    """`dir/photo.jpg` -> `dir/photo~<hash>.jpg` с учетом max_length поля."""
+    path = PurePosixPath(name.replace('\\', '/'))
+    stem = strip_hash(path.stem)
+    tail = f'{HASH_SEPARATOR}{digest}{path.suffix}'
+    if max_length:
+        prefix_length = len(str(path.parent)) + 1 if str(path.parent) != '.' else 0
+        stem = stem[:max(1, max_length - prefix_length - len(tail))]
+    return str(path.with_name(f'{stem}{tail}'))
+
+
+def _format_for_name(name: str) -> str | None:
+    path = PurePosixPath(name.replace('\\', '/'))
+    if str(path).startswith(_SKIP_PREFIXES):
+        return None
+    return _OPTIMIZED_EXTENSIONS.get(path.suffix.lower())
+
+
+def is_managed_image_name(name: str) -> bool:
+    """Файл, который хранилище оптимизирует и называет по хешу при сохранении."""
+    return bool(name and _format_for_name(name))
+
+
+def _has_metadata(image: Image.Image) -> bool:
+    if any(image.info.get(key) for key in _METADATA_KEYS):
+        return True
+    try:
+        return bool(image.getexif())
+    except Exception:
+        return False
+
+
+def optimize_image_bytes(data: bytes, name: str) -> bytes | None:
+    """
+    Пережать изображение. Возвращает новые байты или None, если файл лучше
+    оставить как есть (не картинка, анимация, результат не меньше и т.п.).
+    """
+    fmt = _format_for_name(name)
+    if fmt is None:
+        return None
+    max_dimension = int(getattr(settings, 'IMAGE_UPLOAD_MAX_DIMENSION', 2560))
+    quality = int(getattr(settings, 'IMAGE_UPLOAD_QUALITY', 85))
+
+    try:
+        image = Image.open(BytesIO(data))
+        if getattr(image, 'is_animated', False) or image.format != fmt:
+            return None
+        has_metadata = _has_metadata(image)
+        icc_profile = image.info.get('icc_profile')
+        if max_dimension and fmt == 'JPEG':
+            image.draft('RGB', (max_dimension, max_dimension))
+        image.load()
+        # Поворот из EXIF применяем к пикселям: сам EXIF дальше не сохраняется.
+        image = ImageOps.exif_transpose(image)
+    except (UnidentifiedImageError, OSError, ValueError, Image.DecompressionBombError) as exc:
+        logger.info("Изображение %s не оптимизировано: %s", name, exc)
+        return None
+
+    resized = False
+    if max_dimension and max(image.size) > max_dimension:
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS, reducing_gap=3.0)
+        resized = True
+
+    options = {}
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    if fmt == 'JPEG':
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        options.update(quality=quality, optimize=True, progressive=True)
+    elif fmt == 'WEBP':
+        options.update(quality=quality, method=4)
+    else:
+        options.update(optimize=True)
+
+    buffer = BytesIO()
+    try:
+        image.save(buffer, fmt, **options)
+    except (OSError, ValueError) as exc:
+        logger.info("Изображение %s не оптимизировано: %s", name, exc)
+        return None
+    optimized = buffer.getvalue()
+
+    # Метаданные снимаем даже ценой пары килобайт; без них и без ресайза
+    # пережатый файл нужен, только если он действительно меньше.
+    if resized or has_metadata or len(optimized) < len(data):
+        return optimized
+    return None
+
+
+def format_bytes_saved(before: int, after: int) -> str:
+    saved = before - after
+    percent = saved * 100 / before if before else 0
+    return f"{before} → {after} байт (−{saved} байт, {percent:.0f}%)"
+
+
+class OptimizedImageStorage(FileSystemStorage):
+    """FileSystemStorage: оптимизация изображений и хеш содержимого в имени."""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        if name and _format_for_name(name):
+            content.seek(0)
+            data = content.read()
+            content.seek(0)
+            if optimization_enabled():
+                optimized = optimize_image_bytes(data, name)
+                if optimized is not None:
+                    logger.info(
+                        "Изображение %s оптимизировано: %s", name, format_bytes_saved(len(data), len(optimized))
+                    )
+                    data = optimized
+                    content = ContentFile(optimized)
+            if hashed_names_enabled():
+                name = self.get_available_hashed_name(name, content_hash(data), max_length)
+        return super().save(name, content, max_length=max_length)
+
+    def get_available_hashed_name(self, name: str, digest: str, max_length: int | None = None) -> str:
+        candidate = hashed_name(name, digest, max_length)
+        while self.exists(candidate):
+            # Тот же файл уже загружен для другого объекта. Общий файл не
+            # используем: удаление одного объекта не должно задеть другой.
+            path = PurePosixPath(candidate)
+            unique = f'{strip_hash(path.stem)}_{get_random_string(7)}{path.suffix}'
+            candidate = hashed_name(str(path.with_name(unique)), digest, max_length)
+        return candidate
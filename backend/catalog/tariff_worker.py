@@ -0,0 +1,38 @@
+"""
+Точки входа для процессов пула `manage.py requote_orders`.
+
+Модели здесь не нужны: процесс получает списки тарифов при запуске, один
+раз собирает по ним автоматы и дальше только сопоставляет адреса.
+"""
+_matchers = None
+
+
+def init_worker(current_tariffs, new_tariffs):
+    global _matchers
+    from .delivery_tariffs import TariffMatcher
+
+    _matchers = (TariffMatcher(current_tariffs), TariffMatcher(new_tariffs))
+
+
+def requote(rows):
+    """
+    rows: [(id, address, delivery_price)] ->
+    [(id, address, delivery_price, текущий тариф, новый тариф)],
+    тариф — (label, cost) или None.
+    """
+    from .delivery_tariffs import normalize_address_text
+
+    current, new = _matchers
+    result = []
+    for order_id, address, delivery_price in rows:
+        normalized = normalize_address_text(address or '')
+        current_tariff = current.match_normalized(normalized) if normalized else None
+        new_tariff = new.match_normalized(normalized) if normalized else None
+        result.append((
+            order_id,
+            address,
+            delivery_price,
+            current_tariff and (current_tariff[2], current_tariff[1]),
+            new_tariff and (new_tariff[2], new_tariff[1]),
+        ))
+    return result
@@ -6,10 +6,200 @@ from django.conf import settings
 import logging
 from decimal import Decimal
 
-from .delivery_tariffs import load_delivery_tariffs, normalize_address_text
+from .delivery_tariffs import normalize_address_text, tariff_registry
+from .geocoder_cache import cache_enabled, forward_query, geocoder_cache, reverse_query, round_coordinates
+from .models import GeocodeCacheEntry
+from .route_quotes import known_origin, remember_origin, route_quote_cache
 
 logger = logging.getLogger(__name__)
 
+YANDEX_TAXI_ESTIMATE_URL = "https://taxi-api.yandex.net/v1/estimate"
+DEFAULT_GEOCODER_URL = "https://geocode-maps.yandex.ru/1.x/"
+# Слишком общие значения из геокодера, по ним тариф не выбираем.
+_GEOCODER_STOP_VALUES = {
+    normalize_address_text('россия'),
+    normalize_address_text('российская федерация'),
+    normalize_address_text('республика башкортостан'),
+    normalize_address_text('башкортостан'),
+}
+
+
+# Разбор ответов и сборка результатов общие для синхронного расчета и
+# асинхронного (catalog/delivery_quotes.py).
+
+def geocoder_url() -> str:
+    return getattr(settings, 'YANDEX_GEOCODER_URL', '') or DEFAULT_GEOCODER_URL
+
+
+def geocoder_params(params: dict) -> dict:
+    return {
+        **params,
+        'format': 'json',
+        'apikey': getattr(settings, 'YANDEX_GEOCODER_API_KEY', ''),
+    }
+
+
+def _first_geo_object(data: dict | None) -> dict | None:
+    features = (
+        (data or {}).get('response', {})
+        .get('GeoObjectCollection', {})
+        .get('featureMember', [])
+    )
+    if not features:
+        return None
+    return features[0].get('GeoObject', {})
+
+
+def parse_address_candidates(data: dict | None) -> list[str]:
+    """Кандидаты адреса/локации из ответа геокодера для сопоставления тарифа."""
+    geo_object = _first_geo_object(data)
+    if geo_object is None:
+        return []
+    meta = geo_object.get('metaDataProperty', {}).get('GeocoderMetaData', {})
+    address_meta = meta.get('Address', {}) or {}
+    components = address_meta.get('Components', []) or []
+
+    candidates: list[str] = []
+    full_text = (meta.get('text') or '').strip()
+    if full_text:
+        candidates.append(full_text)
+
+    formatted = (address_meta.get('formatted') or '').strip()
+    if formatted:
+        candidates.append(formatted)
+
+    for component in components:
+        name = (component.get('name') or '').strip()
+        kind = (component.get('kind') or '').strip().lower()
+        if not name:
+            continue
+        # Для тарифа важны в первую очередь населенный пункт/район.
+        if kind in {'locality', 'district', 'area', 'province'}:
+            candidates.append(name)
+
+    # Удаляем дубли и слишком общие значения.
+    unique: list[str] = []
+    seen: set[str] = set()
+    for item in candidates:
+        normalized_item = normalize_address_text(item)
+        if not normalized_item or normalized_item in _GEOCODER_STOP_VALUES or normalized_item in seen:
+            continue
+        seen.add(normalized_item)
+        unique.append(item)
+    return unique
+
+
+def parse_point(data: dict | None) -> dict | None:
+    """Координаты первого результата геокодера: {'lat', 'lon'}."""
+    geo_object = _first_geo_object(data)
+    if geo_object is None:
+        return None
+    pos = geo_object['Point']['pos']
+    lon, lat = map(float, pos.split())
+    return {'lat': lat, 'lon': lon}
+
+
+def parse_reverse_address(data: dict | None) -> dict | None:
+    geo_object = _first_geo_object(data)
+    if geo_object is None:
+        return None
+    meta = geo_object['metaDataProperty']['GeocoderMetaData']
+    # Получаем полный адрес
+    address_components = meta['Address']['Components']
+    address_parts = [comp['name'] for comp in address_components]
+    return {
+        # Также можно получить красивый форматированный адрес
+        'formatted_address': meta['text'],
+        'full_address': ', '.join(address_parts),
+        'components': address_components,
+    }
+
+
+def reverse_geocode_request(lat, lon) -> tuple[str, dict]:
+    """Ключ кэша и параметры обратного геокодирования."""
+    # Координаты округляем (~10 м), чтобы соседние точки попадали в кэш.
+    lat_rounded, lon_rounded = round_coordinates(lat, lon)
+    params = {
+        'geocode': f"{lon_rounded},{lat_rounded}",  # Важно: сначала долгота, потом широта
+        'results': 1,
+        'kind': 'house'  # Ищем дома
+    }
+    return reverse_query(lat, lon, results=1, kind='house'), params
+
+
+def yandex_taxi_payload(from_coords: dict, to_coords: dict, order_weight) -> dict:
+    return {
+        'route': [
+            {'lat': from_coords['lat'], 'lon': from_coords['lon']},
+            {'lat': to_coords['lat'], 'lon': to_coords['lon']}
+        ],
+        'requirements': {
+            'cargo_options': {
+                'cargo_type': 'flowers',
+                'weight': order_weight
+            }
+        }
+    }
+
+
+def parse_yandex_taxi_estimate(result: dict) -> dict | None:
+    options = result.get('options', [])
+    if not options:
+        return None
+    cheapest = min(options, key=lambda x: x.get('price', {}).get('total', 0))
+    return {
+        'cost': Decimal(str(cheapest['price']['total'])),
+        'duration': cheapest.get('time', {}).get('minutes', 30),
+        'available': True,
+        'service': 'yandex_taxi'
+    }
+
+
+def fixed_tariff_quote(tariff) -> dict | None:
+    """Результат расчета для найденного тарифа (или None)."""
+    if tariff is None:
+        return None
+
+    _aliases, cost, label = tariff
+    if cost is None:
+        return {
+            'cost': Decimal('0'),
+            'duration': 0,
+            'available': False,
+            'service': 'manual',
+            'requires_manual_price': True,
+            'tariff_label': label,
+            'note': f'Не получилось рассчитать стоимость доставки автоматически ({label})',
+        }
+    return {
+        'cost': cost,
+        'duration': 30,
+        'available': True,
+        'service': 'прайс по адресу',
+        'tariff_label': label,
+        'note': f'Применен фиксированный тариф: {label}'
+    }
+
+
+def geocoded_tariff_quote(tariff_quote: dict, geocoded_text: str) -> dict:
+    tariff_quote['note'] = (
+        f"{tariff_quote.get('note', 'Применен фиксированный тариф')} "
+        f"(по данным геокодера: {geocoded_text})"
+    ).strip()
+    return tariff_quote
+
+
+def manual_quote(note: str = '') -> dict:
+    """Fallback, когда не удалось определить точный тариф/маршрут."""
+    return {
+        'cost': Decimal('0'),
+        'duration': 0,
+        'available': False,
+        'service': 'manual',
+        'requires_manual_price': True,
+        'note': note or 'Не получилось рассчитать стоимость доставки - введите стоимость сами'
+    }
+
 
 class TaxiDeliveryIntegration:
     """Класс для работы с доставкой через такси"""
@@ -21,7 +211,10 @@ class TaxiDeliveryIntegration:
         self.uber_api_key = getattr(settings, 'UBER_API_KEY', '')
         self.delivery_service = getattr(settings, 'TAXI_DELIVERY_SERVICE', 'yandex')  # yandex, uber, custom
         # Фиксированные тарифы по населенным пунктам (подгружаются из CSV).
-        self.fixed_location_tariffs = load_delivery_tariffs()
+        # Список и автомат берем из одного снимка, даже если его сейчас подменяют.
+        tariffs = tariff_registry.snapshot()
+        self.fixed_location_tariffs = tariffs.tariffs
+        self.tariff_matcher = tariffs.matcher
     
     def calculate_delivery_cost(self, from_address, to_address, order_weight=1):
         """
@@ -49,11 +242,7 @@ class TaxiDeliveryIntegration:
         for geocoded_text in self._geocode_address_candidates(to_address):
             fixed_tariff = self._get_fixed_tariff_by_address(geocoded_text)
             if fixed_tariff:
-                fixed_tariff['note'] = (
-                    f"{fixed_tariff.get('note', 'Применен фиксированный тариф')} "
-                    f"(по данным геокодера: {geocoded_text})"
-                ).strip()
-                return fixed_tariff
+                return geocoded_tariff_quote(fixed_tariff, geocoded_text)
 
         # Если справочник тарифов загружен, он считается источником истины.
         # Неугаданный адрес уходит в ручной расчет.
@@ -69,33 +258,7 @@ class TaxiDeliveryIntegration:
             return self._estimate_delivery(from_address, to_address)
 
     def _get_fixed_tariff_by_address(self, to_address: str):
-        normalized_address = normalize_address_text(to_address)
-        if not normalized_address:
-            return None
-
-        for aliases, cost, label in self.fixed_location_tariffs:
-            for alias in aliases:
-                normalized_alias = normalize_address_text(alias)
-                if normalized_alias and normalized_alias in normalized_address:
-                    if cost is None:
-                        return {
-                            'cost': Decimal('0'),
-                            'duration': 0,
-                            'available': False,
-                            'service': 'manual',
-                            'requires_manual_price': True,
-                            'tariff_label': label,
-                            'note': f'Не получилось рассчитать стоимость доставки автоматически ({label})',
-                        }
-                    return {
-                        'cost': cost,
-                        'duration': 30,
-                        'available': True,
-                        'service': 'прайс по адресу',
-                        'tariff_label': label,
-                        'note': f'Применен фиксированный тариф: {label}'
-                    }
-        return None
+        return fixed_tariff_quote(self.tariff_matcher.match(to_address))
     
     def _calculate_yandex_taxi(self, from_address, to_address, order_weight):
         """Расчет через Yandex Taxi API"""
@@ -106,114 +269,68 @@ class TaxiDeliveryIntegration:
         try:
             # Yandex Taxi API для расчета стоимости
             # Требуется регистрация в партнерской программе
-            url = "https://taxi-api.yandex.net/v1/estimate"
+            url = YANDEX_TAXI_ESTIMATE_URL
             headers = {
                 'Authorization': f'Bearer {self.yandex_taxi_api_key}',
                 'Content-Type': 'application/json'
             }
             
-            # Нужно получить координаты адресов
-            from_coords = self._geocode_address(from_address)
+            # Нужно получить координаты адресов (магазина — один раз за процесс)
+            from_coords = self._shop_origin(from_address)
             to_coords = self._geocode_address(to_address)
             
             if not from_coords or not to_coords:
                 return self._estimate_delivery(from_address, to_address)
             
-            data = {
-                'route': [
-                    {'lat': from_coords['lat'], 'lon': from_coords['lon']},
-                    {'lat': to_coords['lat'], 'lon': to_coords['lon']}
-                ],
-                'requirements': {
-                    'cargo_options': {
-                        'cargo_type': 'flowers',
-                        'weight': order_weight
-                    }
-                }
-            }
-            
+            cache_key = route_quote_cache.key(from_coords, to_coords, order_weight)
+            cached = route_quote_cache.get(cache_key)
+            if cached:
+                return cached
+
+            data = yandex_taxi_payload(from_coords, to_coords, order_weight)
             response = requests.post(url, json=data, headers=headers, timeout=10)
             
             if response.status_code == 200:
-                result = response.json()
-                options = result.get('options', [])
-                if options:
-                    cheapest = min(options, key=lambda x: x.get('price', {}).get('total', 0))
-                    return {
-                        'cost': Decimal(str(cheapest['price']['total'])),
-                        'duration': cheapest.get('time', {}).get('minutes', 30),
-                        'available': True,
-                        'service': 'yandex_taxi'
-                    }
+                estimate = parse_yandex_taxi_estimate(response.json())
+                if estimate:
+                    route_quote_cache.set(cache_key, estimate)
+                    return estimate
         except Exception as e:
             logger.error(f"Ошибка расчета доставки через Yandex Taxi: {e}")
         
         return self._estimate_delivery(from_address, to_address)
 
+    def _geocoder_request(self, kind: str, cache_query: str, params: dict) -> dict | None:
+        """
+        GET к Яндекс.Геокодеру через кэш (см. catalog/geocoder_cache.py).
+        None — ошибка HTTP, такие ответы не кэшируются.
+        """
+        use_cache = cache_enabled()
+        if use_cache:
+            cached = geocoder_cache.get(kind, cache_query)
+            if cached is not None:
+                return cached
+
+        response = requests.get(geocoder_url(), params=geocoder_params(params), timeout=5)
+        if response.status_code >= 400:
+            return None
+        data = response.json()
+        if use_cache and isinstance(data, dict) and 'response' in data:
+            geocoder_cache.set(kind, cache_query, data)
+        return data
+
     def _geocode_address_candidates(self, address: str) -> list[str]:
         """Получить кандидаты адреса/локации из геокодера для сопоставления тарифа."""
         api_key = getattr(settings, 'YANDEX_GEOCODER_API_KEY', '')
         if not api_key:
             return []
         try:
-            url = "https://geocode-maps.yandex.ru/1.x/"
-            params = {
-                'geocode': address,
-                'format': 'json',
-                'apikey': api_key,
-                'results': 1,
-            }
-            response = requests.get(url, params=params, timeout=5)
-            if response.status_code >= 400:
-                return []
-            data = response.json()
-            features = (
-                data.get('response', {})
-                .get('GeoObjectCollection', {})
-                .get('featureMember', [])
+            data = self._geocoder_request(
+                GeocodeCacheEntry.KIND_FORWARD,
+                forward_query(address, results=1),
+                {'geocode': address, 'results': 1},
             )
-            if not features:
-                return []
-
-            geo_object = features[0].get('GeoObject', {})
-            meta = geo_object.get('metaDataProperty', {}).get('GeocoderMetaData', {})
-            address_meta = meta.get('Address', {}) or {}
-            components = address_meta.get('Components', []) or []
-
-            candidates: list[str] = []
-            full_text = (meta.get('text') or '').strip()
-            if full_text:
-                candidates.append(full_text)
-
-            formatted = (address_meta.get('formatted') or '').strip()
-            if formatted:
-                candidates.append(formatted)
-
-            for component in components:
-                name = (component.get('name') or '').strip()
-                kind = (component.get('kind') or '').strip().lower()
-                if not name:
-                    continue
-                # Для тарифа важны в первую очередь населенный пункт/район.
-                if kind in {'locality', 'district', 'area', 'province'}:
-                    candidates.append(name)
-
-            # Удаляем дубли и слишком общие значения.
-            stop_values = {
-                normalize_address_text('россия'),
-                normalize_address_text('российская федерация'),
-                normalize_address_text('республика башкортостан'),
-                normalize_address_text('башкортостан'),
-            }
-            unique: list[str] = []
-            seen: set[str] = set()
-            for item in candidates:
-                normalized_item = normalize_address_text(item)
-                if not normalized_item or normalized_item in stop_values or normalized_item in seen:
-                    continue
-                seen.add(normalized_item)
-                unique.append(item)
-            return unique
+            return parse_address_candidates(data)
         except Exception as exc:
             logger.warning("Ошибка геокодирования текстового адреса %s: %s", address, exc)
             return []
@@ -228,26 +345,24 @@ class TaxiDeliveryIntegration:
         # Требуется регистрация в Uber для бизнеса
         return self._estimate_delivery(from_address, to_address)
     
+    def _shop_origin(self, address):
+        """Координаты магазина: SHOP_COORDINATES или геокодер один раз за процесс."""
+        coords = known_origin(address)
+        if coords is None:
+            coords = self._geocode_address(address)
+            remember_origin(address, coords)
+        return coords
+
     def _geocode_address(self, address):
         """Геокодирование адреса (получение координат)"""
         try:
             # Используем Yandex Geocoder API
-            url = "https://geocode-maps.yandex.ru/1.x/"
-            params = {
-                'geocode': address,
-                'format': 'json',
-                'apikey': getattr(settings, 'YANDEX_GEOCODER_API_KEY', '')
-            }
-            
-            response = requests.get(url, params=params, timeout=5)
-            data = response.json()
-            
-            if 'response' in data and 'GeoObjectCollection' in data['response']:
-                features = data['response']['GeoObjectCollection'].get('featureMember', [])
-                if features:
-                    pos = features[0]['GeoObject']['Point']['pos']
-                    lon, lat = map(float, pos.split())
-                    return {'lat': lat, 'lon': lon}
+            data = self._geocoder_request(
+                GeocodeCacheEntry.KIND_FORWARD,
+                forward_query(address),
+                {'geocode': address},
+            )
+            return parse_point(data)
         except Exception as e:
             logger.error(f"Ошибка геокодирования адреса {address}: {e}")
         
@@ -256,35 +371,10 @@ class TaxiDeliveryIntegration:
     def reverse_geocode(self, lat, lon):
         """Обратное геокодирование: координаты → адрес"""
         try:
-            # Используем Yandex Geocoder API для обратного геокодирования
-            url = "https://geocode-maps.yandex.ru/1.x/"
-            params = {
-                'geocode': f"{lon},{lat}",  # Важно: сначала долгота, потом широта
-                'format': 'json',
-                'apikey': getattr(settings, 'YANDEX_GEOCODER_API_KEY', ''),
-                'results': 1,
-                'kind': 'house'  # Ищем дома
-            }
-            
-            response = requests.get(url, params=params, timeout=5)
-            data = response.json()
-            
-            if 'response' in data and 'GeoObjectCollection' in data['response']:
-                features = data['response']['GeoObjectCollection'].get('featureMember', [])
-                if features:
-                    # Получаем полный адрес
-                    address_components = features[0]['GeoObject']['metaDataProperty']['GeocoderMetaData']['Address']['Components']
-                    address_parts = [comp['name'] for comp in address_components]
-                    full_address = ', '.join(address_parts)
-                    
-                    # Также можно получить красивый форматированный адрес
-                    formatted_address = features[0]['GeoObject']['metaDataProperty']['GeocoderMetaData']['text']
-                    
-                    return {
-                        'formatted_address': formatted_address,
-                        'full_address': full_address,
-                        'components': address_components
-                    }
+            # Используем Yandex Geocoder API для обратного геокодирования.
+            cache_query, params = reverse_geocode_request(lat, lon)
+            data = self._geocoder_request(GeocodeCacheEntry.KIND_REVERSE, cache_query, params)
+            return parse_reverse_address(data)
         except Exception as e:
             logger.error(f"Ошибка обратного геокодирования координат {lat}, {lon}: {e}")
         
@@ -292,14 +382,7 @@ class TaxiDeliveryIntegration:
     
     def _estimate_delivery(self, from_address, to_address):
         """Fallback, когда не удалось определить точный тариф/маршрут."""
-        return {
-            'cost': Decimal('0'),
-            'duration': 0,
-            'available': False,
-            'service': 'manual',
-            'requires_manual_price': True,
-            'note': 'Не получилось рассчитать стоимость доставки - введите стоимость сами'
-        }
+        return manual_quote()
     
     def create_delivery_order(self, order_id, from_address, to_address, order_weight=1):
         """
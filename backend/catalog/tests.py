@@ -0,0 +1,397 @@
+import csv
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .customer_profiles import rebuild_customer_profiles
+from .delivery_tariffs import TariffMatcher, read_delivery_tariffs
+from .management.commands.check_query_plans import HOT_QUERIES, query_plan
+from .management.commands.check_tariff_matcher import build_address_corpus, legacy_match
+from .models import (
+    Category, CustomerProfile, DailyProductSales, DailySalesSummary, Order, OrderArchive, OrderItem, Product, Review,
+)
+from .order_archive import ARCHIVE_FIELDS, archive_closed_orders
+from .order_export import ExportFilters, export_orders
+from .order_state import OrderStateMachine
+from .sales_summary import rebuild_sales_summary
+
+
+class OrderArchiveTests(TestCase):
+    def _full_order(self):
+        now = timezone.now()
+        order = Order.objects.create(
+            telegram_user_id=777, telegram_username='client', customer_name='Тест', phone='+7 900 000-00-00',
+            phone_normalized='79000000000', address='ул. Тестовая, 1', comment='Позвонить заранее',
+            is_preorder=True, requested_delivery='завтра к 10:00', status='completed',
+            items_subtotal=Decimal('3000'), delivery_price=Decimal('500'), total_price=Decimal('3150'),
+            discount_percent=10, has_subscription=True, service_chat_id='-1001234567890',
+            service_message_id=555, processing_by_user_id=42, processing_by_username='manager',
+            ready_photo='orders/ready/bouquet.jpg', payment_status='succeeded', payment_method='online',
+            transfer_details='Карта 2200 0000 0000 0000', payment_id='pay-1',
+            payment_url='https://yookassa.ru/checkout/pay-1', paid_at=now - timedelta(days=400),
+        )
+        OrderItem.objects.create(order=order, product_name='Розы', price=Decimal('1500'), quantity=2)
+        # created_at и updated_at ставятся автоматически: сдвигаем их в прошлое напрямую.
+        Order.objects.filter(id=order.id).update(
+            created_at=now - timedelta(days=401), updated_at=now - timedelta(days=400),
+        )
+        return Order.objects.get(id=order.id)
+
+    def test_archive_fields_cover_every_order_column(self):
+        columns = {field.attname for field in Order._meta.concrete_fields}
+        self.assertEqual(columns, set(ARCHIVE_FIELDS))
+
+    def test_every_value_survives_archiving(self):
+        order = self._full_order()
+        for name in ARCHIVE_FIELDS:
+            self.assertNotIn(getattr(order, name), (None, '', 0, False), name)
+
+        self.assertEqual(archive_closed_orders(180), 1)
+
+        self.assertFalse(Order.objects.filter(id=order.id).exists())
+        self.assertFalse(OrderItem.objects.filter(order_id=order.id).exists())
+        archived = OrderArchive.objects.get(id=order.id)
+        for name in ARCHIVE_FIELDS:
+            expected = getattr(order, name)
+            if name == 'ready_photo':
+                expected = expected.name
+            self.assertEqual(getattr(archived, name), expected, name)
+        self.assertEqual(archived.items, [
+            {'product_id': None, 'product_name': 'Розы', 'price': '1500.00', 'quantity': 2},
+        ])
+
+    def _export(self, filters=ExportFilters()):
+        with tempfile.TemporaryDirectory() as tmp:
+            path, count = export_orders(Path(tmp) / 'orders.csv', filters, chunk_size=1)
+            with open(path, newline='', encoding='utf-8') as f:
+                rows = list(csv.DictReader(f))
+        self.assertEqual(count, len(rows))
+        return rows
+
+    def test_archived_order_stays_in_export(self):
+        archived = self._full_order()
+        archive_closed_orders(180)
+        hot = Order.objects.create(
+            telegram_user_id=1, customer_name='Новый', phone='+79000000001', address='ул. Новая',
+            total_price=Decimal('900'), status='completed',
+        )
+        OrderItem.objects.create(order=hot, product_name='Тюльпаны', price=Decimal('300'), quantity=3)
+
+        rows = self._export()
+        self.assertEqual([(row['id'], row['items']) for row in rows], [
+            (str(hot.id), 'Тюльпаны x3'),
+            (str(archived.id), 'Розы x2'),
+        ])
+        self.assertEqual(rows[1]['total_price'], '3150.00')
+
+        since = timezone.localdate() - timedelta(days=1)
+        self.assertEqual([row['id'] for row in self._export(ExportFilters(date_from=since))], [str(hot.id)])
+        self.assertEqual(
+            [row['id'] for row in self._export(ExportFilters(date_to=since, statuses=('completed',)))],
+            [str(archived.id)],
+        )
+
+
+@override_settings(TELEGRAM_BOT_TOKEN='')
+class OrderStateMachineTests(TestCase):
+    def _order(self, status, payment_status='not_paid'):
+        return Order.objects.create(
+            telegram_user_id=1, customer_name='Тест', phone='+79000000000', address='ул. Тестовая',
+            total_price=Decimal('1500'), status=status, payment_status=payment_status,
+        )
+
+    def test_repeat_ready_photo_keeps_concurrent_payment(self):
+        order = self._order('ready')
+        # Оплата пришла, пока менеджер загружал новое фото.
+        Order.objects.filter(id=order.id).update(payment_status='succeeded')
+
+        result = OrderStateMachine.transition(order.id, 'ready', values={'ready_photo': 'orders/ready/new.jpg'})
+
+        self.assertTrue(result.ok)
+        self.assertEqual(result.previous_status, 'ready')
+        order.refresh_from_db()
+        self.assertEqual(order.ready_photo.name, 'orders/ready/new.jpg')
+        self.assertEqual(order.payment_status, 'succeeded')
+
+    @override_settings(TELEGRAM_BOT_TOKEN='test')
+    def test_repeat_ready_photo_resends_photo_without_new_payment_request(self):
+        order = self._order('ready', payment_status='pending')
+        with (
+            mock.patch('catalog.order_state.send_photo', return_value=True) as send_photo,
+            mock.patch('catalog.order_state.send_message', return_value=True) as send_message,
+        ):
+            OrderStateMachine.transition(order.id, 'ready', values={'ready_photo': 'orders/ready/new.jpg'})
+
+        send_photo.assert_called_once()
+        self.assertEqual(send_photo.call_args.kwargs['caption'], f"📦 Ваш заказ #{order.id} готов.")
+        send_message.assert_not_called()
+
+    def test_same_status_refused_unless_listed(self):
+        order = self._order('processing')
+        self.assertFalse(OrderStateMachine.transition(order.id, 'processing').ok)
+
+    def test_transfer_details_do_not_downgrade_paid_order(self):
+        order = self._order('ready', payment_status='not_paid')
+        Order.objects.filter(id=order.id).update(payment_status='succeeded')
+
+        changed = OrderStateMachine.update_payment(
+            order, 'pending', only_from={'not_paid'}, transfer_details='СБП', payment_method='transfer',
+        )
+
+        self.assertFalse(changed)
+        order.refresh_from_db()
+        self.assertEqual(order.payment_status, 'succeeded')
+        self.assertEqual(order.transfer_details, 'СБП')
+
+    def test_transfer_details_request_payment(self):
+        order = self._order('ready')
+        self.assertTrue(OrderStateMachine.update_payment(order, 'pending', only_from={'not_paid'}, transfer_details='СБП'))
+        order.refresh_from_db()
+        self.assertEqual((order.payment_status, order.transfer_details), ('pending', 'СБП'))
+
+
+class FastSerializerParityTests(TestCase):
+    """Быстрый путь (FAST_SERIALIZERS_ENABLED) отдает те же байты, что и DRF."""
+
+    @classmethod
+    def setUpTestData(cls):
+        bouquets = Category.objects.create(name='Букеты', slug='bouquets', order=1)
+        Category.objects.create(name='Скрытая', slug='hidden', is_active=False)
+        roses = Product.objects.create(
+            name='Розы', slug='roses', price=Decimal('2500'), category=bouquets, is_popular=True, order=1,
+            short_description='Красные',
+        )
+        Product.objects.create(name='Тюльпаны', slug='tulips', price=Decimal('1200.50'), hide_price=True, order=2)
+        Product.objects.create(name='Архив', slug='archived', price=Decimal('1'), is_active=False, is_popular=True)
+        # Картинки ставим UPDATE-ом: сигнал save() стал бы строить превью из несуществующего файла.
+        Product.objects.filter(id=roses.id).update(
+            image='products/roses.jpg',
+            image_variants={'source': 'products/roses.jpg', 'webp': {'480': 'products/roses_480~0123456789ab.webp'}},
+        )
+        Category.objects.filter(id=bouquets.id).update(image='categories/bouquets.jpg')
+        Review.objects.create(name='Анна', text='Отлично', rating=5, product=roses, is_published=True)
+        Review.objects.create(name='Олег', text='Хорошо', rating=4, product=roses, is_published=True)
+        Review.objects.create(name='Скрыт', text='Нет', rating=1, product=roses, is_published=False)
+
+    def _responses(self, url):
+        bodies = []
+        for enabled in (False, True):
+            cache.clear()  # site-content закэширован через cache_page
+            with override_settings(FAST_SERIALIZERS_ENABLED=enabled):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            bodies.append(response.content)
+        return bodies
+
+    def test_fast_path_matches_drf(self):
+        for url in (
+            '/api/products/',
+            '/api/products/?is_popular=true',
+            '/api/products/?ordering=-price',
+            '/api/products/popular/',
+            '/api/site-content/',
+        ):
+            with self.subTest(url=url):
+                drf, fast = self._responses(url)
+                self.assertEqual(fast, drf)
+                self.assertIn('Розы'.encode(), fast)
+
+
+class TariffMatcherTests(TestCase):
+    """Автомат тарифов совпадает с прежним перебором алиасов по порядку."""
+
+    def test_matches_legacy_scan_on_shipped_tariffs(self):
+        tariffs = read_delivery_tariffs()
+        matcher = TariffMatcher(tariffs)
+        for address in build_address_corpus(tariffs):
+            with self.subTest(address=address):
+                self.assertEqual(matcher.match(address), legacy_match(tariffs, address))
+
+    def test_overlapping_aliases_resolve_to_earliest_tariff(self):
+        tariffs = [
+            (('уфа аэропорт',), Decimal('900'), 'Аэропорт'),
+            (('ский район',), Decimal('400'), 'Район'),
+            (('раевский', 'ленина'), Decimal('250'), 'Раевский'),
+            (('уфа',), Decimal('500'), 'Уфа'),
+        ]
+        matcher = TariffMatcher(tariffs)
+        cases = {
+            # Оба алиаса в адресе, «уфа» — префикс более раннего «уфа аэропорт».
+            'Уфа аэропорт, терминал 1': 'Аэропорт',
+            'аэропорт, г. Уфа': 'Уфа',
+            # «раевский» и «ский район» перекрываются: ранний тариф найден по суффиксной ссылке.
+            'Раевский район, ул. Мира': 'Район',
+            'с. Раевский, ул. Мира': 'Раевский',
+            # Алиас позднего тарифа стоит в адресе раньше алиаса раннего.
+            'ул. Ленина 5, Уфа аэропорт': 'Аэропорт',
+            'ул. Ленина 5, Уфа': 'Раевский',
+            'Москва': None,
+            '': None,
+        }
+        for address, label in cases.items():
+            with self.subTest(address=address):
+                expected = legacy_match(tariffs, address)
+                self.assertEqual(expected and expected[2], label)
+                self.assertEqual(matcher.match(address), expected)
+
+
+class QueryPlanTests(TestCase):
+    """Горячие запросы к заказам идут по своим индексам (см. check_query_plans)."""
+
+    def test_hot_queries_use_indexes(self):
+        labels = {label for label, _build, _index in HOT_QUERIES}
+        self.assertTrue({
+            'Мои заказы / акции', 'Скидка постоянного клиента',
+            'Заказы в админке бота: следующая страница', 'Заказы в админке бота: фильтр по статусу',
+        } <= labels)
+        for label, build_queryset, index_name in HOT_QUERIES:
+            with self.subTest(label):
+                self.assertIn(index_name, query_plan(build_queryset()))
+
+
+class OrderEventsMixin:
+    """Заказ проходит создание, работу, завершение и отмену из админки."""
+
+    def _order(self, total, status='new', user_id=5, phone='+7 900 000-00-05', items=()):
+        order = Order.objects.create(
+            telegram_user_id=user_id, customer_name='Тест', phone=phone, address='ул. Тестовая',
+            total_price=Decimal(total), delivery_price=Decimal('100'), status=status,
+        )
+        for name, price, quantity in items:
+            OrderItem.objects.create(order=order, product_name=name, price=Decimal(price), quantity=quantity)
+        return order
+
+    def _complete(self, order):
+        self.assertTrue(OrderStateMachine.transition(order.id, 'processing').ok)
+        self.assertTrue(OrderStateMachine.transition(order.id, 'completed').ok)
+
+    def _reopen(self, order, status='cancelled'):
+        # Из «Завершен» выводит только админка Django: save() и сигнал order_post_save.
+        order = Order.objects.get(id=order.id)
+        order.status = status
+        order.save()
+
+    def _archive(self, order):
+        Order.objects.filter(id=order.id).update(updated_at=timezone.now() - timedelta(days=400))
+        self.assertEqual(archive_closed_orders(180), 1)
+
+
+@override_settings(TELEGRAM_BOT_TOKEN='')
+class CustomerProfileTests(OrderEventsMixin, TestCase):
+    """Счетчики по событиям заказа и пересборка дают одно и то же."""
+
+    def _profile(self, kind='telegram', key='5'):
+        profile = CustomerProfile.objects.get(kind=kind, key=key)
+        return profile.order_count, profile.completed_count, profile.lifetime_spend
+
+    def _snapshot(self):
+        return sorted(CustomerProfile.objects.values_list(
+            'kind', 'key', 'order_count', 'completed_count', 'lifetime_spend', 'last_order_id', 'phone_normalized',
+        ))
+
+    def test_counters_follow_created_completed_cancelled(self):
+        order = self._order('1000')
+        self.assertEqual(self._profile(), (1, 0, Decimal('0')))
+        self.assertEqual(self._profile('phone', '79000000005'), (1, 0, Decimal('0')))
+
+        self._complete(order)
+        self.assertEqual(self._profile(), (1, 1, Decimal('1000')))
+        self.assertEqual(self._profile('phone', '79000000005'), (1, 1, Decimal('1000')))
+
+        self._reopen(order)
+        self.assertEqual(self._profile(), (1, 0, Decimal('0')))
+        self.assertEqual(self._profile('phone', '79000000005'), (1, 0, Decimal('0')))
+
+    def test_counters_never_go_below_zero(self):
+        order = self._order('1000')
+        self._complete(order)
+        # Сводка разошлась с заказами (например, ее правили руками).
+        CustomerProfile.objects.update(completed_count=0, lifetime_spend=0)
+
+        self._reopen(order)
+        self.assertEqual(self._profile(), (1, 0, Decimal('0')))
+
+    def test_rebuild_with_archive_matches_incremental(self):
+        archived = self._order('1500')
+        self._complete(archived)
+        self._complete(self._order('700', phone='+7 900 000-00-06'))
+        self._order('300')
+        cancelled = self._order('400', user_id=6)
+        self._complete(cancelled)
+        self._reopen(cancelled)
+        self._archive(archived)
+        incremental = self._snapshot()
+
+        rebuild_customer_profiles(archive_model=OrderArchive)
+
+        self.assertEqual(self._snapshot(), incremental)
+        self.assertEqual(self._profile(), (3, 2, Decimal('2200')))
+
+
+@override_settings(TELEGRAM_BOT_TOKEN='')
+class SalesSummaryTests(OrderEventsMixin, TestCase):
+    """Дневные сводки по событиям заказа и пересборка дают одно и то же."""
+
+    STATUS_COUNTS = (
+        'orders_count', 'new_count', 'processing_count', 'ready_count', 'completed_count', 'cancelled_count',
+        'expired_count',
+    )
+
+    def _day(self):
+        summary = DailySalesSummary.objects.get(date=timezone.localdate())
+        return tuple(getattr(summary, column) for column in self.STATUS_COUNTS), summary.revenue
+
+    def _products(self):
+        return sorted(DailyProductSales.objects.values_list('date', 'product_name', 'quantity', 'revenue'))
+
+    def _snapshot(self):
+        days = sorted(DailySalesSummary.objects.values_list('date', 'delivery_revenue', *self.STATUS_COUNTS, 'revenue'))
+        return days, self._products()
+
+    def test_counters_follow_created_completed_cancelled(self):
+        order = self._order('1100', items=[('Розы', '500', 2)])
+        self.assertEqual(self._day(), ((1, 1, 0, 0, 0, 0, 0), Decimal('0')))
+
+        self._complete(order)
+        self.assertEqual(self._day(), ((1, 0, 0, 0, 1, 0, 0), Decimal('1100')))
+        self.assertEqual(self._products(), [(timezone.localdate(), 'Розы', 2, Decimal('1000'))])
+
+        self._reopen(order)
+        self.assertEqual(self._day(), ((1, 0, 0, 0, 0, 1, 0), Decimal('0')))
+        self.assertEqual(self._products(), [(timezone.localdate(), 'Розы', 0, Decimal('0'))])
+
+    def test_counters_never_go_below_zero(self):
+        order = self._order('1100', items=[('Розы', '500', 2)])
+        self._complete(order)
+        # Сводка разошлась с заказами (например, ее правили руками).
+        DailySalesSummary.objects.update(completed_count=0)
+        DailyProductSales.objects.update(quantity=1)
+
+        self._reopen(order)
+        counts, _revenue = self._day()
+        self.assertEqual(counts, (1, 0, 0, 0, 0, 1, 0))
+        self.assertEqual(DailyProductSales.objects.get().quantity, 0)
+
+    def test_rebuild_with_archive_matches_incremental(self):
+        archived = self._order('1100', items=[('Розы', '500', 2)])
+        self._complete(archived)
+        self._complete(self._order('1600', items=[('Розы', '500', 1), ('Тюльпаны', '250', 4)]))
+        self._order('300', items=[('Тюльпаны', '250', 1)])
+        cancelled = self._order('600', items=[('Пионы', '500', 1)])
+        self._complete(cancelled)
+        self._reopen(cancelled)
+        self._archive(archived)
+        # Строку товара, который после отмены продан 0 раз, пересборка не создает.
+        DailyProductSales.objects.filter(quantity=0).delete()
+        incremental = self._snapshot()
+
+        rebuild_sales_summary(archive_model=OrderArchive)
+
+        self.assertEqual(self._snapshot(), incremental)
+        self.assertEqual(self._day(), ((4, 1, 0, 0, 2, 1, 0), Decimal('2700')))
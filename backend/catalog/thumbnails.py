@@ -0,0 +1,190 @@
+"""
+Уменьшенные копии изображений для srcset (Pillow).
+
+Для каждого изображения рядом с оригиналом в `thumbs/` сохраняются варианты
+фиксированной ширины в WebP и JPEG. Сведения о вариантах лежат в поле
+`<поле>_variants` модели, поэтому сериализаторам не нужно ходить в файловую систему.
+"""
+from __future__ import annotations
+
+import logging
+from io import BytesIO
+from pathlib import PurePosixPath
+from typing import Callable
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+from .storage import HASH_SEPARATOR, content_hash, strip_hash
+from .models import Category, HeroSection, Product, ProductImage, Review
+
+logger = logging.getLogger(__name__)
+
+THUMBNAILS_DIR = 'thumbs'
+
+# Модель -> поле изображения. Метаданные вариантов: "<поле>_variants".
+THUMBNAIL_FIELDS: dict[type, str] = {
+    Product: 'image',
+    ProductImage: 'image',
+    Category: 'image',
+    HeroSection: 'image',
+    Review: 'avatar',
+}
+
+_SAVE_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+
+
+def thumbnail_widths() -> list[int]:
+    widths = getattr(settings, 'THUMBNAIL_WIDTHS', None) or [320, 640, 1280]
+    return sorted({int(w) for w in widths if int(w) > 0})
+
+
+def thumbnail_formats() -> list[str]:
+    if features.check('webp'):
+        return ['webp', 'jpeg']
+    return ['jpeg']
+
+
+def variants_field_name(field_name: str) -> str:
+    return f'{field_name}_variants'
+
+
+def variant_name(source_name: str, width: int, fmt: str, content: bytes) -> str:
+    """Имя варианта с хешем содержимого: такие файлы можно кэшировать навсегда."""
+    source = PurePosixPath(source_name)
+    stem = strip_hash(source.stem)
+    return str(PurePosixPath(THUMBNAILS_DIR) / source.parent / f'{stem}_{width}{HASH_SEPARATOR}{content_hash(content)}.{fmt}')
+
+
+def variants_are_current(source_name: str | None, variants: dict | None) -> bool:
+    return bool(source_name and variants and variants.get('source') == source_name)
+
+
+def _target_widths(source_width: int) -> list[int]:
+    widths = thumbnail_widths()
+    targets = [w for w in widths if w < source_width]
+    # Оригинал уже меньше максимальной ширины — отдаем его пережатым в полный размер.
+    if not widths or source_width <= widths[-1]:
+        targets.append(source_width)
+    return targets
+
+
+def _prepare_mode(image: Image.Image, fmt: str) -> Image.Image:
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    if fmt == 'webp':
+        if has_alpha:
+            return image.convert('RGBA')
+        return image if image.mode == 'RGB' else image.convert('RGB')
+    if has_alpha:
+        rgba = image.convert('RGBA')
+        background = Image.new('RGB', rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+    return image if image.mode == 'RGB' else image.convert('RGB')
+
+
+def _encode(image: Image.Image, fmt: str, quality: int) -> bytes:
+    buffer = BytesIO()
+    if fmt == 'webp':
+        image.save(buffer, _SAVE_FORMATS[fmt], quality=quality, method=4)
+    else:
+        image.save(buffer, _SAVE_FORMATS[fmt], quality=quality, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def render_variants(source_name: str, storage=None) -> dict:
+    """Сгенерировать варианты изображения и вернуть их метаданные."""
+    storage = storage or default_storage
+    quality = int(getattr(settings, 'THUMBNAIL_QUALITY', 82))
+    formats = thumbnail_formats()
+    max_width = thumbnail_widths()[-1] if thumbnail_widths() else 0
+
+    with storage.open(source_name, 'rb') as fh:
+        image = Image.open(fh)
+        if max_width and image.format == 'JPEG':
+            # Декодируем JPEG сразу в уменьшенном масштабе — в разы быстрее.
+            image.draft('RGB', (max_width, max_width))
+        image.load()
+    image = ImageOps.exif_transpose(image)
+    source_width, source_height = image.size
+
+    variants: dict = {
+        'source': source_name,
+        'width': source_width,
+        'height': source_height,
+    }
+    for fmt in formats:
+        variants[fmt] = {}
+
+    current = image
+    for width in sorted(_target_widths(source_width), reverse=True):
+        height = max(1, round(source_height * width / source_width))
+        if current.size != (width, height):
+            current = current.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+        for fmt in formats:
+            content = _encode(_prepare_mode(current, fmt), fmt, quality)
+            name = variant_name(source_name, width, fmt, content)
+            if storage.exists(name):
+                # Тот же хеш — тот же файл, перезаписывать незачем.
+                variants[fmt][str(width)] = name
+                continue
+            variants[fmt][str(width)] = storage.save(name, ContentFile(content))
+    return variants
+
+
+def delete_variants(variants: dict | None, storage=None, keep: dict | None = None) -> None:
+    storage = storage or default_storage
+    keep_names = set()
+    for fmt in _SAVE_FORMATS:
+        keep_names.update(((keep or {}).get(fmt) or {}).values())
+    for fmt in _SAVE_FORMATS:
+        for name in ((variants or {}).get(fmt) or {}).values():
+            if name in keep_names:
+                continue
+            try:
+                storage.delete(name)
+            except Exception as exc:
+                logger.info("Не удалось удалить вариант изображения %s: %s", name, exc)
+
+
+def update_instance_variants(instance, field_name: str) -> dict:
+    """Пересобрать варианты, если изображение у объекта поменялось."""
+    file_field = getattr(instance, field_name)
+    variants_attr = variants_field_name(field_name)
+    current = getattr(instance, variants_attr) or {}
+    source_name = file_field.name if file_field else ''
+
+    if variants_are_current(source_name, current):
+        return current
+
+    new_variants: dict = {}
+    if source_name:
+        try:
+            new_variants = render_variants(source_name, storage=file_field.storage)
+        except Exception as exc:
+            logger.warning("Не удалось подготовить варианты изображения %s: %s", source_name, exc)
+            return current
+
+    delete_variants(current, storage=file_field.storage, keep=new_variants)
+    type(instance).objects.filter(pk=instance.pk).update(**{variants_attr: new_variants})
+    setattr(instance, variants_attr, new_variants)
+    return new_variants
+
+
+def build_srcset(
+    source_name: str | None,
+    variants: dict | None,
+    url_for_name: Callable[[str], str | None],
+) -> dict | None:
+    """Карта {формат: {ширина: url}} для текущего изображения или None."""
+    if not variants_are_current(source_name, variants):
+        return None
+    srcset = {}
+    for fmt in _SAVE_FORMATS:
+        names = variants.get(fmt) or {}
+        if names:
+            ordered = sorted(names.items(), key=lambda item: int(item[0]))
+            srcset[fmt] = {width: url_for_name(name) for width, name in ordered}
+    return srcset or None
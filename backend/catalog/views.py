@@ -6,7 +6,6 @@ from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.cache import cache_page
-from django.utils import timezone
 from django.db.models import Avg, Q
 from .models import (
     Category, Product, Review, Order,
@@ -16,6 +15,10 @@ from .serializers import (
     CategorySerializer, ProductSerializer, ReviewSerializer,
     ProductListSerializer, SiteSettingsSerializer, HeroSectionSerializer, PromoBannerSerializer, DeliveryInfoSerializer
 )
+from .fast_serializers import (
+    fast_serializers_enabled, build_site_content, product_list_values, serialize_product_rows
+)
+from .order_state import OrderStateMachine
 from .payments import yookassa_enabled, map_payment_status, notify_payment_status
 
 logger = logging.getLogger(__name__)
@@ -46,7 +49,7 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
 
         if self.action == 'retrieve':
             queryset = queryset.prefetch_related('images', 'reviews')
-        else:
+        elif not fast_serializers_enabled():
             queryset = queryset.annotate(
                 average_rating=Avg('reviews__rating', filter=Q(reviews__is_published=True))
             )
@@ -57,11 +60,23 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
             queryset = queryset.filter(is_popular=True)
         
         return queryset
+
+    def list(self, request, *args, **kwargs):
+        if not fast_serializers_enabled():
+            return super().list(request, *args, **kwargs)
+
+        rows = product_list_values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serialize_product_rows(page))
+        return Response(serialize_product_rows(rows))
     
     @action(detail=False, methods=['get'])
     def popular(self, request):
         """Популярные товары"""
         products = self.queryset.filter(is_popular=True)
+        if fast_serializers_enabled():
+            return Response(serialize_product_rows(product_list_values(products)))
         serializer = self.get_serializer(products, many=True)
         return Response(serializer.data)
 
@@ -87,6 +102,9 @@ class ReviewViewSet(mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
 @api_view(['GET'])
 def site_content(request):
     """Получить весь контент сайта одним запросом"""
+    if fast_serializers_enabled():
+        return Response(build_site_content())
+
     site_settings = SiteSettings.get_settings()
     promo_enabled, _ = SiteSettings.get_promo_config()
     hero = HeroSection.get_hero()
@@ -146,15 +164,9 @@ def yookassa_webhook(request):
         )
         return Response({'detail': 'Payment id mismatch'}, status=400)
 
-    prev_status = order.payment_status
+    # Условный UPDATE: из нескольких одинаковых вебхуков клиента уведомит один.
     new_status = map_payment_status(status)
-    order.payment_id = payment_id
-    order.payment_status = new_status
-    if new_status == 'succeeded' and not order.paid_at:
-        order.paid_at = timezone.now()
-    order.save(update_fields=['payment_id', 'payment_status', 'paid_at', 'updated_at'])
-
-    if new_status != prev_status:
+    if OrderStateMachine.update_payment(order, new_status, payment_id=payment_id):
         notify_payment_status(order, new_status)
 
     return Response({'status': 'ok'})
@@ -0,0 +1,185 @@
+"""
+Раздача MEDIA_ROOT.
+
+Режимы (MEDIA_SERVE_MODE):
+- `x-accel` — Django только проверяет путь и отдает заголовок X-Accel-Redirect,
+  файл читает nginx (см. deploy/timeweb/nginx.flowers.conf);
+- `x-sendfile` — то же для Apache/lighttpd через X-Sendfile;
+- `django` — FileResponse: gunicorn отдает файл через sendfile(), плюс
+  ETag/Last-Modified, 304 и Range;
+- `off` — маршрут не подключается, media раздает веб-сервер напрямую.
+
+Имена с хешем содержимого (`photo_640~1a2b3c4d5e6f.webp`) кэшируются на год
+с `immutable`, остальные — на MEDIA_CACHE_MAX_AGE.
+"""
+from __future__ import annotations
+
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse,
+)
+from django.urls import re_path
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from catalog.storage import is_hashed_name
+
+MEDIA_SERVE_MODES = ('django', 'x-accel', 'x-sendfile', 'off')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+_CHUNK_SIZE = 64 * 1024
+
+
+def media_serve_mode() -> str:
+    mode = str(getattr(settings, 'MEDIA_SERVE_MODE', 'django')).strip().lower()
+    return mode if mode in MEDIA_SERVE_MODES else 'django'
+
+
+def is_immutable_name(path: str) -> bool:
+    return is_hashed_name(path)
+
+
+def _cache_headers(response, path: str) -> None:
+    if is_immutable_name(path):
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=int(getattr(settings, 'MEDIA_CACHE_MAX_AGE', 3600)))
+
+
+def _content_type(path: str) -> tuple[str, str | None]:
+    content_type, encoding = mimetypes.guess_type(path)
+    return content_type or 'application/octet-stream', encoding
+
+
+def _parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """Один диапазон `bytes=a-b` -> (start, end) включительно. Иначе None."""
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        length = int(end)
+        if length == 0:
+            raise ValueError('empty suffix range')
+        return max(0, size - length), size - 1
+    first = int(start)
+    last = min(int(end), size - 1) if end else size - 1
+    if first >= size or first > last:
+        raise ValueError('unsatisfiable range')
+    return first, last
+
+
+def _range_is_fresh(request, etag: str, last_modified: float) -> bool:
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    parsed = parse_http_date_safe(if_range)
+    return parsed is not None and int(last_modified) <= parsed
+
+
+def _iter_file_range(file_obj, start: int, length: int):
+    with file_obj:
+        file_obj.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = file_obj.read(min(_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _offloaded_response(path: str, full_path: str, mode: str) -> HttpResponse:
+    response = HttpResponse()
+    # Content-Type выставит веб-сервер по расширению файла.
+    del response['Content-Type']
+    if mode == 'x-accel':
+        prefix = str(getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/'))
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(path)
+    else:
+        response['X-Sendfile'] = full_path
+    _cache_headers(response, path)
+    return response
+
+
+@require_safe
+def serve_media(request, path: str):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except Exception:
+        raise Http404
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    mode = media_serve_mode()
+    if mode in ('x-accel', 'x-sendfile'):
+        return _offloaded_response(path, full_path, mode)
+
+    size = stat.st_size
+    etag = f'"{int(stat.st_mtime):x}-{size:x}"'
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if isinstance(not_modified, HttpResponseNotModified):
+        _cache_headers(not_modified, path)
+        return not_modified
+    if not_modified is not None:
+        # 412 Precondition Failed
+        return not_modified
+
+    content_type, encoding = _content_type(path)
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if range_header and _range_is_fresh(request, etag, stat.st_mtime):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if byte_range is None:
+        # FileResponse с настоящим файлом gunicorn отправляет через sendfile().
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+        response['Content-Length'] = str(size)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            _iter_file_range(open(full_path, 'rb'), start, length),
+            status=206,
+            content_type=content_type,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(length)
+
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    _cache_headers(response, path)
+    return response
+
+
+def media_urlpatterns() -> list:
+    """Маршрут для MEDIA_URL (пусто, если media отдает веб-сервер или внешний CDN)."""
+    media_url = settings.MEDIA_URL or ''
+    if media_serve_mode() == 'off' or not media_url.startswith('/') or media_url.startswith('//'):
+        return []
+    prefix = re.escape(media_url.lstrip('/'))
+    return [re_path(rf'^{prefix}(?P<path>.*)$', serve_media, name='media')]
@@ -145,7 +145,8 @@ STATICFILES_DIRS = [
 
 STORAGES = {
     'default': {
-        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        # FileSystemStorage + уменьшение и очистка метаданных фото, см. catalog/storage.py
+        'BACKEND': 'catalog.storage.OptimizedImageStorage',
     },
     'staticfiles': {
         'BACKEND': (
@@ -161,6 +162,10 @@ FRONTEND_DIR = BASE_DIR.parent
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# django | x-accel | x-sendfile | off — см. flowers_shop/media.py
+MEDIA_SERVE_MODE = os.getenv('MEDIA_SERVE_MODE', 'django').strip().lower()
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv('MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+MEDIA_CACHE_MAX_AGE = env_int('MEDIA_CACHE_MAX_AGE', 3600)
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -177,6 +182,9 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20
 }
+# Быстрый путь сериализации (values_list вместо ModelSerializer) для
+# /api/site-content/ и списка товаров. Формат ответа не меняется.
+FAST_SERIALIZERS_ENABLED = env_bool('FAST_SERIALIZERS_ENABLED', False)
 
 # CORS
 CORS_ALLOWED_ORIGINS = [
@@ -241,22 +249,68 @@ MAPS_PLACE_ID = os.getenv('MAPS_PLACE_ID', '')
 YANDEX_TAXI_API_KEY = os.getenv('YANDEX_TAXI_API_KEY', '')
 YANDEX_TAXI_CLID = os.getenv('YANDEX_TAXI_CLID', '')
 YANDEX_GEOCODER_API_KEY = os.getenv('YANDEX_GEOCODER_API_KEY', '')
+# Можно указать локальную заглушку геокодера (тесты, разработка)
+YANDEX_GEOCODER_URL = os.getenv('YANDEX_GEOCODER_URL', 'https://geocode-maps.yandex.ru/1.x/')
+# Кэш ответов геокодера: таблица GeocodeCacheEntry + LRU в памяти процесса
+GEOCODER_CACHE_ENABLED = env_bool('GEOCODER_CACHE_ENABLED', True)
+GEOCODER_CACHE_TTL_DAYS = env_int('GEOCODER_CACHE_TTL_DAYS', 30)
+GEOCODER_CACHE_EMPTY_TTL_HOURS = env_int('GEOCODER_CACHE_EMPTY_TTL_HOURS', 6)
+GEOCODER_CACHE_MEMORY_SIZE = env_int('GEOCODER_CACHE_MEMORY_SIZE', 512)
 UBER_API_KEY = os.getenv('UBER_API_KEY', '')
 TAXI_DELIVERY_SERVICE = os.getenv('TAXI_DELIVERY_SERVICE', 'yandex')  # yandex, uber, custom
 # CSV файл с фиксированными тарифами доставки (aliases,cost,label).
 # Если не задан, используется backend/catalog/data/delivery_tariffs.csv
 DELIVERY_TARIFFS_FILE = os.getenv('DELIVERY_TARIFFS_FILE', '')
+# Как часто проверять, не изменился ли файл тарифов (0 — не проверять)
+DELIVERY_TARIFFS_RELOAD_SECONDS = env_int('DELIVERY_TARIFFS_RELOAD_SECONDS', 5)
+
+# Расчет доставки в боте: общий дедлайн (0 — без ограничения) и размер пула HTTP
+DELIVERY_QUOTE_DEADLINE_MS = env_int('DELIVERY_QUOTE_DEADLINE_MS', 4000)
+DELIVERY_HTTP_POOL_SIZE = env_int('DELIVERY_HTTP_POOL_SIZE', 20)
 
 # Shop address (used for delivery cost calculation)
 SHOP_ADDRESS = os.getenv(
     'SHOP_ADDRESS',
     'Трактовая улица, 78А, село Раевский, Альшеевский район, Республика Башкортостан, 452120',
 )
+# Координаты магазина "широта,долгота"; если пусто — геокодируем адрес один раз
+SHOP_COORDINATES = os.getenv('SHOP_COORDINATES', '')
+# Кэш оценок такси: ячейка назначения x интервал времени суток
+ROUTE_QUOTE_CACHE_TTL_SECONDS = env_int('ROUTE_QUOTE_CACHE_TTL_SECONDS', 600)
+ROUTE_QUOTE_CACHE_SIZE = env_int('ROUTE_QUOTE_CACHE_SIZE', 1024)
+ROUTE_QUOTE_CELL_PRECISION = env_int('ROUTE_QUOTE_CELL_PRECISION', 3)
+ROUTE_QUOTE_BUCKET_MINUTES = env_int('ROUTE_QUOTE_BUCKET_MINUTES', 60)
+
+# Отчет о продажах (бот, админка): сколько секунд держать в памяти
+SALES_REPORT_CACHE_SECONDS = env_int('SALES_REPORT_CACHE_SECONDS', 60)
+
+# Архив заказов (manage.py archive_orders): через сколько дней после закрытия
+ORDER_ARCHIVE_AFTER_DAYS = env_int('ORDER_ARCHIVE_AFTER_DAYS', 180)
 
 # Upload limits
 MAX_UPLOAD_SIZE_MB = env_int('MAX_UPLOAD_SIZE_MB', 128)
 FILE_UPLOAD_MAX_MEMORY_SIZE = MAX_UPLOAD_SIZE_MB * 1024 * 1024
 DATA_UPLOAD_MAX_MEMORY_SIZE = MAX_UPLOAD_SIZE_MB * 1024 * 1024
+# Оригиналы фото при сохранении: ограничение размера, без EXIF, пережатие
+IMAGE_UPLOAD_OPTIMIZE = env_bool('IMAGE_UPLOAD_OPTIMIZE', True)
+IMAGE_UPLOAD_MAX_DIMENSION = env_int('IMAGE_UPLOAD_MAX_DIMENSION', 2560)
+IMAGE_UPLOAD_QUALITY = env_int('IMAGE_UPLOAD_QUALITY', 85)
+# Хеш содержимого в имени файла -> URL можно кэшировать навсегда (immutable)
+MEDIA_HASHED_NAMES = env_bool('MEDIA_HASHED_NAMES', True)
+
+# Уменьшенные копии изображений для srcset (WebP + JPEG), см. catalog/thumbnails.py
+THUMBNAIL_WIDTHS = [
+    int(width)
+    for width in os.getenv('THUMBNAIL_WIDTHS', '320,640,1280').split(',')
+    if width.strip().isdigit()
+]
+THUMBNAIL_QUALITY = env_int('THUMBNAIL_QUALITY', 82)
+# Очередь обработки: сохранение в админке только ставит задачу,
+# варианты готовит `manage.py process_image_jobs`.
+THUMBNAIL_QUEUE_ENABLED = env_bool('THUMBNAIL_QUEUE_ENABLED', True)
+THUMBNAIL_WORKERS = env_int('THUMBNAIL_WORKERS', 0)  # 0 — по числу ядер
+THUMBNAIL_JOB_MAX_ATTEMPTS = env_int('THUMBNAIL_JOB_MAX_ATTEMPTS', 3)
+THUMBNAIL_JOB_TIMEOUT_SECONDS = env_int('THUMBNAIL_JOB_TIMEOUT_SECONDS', 600)
 
 # ── Security hardening ───────────────────────────────────────────
 SESSION_COOKIE_SECURE = not DEBUG
@@ -7,6 +7,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.views.static import serve as static_serve
 from django.http import FileResponse
+from .media import media_urlpatterns
 from .seo import sitemap_xml, robots_txt
 
 # Customize admin site
@@ -42,8 +43,8 @@ urlpatterns = [
     path('privacy-policy.html', serve_frontend, {'page': 'privacy-policy.html'}, name='privacy-policy'),
 ]
 
-# Media files
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Media files (режим — MEDIA_SERVE_MODE, см. flowers_shop/media.py)
+urlpatterns += media_urlpatterns()
 
 if settings.DEBUG:
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
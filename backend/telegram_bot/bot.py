@@ -12,6 +12,7 @@ from aiogram.enums import ParseMode
 from aiogram.fsm.storage.memory import SimpleEventIsolation
 
 from django.conf import settings
+from catalog.delivery_quotes import close_http_session
 
 from .globals import set_bot, set_channel_id, set_group_id
 from .middlewares import SubscriptionMiddleware
@@ -88,6 +89,10 @@ class FlowerShopBot:
             await self.bot.session.close()
         except Exception:
             pass
+        try:
+            await close_http_session()
+        except Exception:
+            pass
 
 
 _webhook_bot: FlowerShopBot | None = None
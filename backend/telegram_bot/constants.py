@@ -1,5 +1,12 @@
 DELIVERY_MANUAL_NOTE = "Не получилось рассчитать стоимость доставки - введите стоимость сами"
 CARD_PAYMENT_MAINTENANCE_NOTE = "Оплата по карте временно на техническом обслуживании."
+# Сколько ждать расчет доставки перед шагом комментария, сек
+DELIVERY_PREVIEW_WAIT_SECONDS = 0.5
 
 PRODUCTS_PER_PAGE = 3
 ADMIN_ORDERS_PAGE_SIZE = 10
+# Сколько секунд показывать в списке заказов закэшированное «всего»
+ADMIN_ORDERS_TOTAL_TTL_SECONDS = 60
+# Сколько ждать перед обновлением сообщения заказа в служебном чате, сек:
+# действия по заказу за это время дают одно обновление
+ORDER_GROUP_REFRESH_DELAY_SECONDS = 1.0
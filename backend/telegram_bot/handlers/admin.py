@@ -1,15 +1,16 @@
 """
 Admin panel handlers: /admin, order list, status changes, ready photo,
-export, transfer payment details.
+sales report, export, transfer payment details.
 """
-import csv
 import html
 import logging
-from pathlib import Path
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
 
 from aiogram import F, Router
 from aiogram.enums import ParseMode
-from aiogram.filters import Command
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.types import (
     CallbackQuery, Message,
@@ -17,13 +18,16 @@ from aiogram.types import (
     FSInputFile, ReplyKeyboardRemove,
 )
 from asgiref.sync import sync_to_async
-from django.conf import settings
 from django.core.files.base import ContentFile
+from django.db.models import Q
 from django.utils import timezone
 
 from catalog.models import Order
+from catalog.order_export import ExportFilters, export_orders, parse_export_args
+from catalog.order_state import OrderStateMachine
+from catalog.sales_summary import sales_report
 
-from ..constants import ADMIN_ORDERS_PAGE_SIZE, DELIVERY_MANUAL_NOTE
+from ..constants import ADMIN_ORDERS_PAGE_SIZE, ADMIN_ORDERS_TOTAL_TTL_SECONDS, DELIVERY_MANUAL_NOTE
 from ..states import AdminStates
 from ..utils import (
     to_decimal, format_money,
@@ -72,7 +76,8 @@ async def admin_entry(message: Message, state: FSMContext):
         return
     await state.clear()
     await message.answer(
-        "🛠 <b>Админ-панель</b>\n\nВыберите действие:",
+        "🛠 <b>Админ-панель</b>\n\nВыберите действие:\n\n"
+        "<i>Выгрузка с фильтром: /export [с YYYY-MM-DD] [по YYYY-MM-DD] [статусы] [gz]</i>",
         parse_mode=ParseMode.HTML,
         reply_markup=get_admin_keyboard(),
     )
@@ -88,26 +93,137 @@ async def admin_exit(message: Message, state: FSMContext):
 
 # ── Orders list ──────────────────────────────────────────────────
 
-async def build_admin_orders_page(page: int) -> tuple[str, InlineKeyboardMarkup]:
-    page = max(0, int(page))
-
+# Фильтр списка кодируется в callback_data двумя буквами: статус и период,
+# «_» — без ограничения. Например, «pw» — «В работе» за 7 дней.
+ADMIN_ORDERS_ALL_FILTER = '__'
+ADMIN_ORDERS_STATUS_FILTERS = {
+    '_': ('Все', None),
+    'n': ('🆕', 'new'),
+    'p': ('🟡', 'processing'),
+    'r': ('📦', 'ready'),
+    'c': ('✅', 'completed'),
+    'x': ('❌', 'cancelled'),
+}
+ADMIN_ORDERS_PERIOD_FILTERS = {
+    '_': ('Всё время', None),
+    'd': ('Сегодня', 0),
+    'w': ('7 дней', 7),
+    'm': ('30 дней', 30),
+}
+_admin_orders_totals: dict[str, tuple[float, int]] = {}
+
+
+def _orders_cursor(order) -> str:
+    created = int(order.created_at.timestamp() * 1_000_000)
+    return f"{created}-{order.id}"
+
+
+def _parse_orders_cursor(cursor: str) -> tuple[datetime, int] | None:
+    try:
+        created, order_id = cursor.split('-')
+        return datetime.fromtimestamp(int(created) / 1_000_000, tz=dt_timezone.utc), int(order_id)
+    except (ValueError, OverflowError, OSError):
+        return None
+
+
+def _split_orders_filter(flt: str) -> tuple[str, str]:
+    status_code = flt[:1] if flt[:1] in ADMIN_ORDERS_STATUS_FILTERS else '_'
+    period_code = flt[1:2] if flt[1:2] in ADMIN_ORDERS_PERIOD_FILTERS else '_'
+    return status_code, period_code
+
+
+def admin_orders_callback(
+    flt: str = ADMIN_ORDERS_ALL_FILTER, direction: str = '', cursor: str = '', page: int = 1,
+) -> str:
+    """callback_data страницы списка: aol:<фильтр>:<n|p>:<курсор>:<страница>."""
+    data = f"aol:{flt}:{direction}:{cursor}:{page}"
+    if len(data.encode()) > 64:  # лимит Telegram; курсор укладывается с запасом
+        return f"aol:{flt}:::1"
+    return data
+
+
+def _filtered_orders(flt: str):
+    status_code, period_code = _split_orders_filter(flt)
+    qs = Order.objects.all()
+    status = ADMIN_ORDERS_STATUS_FILTERS[status_code][1]
+    if status:
+        qs = qs.filter(status=status)
+    days = ADMIN_ORDERS_PERIOD_FILTERS[period_code][1]
+    if days is not None:
+        since = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days)
+        qs = qs.filter(created_at__gte=since)
+    return qs
+
+
+def _approximate_total(flt: str, qs) -> int:
+    """count() по фильтру раз в ADMIN_ORDERS_TOTAL_TTL_SECONDS, а не на каждое листание."""
+    now = time.monotonic()
+    cached = _admin_orders_totals.get(flt)
+    if cached and cached[0] > now:
+        return cached[1]
+    total = qs.count()
+    _admin_orders_totals[flt] = (now + ADMIN_ORDERS_TOTAL_TTL_SECONDS, total)
+    return total
+
+
+async def build_admin_orders_page(
+    flt: str = ADMIN_ORDERS_ALL_FILTER,
+    direction: str = '',
+    cursor: str = '',
+    page: int = 1,
+) -> tuple[str, InlineKeyboardMarkup]:
+    """Страница списка по ключу (created_at, id): любая страница стоит как первая."""
+    flt = ''.join(_split_orders_filter(flt))
+    page = max(1, int(page))
+    position = _parse_orders_cursor(cursor) if direction in {'n', 'p'} else None
+    if position is None:
+        direction, page = '', 1
+
+    # Условие по ключу записано как created_at <= X AND (created_at < X OR id < Y):
+    # так SQLite и Postgres ищут по индексу диапазоном, а не сканируют его.
     @sync_to_async
     def _fetch():
-        qs = Order.objects.order_by('-created_at')
-        total = qs.count()
-        offset = page * ADMIN_ORDERS_PAGE_SIZE
-        orders = list(qs[offset: offset + ADMIN_ORDERS_PAGE_SIZE])
-        return total, orders
-
-    total, orders = await _fetch()
-
-    if total == 0:
-        return "📦 <b>Заказы</b>\n\nПока заказов нет.", InlineKeyboardMarkup(inline_keyboard=[])
-
-    pages = max(1, (total + ADMIN_ORDERS_PAGE_SIZE - 1) // ADMIN_ORDERS_PAGE_SIZE)
-    page = min(page, pages - 1)
+        qs = _filtered_orders(flt)
+        total = _approximate_total(flt, qs)
+        page_qs = qs.only('id', 'created_at', 'status', 'customer_name')
+        if position is None:
+            rows = list(page_qs.order_by('-created_at', '-id')[:ADMIN_ORDERS_PAGE_SIZE + 1])
+        elif direction == 'n':
+            created, order_id = position
+            rows = list(
+                page_qs.filter(created_at__lte=created)
+                .filter(Q(created_at__lt=created) | Q(id__lt=order_id))
+                .order_by('-created_at', '-id')[:ADMIN_ORDERS_PAGE_SIZE + 1]
+            )
+        else:
+            created, order_id = position
+            rows = list(
+                page_qs.filter(created_at__gte=created)
+                .filter(Q(created_at__gt=created) | Q(id__gt=order_id))
+                .order_by('created_at', 'id')[:ADMIN_ORDERS_PAGE_SIZE + 1]
+            )
+        return total, rows
+
+    total, rows = await _fetch()
+    more = len(rows) > ADMIN_ORDERS_PAGE_SIZE
+    orders = rows[:ADMIN_ORDERS_PAGE_SIZE]
+    if direction == 'p':
+        orders.reverse()
+        has_newer, has_older = more, True
+    else:
+        has_newer, has_older = direction == 'n', more
+    if not has_newer:
+        page = 1
+
+    filter_buttons = _admin_orders_filter_buttons(flt)
+    if not orders:
+        text = "📦 <b>Заказы</b>\n\n" + (
+            "Пока заказов нет." if flt == ADMIN_ORDERS_ALL_FILTER else "По этому фильтру заказов нет."
+        )
+        return text, InlineKeyboardMarkup(inline_keyboard=filter_buttons)
 
-    text = f"📦 <b>Заказы</b> (страница {page+1}/{pages})\n\n"
+    pages = max(page, (total + ADMIN_ORDERS_PAGE_SIZE - 1) // ADMIN_ORDERS_PAGE_SIZE)
+    text = f"📦 <b>Заказы</b> (страница {page}, всего ≈{total})\n\n"
 
     buttons: list[list[InlineKeyboardButton]] = []
     for o in orders:
@@ -117,36 +233,69 @@ async def build_admin_orders_page(page: int) -> tuple[str, InlineKeyboardMarkup]
         buttons.append([InlineKeyboardButton(text=f"#{o.id} {icon} {customer}", callback_data=f"admin_order_{o.id}")])
 
     nav: list[InlineKeyboardButton] = []
-    if page > 0:
-        nav.append(InlineKeyboardButton(text="⬅️", callback_data=f"admin_orders_{page-1}"))
-    nav.append(InlineKeyboardButton(text=f"{page+1}/{pages}", callback_data="noop"))
-    if page < pages - 1:
-        nav.append(InlineKeyboardButton(text="➡️", callback_data=f"admin_orders_{page+1}"))
+    if has_newer:
+        nav.append(InlineKeyboardButton(
+            text="⬅️", callback_data=admin_orders_callback(flt, 'p', _orders_cursor(orders[0]), page - 1),
+        ))
+    nav.append(InlineKeyboardButton(text=f"{page}/{pages}", callback_data="noop"))
+    if has_older:
+        nav.append(InlineKeyboardButton(
+            text="➡️", callback_data=admin_orders_callback(flt, 'n', _orders_cursor(orders[-1]), page + 1),
+        ))
     buttons.append(nav)
+    buttons.extend(filter_buttons)
 
     keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
     return text, keyboard
 
 
+def _admin_orders_filter_buttons(flt: str) -> list[list[InlineKeyboardButton]]:
+    status_code, period_code = _split_orders_filter(flt)
+
+    def label(text, active):
+        return f"• {text}" if active else text
+
+    statuses = [
+        InlineKeyboardButton(
+            text=label(title, code == status_code), callback_data=admin_orders_callback(code + period_code),
+        )
+        for code, (title, _status) in ADMIN_ORDERS_STATUS_FILTERS.items()
+    ]
+    periods = [
+        InlineKeyboardButton(
+            text=label(title, code == period_code), callback_data=admin_orders_callback(status_code + code),
+        )
+        for code, (title, _days) in ADMIN_ORDERS_PERIOD_FILTERS.items()
+    ]
+    return [statuses, periods]
+
+
 @router.message(F.text == "📦 Заказы")
 async def admin_orders_list(message: Message):
     if not await require_admin_message(message):
         return
-    text, keyboard = await build_admin_orders_page(0)
+    text, keyboard = await build_admin_orders_page()
     await message.answer(text, parse_mode=ParseMode.HTML, reply_markup=keyboard)
 
 
-@router.callback_query(F.data.startswith("admin_orders_"))
+@router.callback_query(F.data.startswith("aol:") | F.data.startswith("admin_orders_"))
 async def admin_orders_list_page(callback: CallbackQuery):
     if not await require_admin_callback(callback):
         return
+    # admin_orders_<n> — кнопки из старых сообщений: открываем первую страницу.
+    parts = callback.data.split(":") if callback.data.startswith("aol:") else []
+    flt, direction, cursor, page = (parts[1:] + ['', '', '', '1'])[:4] if parts else ('', '', '', '1')
+    flt = flt or ADMIN_ORDERS_ALL_FILTER
     try:
-        page = int(callback.data.split("_")[2])
-    except Exception:
-        page = 0
-    text, keyboard = await build_admin_orders_page(page)
+        page = int(page)
+    except ValueError:
+        page = 1
+    text, keyboard = await build_admin_orders_page(flt, direction, cursor, page)
     await callback.answer()
-    await callback.message.edit_text(text, parse_mode=ParseMode.HTML, reply_markup=keyboard)
+    try:
+        await callback.message.edit_text(text, parse_mode=ParseMode.HTML, reply_markup=keyboard)
+    except TelegramBadRequest:
+        pass  # повторное нажатие на уже выбранный фильтр: текст не изменился
 
 
 # ── Order detail ─────────────────────────────────────────────────
@@ -221,7 +370,7 @@ async def build_admin_order_detail(order_id: int) -> tuple[str, InlineKeyboardMa
     if order.ready_photo:
         buttons.append([InlineKeyboardButton(text="📷 Обновить фото готовности", callback_data=f"admin_ready_{order.id}")])
 
-    buttons.append([InlineKeyboardButton(text="⬅️ К списку", callback_data="admin_orders_0")])
+    buttons.append([InlineKeyboardButton(text="⬅️ К списку", callback_data=admin_orders_callback())])
     return text, InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
@@ -255,23 +404,19 @@ async def admin_order_set_status(callback: CallbackQuery):
         await callback.answer("Для статуса «Готов» нужен снимок.", show_alert=True)
         return
 
-    @sync_to_async
-    def _update():
-        order = Order.objects.get(pk=order_id)
-        order.status = new_status
-        if new_status == 'processing':
-            order.processing_by_user_id = actor_id
-            order.processing_by_username = actor_username
-            order.save(update_fields=['status', 'processing_by_user_id', 'processing_by_username', 'updated_at', 'phone_normalized'])
-            return
-        order.save(update_fields=['status', 'updated_at', 'phone_normalized'])
+    values = None
+    if new_status == 'processing':
+        values = {'processing_by_user_id': actor_id, 'processing_by_username': actor_username}
 
     try:
-        await _update()
+        result = await sync_to_async(OrderStateMachine.transition)(order_id, new_status, values=values)
     except Exception as exc:
         await callback.answer("Не удалось обновить статус", show_alert=True)
         logger.warning("Admin status update failed: %s", exc)
         return
+    if not result.ok:
+        await callback.answer(result.message, show_alert=True)
+        return
 
     await refresh_order_group_message(order_id)
     text, keyboard = await build_admin_order_detail(order_id)
@@ -339,33 +484,34 @@ async def admin_order_ready_photo_receive(message: Message, state: FSMContext):
     filename = basename or f"order_{order_id}_ready.jpg"
 
     @sync_to_async
-    def _save() -> tuple[str, int]:
-        order = Order.objects.get(pk=order_id)
-        prev_status = order.status
-        order.ready_photo.save(filename, ContentFile(content), save=False)
-        order.status = 'ready'
-        order.save()
-        return prev_status, int(order.telegram_user_id)
+    def _save() -> str:
+        status = Order.objects.filter(pk=order_id).values_list('status', flat=True).first()
+        if status is None:
+            return "Заказ не найден"
+        if not OrderStateMachine.can(status, 'ready'):
+            return "Заказ уже закрыт"
+        # Сначала файл, потом один условный UPDATE статуса и фото: параллельная
+        # оплата или действие другого админа не затираются. Уведомление клиенту
+        # (и повторное фото для ready -> ready) отправляют хуки перехода.
+        photo = Order(pk=order_id).ready_photo
+        photo.save(filename, ContentFile(content), save=False)
+        result = OrderStateMachine.transition(order_id, 'ready', values={'ready_photo': photo.name})
+        if not result.ok:
+            photo.storage.delete(photo.name)
+        return result.message
 
     try:
-        prev_status, customer_chat_id = await _save()
+        refusal = await _save()
     except Exception as exc:
         logger.warning("Ready photo save failed: %s", exc)
         await message.answer("❌ Не удалось сохранить фото.", reply_markup=done_markup)
         await state.clear()
         return
-
-    if prev_status == 'ready':
-        bot = get_bot()
-        try:
-            order = await sync_to_async(Order.objects.get)(pk=order_id)
-            caption = f"📦 Ваш заказ #{order_id} готов."
-            photo_path = await sync_to_async(lambda: order.ready_photo.path)()
-            await bot.send_photo(chat_id=customer_chat_id, photo=FSInputFile(photo_path), caption=caption)
-        except Exception as exc:
-            logger.warning("Manual ready photo notify failed: %s", exc)
-
     await state.clear()
+    if refusal:
+        await message.answer(f"Фото не сохранено: {refusal} (заказ #{order_id}).", reply_markup=done_markup)
+        return
+
     await refresh_order_group_message(order_id)
     await message.answer(f"✅ Фото сохранено, заказ #{order_id} помечен как «Готов».", reply_markup=done_markup)
 
@@ -421,13 +567,9 @@ async def admin_receive_transfer_details(message: Message, state: FSMContext):
         order = Order.objects.filter(pk=order_id).first()
         if not order:
             return None
-        order.transfer_details = text
-        order.payment_method = 'transfer'
-        if order.payment_status == 'not_paid':
-            order.payment_status = 'pending'
-            order.save(update_fields=['transfer_details', 'payment_method', 'payment_status', 'updated_at', 'phone_normalized'])
-        else:
-            order.save(update_fields=['transfer_details', 'payment_method', 'updated_at', 'phone_normalized'])
+        OrderStateMachine.update_payment(
+            order, 'pending', only_from={'not_paid'}, transfer_details=text, payment_method='transfer',
+        )
         return order
 
     order = await _save_details()
@@ -554,34 +696,77 @@ async def service_group_order_actions(callback: CallbackQuery, state: FSMContext
     await callback.answer(result_text, show_alert=not changed)
 
 
+# ── Sales report ─────────────────────────────────────────────────
+
+SALES_REPORT_PERIODS = ((1, "Сегодня"), (7, "7 дней"), (30, "30 дней"))
+
+
+def format_sales_report(title: str, report: dict) -> str:
+    text = (
+        f"<b>{title}</b> (с {report['since'].strftime('%d.%m')})\n"
+        f"Заказов: {report['orders_count']}, завершено: {report['completed_count']} "
+        f"({report['conversion']:.0%})\n"
+        f"Отменено: {report['cancelled_count']}, просрочено: {report['expired_count']}, "
+        f"в работе: {report['new_count'] + report['processing_count'] + report['ready_count']}\n"
+        f"Выручка: {format_money(report['revenue'])} ₽, средний чек: {format_money(report['average_check'])} ₽\n"
+        f"Доставка: {format_money(report['delivery_revenue'])} ₽"
+    )
+    if report['top_products']:
+        top = "\n".join(
+            f"  {index}. {html.escape(item['product_name'])} — {item['quantity']} шт."
+            for index, item in enumerate(report['top_products'], start=1)
+        )
+        text += f"\nТоп букетов:\n{top}"
+    return text
+
+
+@router.message(F.text == "📊 Продажи")
+async def admin_sales_report(message: Message):
+    if not await require_admin_message(message):
+        return
+
+    @sync_to_async
+    def _reports():
+        return [(title, sales_report(days)) for days, title in SALES_REPORT_PERIODS]
+
+    blocks = [format_sales_report(title, report) for title, report in await _reports()]
+    await message.answer("📊 <b>Продажи</b>\n\n" + "\n\n".join(blocks), parse_mode=ParseMode.HTML)
+
+
 # ── Export orders ────────────────────────────────────────────────
 
+async def _send_orders_export(message: Message, filters: ExportFilters) -> None:
+    path, count = await sync_to_async(export_orders)(None, filters)
+    if not count and (filters.date_from or filters.date_to or filters.statuses):
+        await message.answer(f"Заказов по фильтру нет ({filters.describe()}).")
+        return
+    await message.answer_document(
+        FSInputFile(path),
+        caption=(
+            f"📤 Экспорт заказов (CSV{', gzip' if filters.compress else ''}): {count} шт., "
+            f"{filters.describe()}. Файл обновляется при каждом экспорте."
+        ),
+    )
+
+
 @router.message(F.text == "📤 Экспорт заказов")
 async def admin_export_orders(message: Message):
     if not await require_admin_message(message):
         return
+    await _send_orders_export(message, ExportFilters())
 
-    @sync_to_async
-    def _export() -> str:
-        export_dir = Path(settings.MEDIA_ROOT) / 'exports'
-        export_dir.mkdir(parents=True, exist_ok=True)
-        path = export_dir / 'orders_latest.csv'
-
-        orders = Order.objects.prefetch_related('items').order_by('-created_at')
-        with path.open('w', newline='', encoding='utf-8') as f:
-            w = csv.writer(f)
-            w.writerow([
-                'id', 'created_at', 'status', 'customer_name', 'phone', 'address',
-                'total_price', 'discount_percent', 'has_subscription', 'items'
-            ])
-            for o in orders:
-                created = timezone.localtime(o.created_at).strftime('%Y-%m-%d %H:%M:%S')
-                items = '; '.join([f"{it.product_name} x{it.quantity}" for it in o.items.all()][:50])
-                w.writerow([
-                    o.id, created, o.status, o.customer_name, o.phone, o.address,
-                    str(o.total_price), o.discount_percent, int(o.has_subscription), items
-                ])
-        return str(path)
-
-    file_path = await _export()
-    await message.answer_document(FSInputFile(file_path), caption="📤 Экспорт заказов (CSV). Файл обновляется при каждом экспорте.")
+
+@router.message(Command("export"))
+async def admin_export_orders_filtered(message: Message, command: CommandObject):
+    if not await require_admin_message(message):
+        return
+    try:
+        filters = parse_export_args((command.args or '').split())
+    except ValueError as exc:
+        await message.answer(
+            f"{exc}.\n\n"
+            "Формат: /export [с YYYY-MM-DD] [по YYYY-MM-DD] [статусы] [gz]\n"
+            "Например: /export 2026-09-01 2026-09-30 completed gz"
+        )
+        return
+    await _send_orders_export(message, filters)
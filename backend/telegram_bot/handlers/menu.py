@@ -10,7 +10,9 @@ from aiogram.types import Message
 from asgiref.sync import sync_to_async
 from django.utils import timezone
 
-from catalog.models import Order, Review
+from catalog.customer_profiles import get_profile, user_has_completed_orders
+from catalog.order_archive import customer_orders
+from catalog.models import CustomerProfile, Order, Review
 
 from ..utils import format_money
 from ..keyboards import get_main_keyboard
@@ -35,15 +37,7 @@ async def show_promotions(message: Message):
         )
         return
 
-    last_order = await sync_to_async(
-        Order.objects.filter(telegram_user_id=user_id).order_by('-created_at').first
-    )()
-    phone_normalized = last_order.phone_normalized if last_order else ''
-    has_completed_orders = False
-    if phone_normalized:
-        has_completed_orders = await sync_to_async(
-            Order.objects.filter(phone_normalized=phone_normalized, status='completed').exists
-        )()
+    has_completed_orders = await sync_to_async(user_has_completed_orders)(user_id)
 
     if is_subscribed and not has_completed_orders:
         text = (
@@ -69,9 +63,11 @@ async def show_promotions(message: Message):
 @router.message(F.text == "🧾 Мои заказы")
 async def show_my_orders(message: Message):
     user_id = message.from_user.id
-    orders = await sync_to_async(list)(
-        Order.objects.filter(telegram_user_id=user_id).order_by('-created_at')[:10]
-    )
+    profile = await sync_to_async(get_profile)(CustomerProfile.KIND_TELEGRAM, user_id)
+    orders = []
+    if profile and profile.order_count:
+        # Давно закрытые заказы лежат в архиве: customer_orders читает обе таблицы.
+        orders = await sync_to_async(customer_orders)(user_id, 10)
 
     if not orders:
         await message.answer("У вас пока нет заказов.", reply_markup=get_main_keyboard())
@@ -98,8 +94,10 @@ async def show_my_orders(message: Message):
         lines.append(f"{status_icon} #{order.id} · {status_label} · {total} ₽ · {created_at}")
 
     text = "🧾 <b>Ваши заказы</b>\n\n" + "\n".join(lines)
-    if len(orders) == 10:
-        text += "\n\nПоказаны последние 10 заказов."
+    if profile.order_count > len(orders):
+        text += f"\n\nПоказаны последние {len(orders)} из {profile.order_count}."
+    if profile.completed_count:
+        text += f"\nПолучено заказов: {profile.completed_count} на {format_money(profile.lifetime_spend)} ₽."
 
     await message.answer(text, parse_mode=ParseMode.HTML)
 
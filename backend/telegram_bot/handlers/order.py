@@ -17,10 +17,12 @@ from aiogram.types import (
 )
 from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.db import transaction
 
-from catalog.models import Order, OrderItem, Product, normalize_phone
-from catalog.taxi_integration import TaxiDeliveryIntegration
+from catalog.models import Product, normalize_phone
+from catalog.customer_profiles import phone_has_completed_orders
+from catalog.delivery_quotes import DeliveryQuoteEngine
+from catalog.order_placement import OrderLine, place_order
+from catalog.order_state import OrderStateMachine
 from catalog.payments import (
     update_order_from_payment,
     create_payment_for_order,
@@ -29,11 +31,14 @@ from catalog.payments import (
     yookassa_enabled,
 )
 
-from ..constants import DELIVERY_MANUAL_NOTE, CARD_PAYMENT_MAINTENANCE_NOTE
+from ..constants import DELIVERY_MANUAL_NOTE, DELIVERY_PREVIEW_WAIT_SECONDS, CARD_PAYMENT_MAINTENANCE_NOTE
 from ..states import OrderStates, CustomBouquetStates, PreOrderStates
 from ..utils import to_decimal, format_money, parse_budget_value
 from ..keyboards import get_main_keyboard, get_quantity_keyboard, get_address_confirm_keyboard
-from ..services import check_user_subscription, get_promo_config, post_order_to_group
+from ..services import (
+    check_user_subscription, delivery_quote_preview, get_promo_config, peek_delivery_quote,
+    post_order_to_group, start_delivery_quote, take_delivery_quote,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -475,9 +480,7 @@ async def process_order_phone(message: Message, state: FSMContext):
 
     has_completed_orders = False
     if normalized_phone:
-        has_completed_orders = await sync_to_async(
-            Order.objects.filter(phone_normalized=normalized_phone, status='completed').exists
-        )()
+        has_completed_orders = await sync_to_async(phone_has_completed_orders)(normalized_phone)
 
     discount = discount_percent if promo_enabled and is_subscribed and not has_completed_orders else 0
 
@@ -525,14 +528,15 @@ async def process_order_address(message: Message, state: FSMContext):
     awaiting_confirmation = data.get('awaiting_address_confirmation', False)
 
     if message.location:
-        taxi_integration = TaxiDeliveryIntegration()
-        address_info = await sync_to_async(taxi_integration.reverse_geocode)(
+        address_info = await DeliveryQuoteEngine().reverse_geocode(
             message.location.latitude,
             message.location.longitude,
         )
 
         if address_info:
             address = address_info['formatted_address']
+            # Считаем доставку, пока покупатель подтверждает адрес.
+            start_delivery_quote(message.from_user.id, address)
             await state.update_data(address=address, awaiting_address_confirmation=True)
             await message.answer(
                 f"📍 <b>Адрес определен:</b>\n\n{address}\n\n"
@@ -570,6 +574,7 @@ async def process_order_address(message: Message, state: FSMContext):
         return
 
     address = message.text
+    start_delivery_quote(message.from_user.id, address)
     await state.update_data(address=address, awaiting_address_confirmation=False)
     await _ask_for_comment(message, state)
 
@@ -578,7 +583,16 @@ async def process_order_address(message: Message, state: FSMContext):
 
 async def _ask_for_comment(message: Message, state: FSMContext):
     await state.set_state(OrderStates.waiting_for_comment)
+    # Фиксированный тариф находится сразу; геокодер ждем недолго и не
+    # задерживаем следующий шаг — расчет доиграет в фоне.
+    address = (await state.get_data()).get('address', '')
+    quote = await peek_delivery_quote(message.from_user.id, address, wait=DELIVERY_PREVIEW_WAIT_SECONDS)
+    preview = ""
+    if quote:
+        await state.update_data(delivery_quote={**quote, 'address': address})
+        preview = delivery_quote_preview(quote) + "\n\n"
     await message.answer(
+        f"{preview}"
         "💬 <b>Шаг 4/4:</b> Добавьте комментарий к заказу\n\n"
         "(пожелания, время доставки и т.д.)\n\n"
         "<i>Или отправьте /skip чтобы пропустить</i>",
@@ -638,20 +652,12 @@ async def _create_order(message: Message, state: FSMContext):
         product_name = data.get('product_name', 'Букет')
         if not is_custom:
             product = await sync_to_async(Product.objects.get)(id=product_id)
-            product_name = await sync_to_async(lambda: product.name)()
+            product_name = product.name
 
         is_subscribed = await check_user_subscription(user.id)
 
-        shop_address = getattr(
-            settings, 'SHOP_ADDRESS',
-            "Трактовая улица, 78А, село Раевский, Альшеевский район, Республика Башкортостан, 452120",
-        )
-        taxi_integration = TaxiDeliveryIntegration()
-        delivery_info = await sync_to_async(taxi_integration.calculate_delivery_cost)(
-            from_address=shop_address,
-            to_address=address,
-            order_weight=1,
-        )
+        # Расчет начат еще на шаге адреса; здесь только забираем результат.
+        delivery_info = await take_delivery_quote(user.id, address, prefetched=data.get('delivery_quote'))
 
         delivery_manual_required = bool(delivery_info.get('requires_manual_price'))
         delivery_cost = to_decimal(delivery_info['cost'])
@@ -671,7 +677,7 @@ async def _create_order(message: Message, state: FSMContext):
             else:
                 discount = 0
         else:
-            product_price_raw = to_decimal(await sync_to_async(lambda: product.price)())
+            product_price_raw = to_decimal(product.price)
             products_subtotal_raw = (product_price_raw * Decimal(order_quantity)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
             discount_ratio = (Decimal('100') - Decimal(discount)) / Decimal('100')
             product_price = (products_subtotal_raw * discount_ratio).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
@@ -700,67 +706,53 @@ async def _create_order(message: Message, state: FSMContext):
             )
         order_comment = "\n\n".join(comment_parts).strip()
 
-        @sync_to_async
-        def create_order_in_db():
-            with transaction.atomic():
-                order = Order.objects.create(
-                    telegram_user_id=user.id,
-                    telegram_username=user.username or '',
-                    customer_name=name,
-                    phone=phone,
-                    address=address,
-                    comment=order_comment,
-                    is_preorder=is_preorder,
-                    requested_delivery=requested_delivery,
-                    items_subtotal=product_price,
-                    delivery_price=delivery_cost,
-                    total_price=final_price,
-                    discount_percent=discount,
-                    has_subscription=is_subscribed,
-                    payment_method='transfer' if use_transfer_payment else 'online',
-                )
-                OrderItem.objects.create(
-                    order=order,
-                    product=product,
-                    product_name=product_name,
-                    price=product_price_raw,
-                    quantity=1 if is_custom else order_quantity,
-                )
-                return order
-
-        order = await create_order_in_db()
+        # Заказ и позиции — одна транзакция; дальше работаем с этим объектом.
+        order, items = await sync_to_async(place_order)(
+            [OrderLine(product, product_name, product_price_raw, 1 if is_custom else order_quantity)],
+            telegram_user_id=user.id,
+            telegram_username=user.username or '',
+            customer_name=name,
+            phone=phone,
+            address=address,
+            comment=order_comment,
+            is_preorder=is_preorder,
+            requested_delivery=requested_delivery,
+            items_subtotal=product_price,
+            delivery_price=delivery_cost,
+            total_price=final_price,
+            discount_percent=discount,
+            has_subscription=is_subscribed,
+            payment_method='transfer' if use_transfer_payment else 'online',
+        )
 
         payment_url = ''
         has_yookassa = yookassa_enabled()
         if not use_transfer_payment and is_preorder and final_price > 0 and not delivery_manual_required:
+            # update_order_from_payment и update_payment обновляют сам объект `order`.
             @sync_to_async
-            def _prepare_payment() -> tuple[str, str]:
-                db_order = Order.objects.get(pk=order.id)
-                current_payment_url = db_order.payment_url or ''
+            def _prepare_payment() -> str:
+                current_payment_url = order.payment_url or ''
 
                 if not current_payment_url and has_yookassa:
                     payment = create_payment_for_order(
-                        order=db_order,
-                        amount=db_order.total_price,
-                        description=f"Предзаказ #{db_order.id}",
+                        order=order,
+                        amount=order.total_price,
+                        description=f"Предзаказ #{order.id}",
                         return_url=get_return_url(),
                     )
                     if payment:
-                        _, current_payment_url = update_order_from_payment(db_order, payment)
+                        _, current_payment_url = update_order_from_payment(order, payment)
 
                 if not current_payment_url:
-                    current_payment_url = get_manual_payment_url(db_order) or ''
+                    current_payment_url = get_manual_payment_url(order) or ''
                     if current_payment_url:
-                        db_order.payment_url = current_payment_url
-                        if db_order.payment_status == 'not_paid':
-                            db_order.payment_status = 'pending'
-                        db_order.save(update_fields=['payment_url', 'payment_status', 'updated_at'])
+                        OrderStateMachine.update_payment(
+                            order, 'pending', only_from={'not_paid'}, payment_url=current_payment_url,
+                        )
 
-                return db_order.payment_status, current_payment_url
+                return current_payment_url
 
-            _, payment_url = await _prepare_payment()
-            if payment_url:
-                order = await sync_to_async(Order.objects.get)(pk=order.id)
+            payment_url = await _prepare_payment()
 
         if is_custom:
             response_text = "✅ <b>Заявка на индивидуальный букет принята!</b>\n\n"
@@ -835,7 +827,7 @@ async def _create_order(message: Message, state: FSMContext):
                 "Это безопасно: платеж идет напрямую магазину, а подтверждение оплаты вы получите в чате."
             )
 
-        await post_order_to_group(order.id)
+        await post_order_to_group(order, items)
 
     except Exception as e:
         logger.error("Ошибка создания заказа: %s", e)
@@ -36,7 +36,7 @@ def get_main_keyboard() -> ReplyKeyboardMarkup:
 def get_admin_keyboard() -> ReplyKeyboardMarkup:
     keyboard = [
         [KeyboardButton(text="📦 Заказы"), KeyboardButton(text="📤 Экспорт заказов")],
-        [KeyboardButton(text="🔙 Выйти")]
+        [KeyboardButton(text="📊 Продажи"), KeyboardButton(text="🔙 Выйти")]
     ]
     return ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
 
@@ -4,19 +4,25 @@ Shared business logic for the Telegram bot.
 This module contains helpers that are used across multiple handler modules:
 subscription checks, admin checks, file downloads, order posting, etc.
 """
+import asyncio
+import hashlib
 import html
 import logging
 import os
+import time
+from collections import OrderedDict
 from decimal import Decimal, ROUND_HALF_UP
 
 from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.db.models import Q
+from django.utils import timezone
 
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.enums import ChatMemberStatus
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
+from catalog.delivery_quotes import DeliveryQuoteEngine
 from catalog.models import (
     BotAdmin,
     Order,
@@ -24,9 +30,10 @@ from catalog.models import (
     SiteSettings,
     TransferPaymentTemplate,
 )
+from catalog.order_state import TERMINAL_STATUSES, OrderStateMachine
 
 from .globals import get_bot, get_channel_id, get_group_id
-from .constants import DELIVERY_MANUAL_NOTE, CARD_PAYMENT_MAINTENANCE_NOTE
+from .constants import DELIVERY_MANUAL_NOTE, CARD_PAYMENT_MAINTENANCE_NOTE, ORDER_GROUP_REFRESH_DELAY_SECONDS
 from .utils import (
     to_decimal, format_money,
     order_status_title, payment_status_label, payment_method_label,
@@ -158,6 +165,86 @@ async def download_telegram_file_bytes(file_id: str) -> tuple[bytes | None, str
         return None, None
 
 
+# ── Delivery quotes ──────────────────────────────────────────────
+
+# Расчет доставки запускается, как только пришел адрес, и идет, пока
+# покупатель пишет комментарий. Задачи живут в памяти процесса (в FSM их не
+# сохранить), поэтому _create_order при промахе просто считает заново.
+_delivery_quotes: dict[int, tuple[str, asyncio.Task, float]] = {}
+_DELIVERY_QUOTE_KEEP_SECONDS = 30 * 60
+
+
+def get_shop_address() -> str:
+    return getattr(
+        settings, 'SHOP_ADDRESS',
+        "Трактовая улица, 78А, село Раевский, Альшеевский район, Республика Башкортостан, 452120",
+    )
+
+
+def _prune_delivery_quotes() -> None:
+    threshold = time.monotonic() - _DELIVERY_QUOTE_KEEP_SECONDS
+    for user_id, (_address, task, started_at) in list(_delivery_quotes.items()):
+        if started_at < threshold:
+            task.cancel()
+            del _delivery_quotes[user_id]
+
+
+def start_delivery_quote(user_id: int, address: str) -> asyncio.Task:
+    """Запустить расчет доставки в фоне (повторный вызов с тем же адресом — та же задача)."""
+    current = _delivery_quotes.get(user_id)
+    if current and current[0] == address and not current[1].cancelled():
+        return current[1]
+    if current:
+        current[1].cancel()
+    _prune_delivery_quotes()
+    task = asyncio.create_task(
+        DeliveryQuoteEngine().quote(from_address=get_shop_address(), to_address=address, order_weight=1)
+    )
+    _delivery_quotes[user_id] = (address, task, time.monotonic())
+    return task
+
+
+async def peek_delivery_quote(user_id: int, address: str, wait: float = 0.0) -> dict | None:
+    """Результат фонового расчета, если он готов (или успел за `wait` секунд)."""
+    current = _delivery_quotes.get(user_id)
+    if not current or current[0] != address:
+        return None
+    task = current[1]
+    if not task.done() and wait > 0:
+        await asyncio.wait({task}, timeout=wait)
+    if not task.done() or task.cancelled() or task.exception() is not None:
+        return None
+    return task.result()
+
+
+async def take_delivery_quote(user_id: int, address: str, prefetched: dict | None = None) -> dict:
+    """
+    Результат для адреса: уже сохраненный в FSM (`prefetched`), фоновой
+    задачи или, если ни того ни другого нет, новый расчет.
+    """
+    current = _delivery_quotes.pop(user_id, None)
+    if prefetched and prefetched.get('address') == address:
+        if current and not current[1].done():
+            current[1].cancel()
+        return prefetched
+    if current and current[0] == address and not current[1].cancelled():
+        try:
+            return await current[1]
+        except Exception as exc:
+            logger.warning("Фоновый расчет доставки до %s завершился ошибкой: %s", address, exc)
+    elif current:
+        current[1].cancel()
+    return await DeliveryQuoteEngine().quote(
+        from_address=get_shop_address(), to_address=address, order_weight=1,
+    )
+
+
+def delivery_quote_preview(quote: dict) -> str:
+    if quote.get('requires_manual_price'):
+        return "🚗 Доставка: стоимость уточним вручную менеджером"
+    return f"🚗 Доставка: {format_money(to_decimal(quote['cost']))} ₽"
+
+
 # ── Orders chat helpers ──────────────────────────────────────────
 
 def get_orders_chat_id() -> str:
@@ -247,12 +334,21 @@ def build_order_group_keyboard(order: Order) -> InlineKeyboardMarkup | None:
 
 # ── Build / post / refresh order in group chat ───────────────────
 
-async def build_order_group_message(order_id: int) -> tuple[str, InlineKeyboardMarkup | None]:
+async def build_order_group_message(
+    order_or_id: Order | int,
+    items: list[OrderItem] | None = None,
+) -> tuple[str, InlineKeyboardMarkup | None]:
+    """Текст и кнопки заказа для служебного чата.
+
+    Можно передать уже загруженный заказ и его позиции (например, из
+    place_order) — тогда заказ не перечитывается.
+    """
     @sync_to_async
     def _fetch():
-        order = Order.objects.prefetch_related('items').get(pk=order_id)
-        items = list(order.items.all())
-        return order, items
+        if isinstance(order_or_id, Order):
+            return order_or_id, items if items is not None else list(order_or_id.items.all())
+        order = Order.objects.prefetch_related('items').get(pk=order_or_id)
+        return order, list(order.items.all())
 
     order, items = await _fetch()
     customer_name = html.escape((order.customer_name or '').strip() or 'Без имени')
@@ -312,14 +408,15 @@ async def build_order_group_message(order_id: int) -> tuple[str, InlineKeyboardM
     return text.strip(), build_order_group_keyboard(order)
 
 
-async def post_order_to_group(order_id: int) -> None:
+async def post_order_to_group(order_or_id: Order | int, items: list[OrderItem] | None = None) -> None:
     orders_chat_id = get_orders_chat_id()
     bot = get_bot()
     if not orders_chat_id or not bot:
         return
 
+    order_id = order_or_id.id if isinstance(order_or_id, Order) else order_or_id
     try:
-        text, keyboard = await build_order_group_message(order_id)
+        text, keyboard = await build_order_group_message(order_or_id, items)
         sent = await bot.send_message(
             chat_id=orders_chat_id,
             text=text,
@@ -327,39 +424,85 @@ async def post_order_to_group(order_id: int) -> None:
             disable_web_page_preview=True,
         )
 
+        binding = {'service_chat_id': str(orders_chat_id), 'service_message_id': int(sent.message_id)}
+
         @sync_to_async
         def _bind():
-            order = Order.objects.get(pk=order_id)
-            order.service_chat_id = str(orders_chat_id)
-            order.service_message_id = int(sent.message_id)
-            order.save(update_fields=['service_chat_id', 'service_message_id', 'updated_at', 'phone_normalized'])
+            # Один UPDATE вместо чтения заказа и save().
+            Order.objects.filter(pk=order_id).update(updated_at=timezone.now(), **binding)
 
         await _bind()
+        _remember_group_message(order_id, sent.message_id, _group_message_hash(text, keyboard))
+        if isinstance(order_or_id, Order):
+            for name, value in binding.items():
+                setattr(order_or_id, name, value)
     except Exception as exc:
         logger.warning("Не удалось отправить заказ #%s в служебный чат: %s", order_id, exc)
 
 
+# Обновления служебного сообщения откладываются на ORDER_GROUP_REFRESH_DELAY_SECONDS
+# и схлопываются по заказу: серия действий (взять, реквизиты, оплачен) дает
+# одно чтение заказа и один edit_message_text. Хэш последнего отправленного
+# текста с кнопками хранится в памяти; если он не изменился, edit не нужен.
+_group_refreshes: dict[int, asyncio.Task] = {}
+_group_message_hashes: OrderedDict[int, tuple[int, str]] = OrderedDict()
+_GROUP_MESSAGE_HASHES_LIMIT = 2048
+
+
+def _group_message_hash(text: str, keyboard: InlineKeyboardMarkup | None) -> str:
+    payload = text + '\n' + (keyboard.model_dump_json(exclude_none=True) if keyboard else '')
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _remember_group_message(order_id: int, message_id: int, digest: str) -> None:
+    _group_message_hashes[order_id] = (int(message_id), digest)
+    _group_message_hashes.move_to_end(order_id)
+    while len(_group_message_hashes) > _GROUP_MESSAGE_HASHES_LIMIT:
+        _group_message_hashes.popitem(last=False)
+
+
 async def refresh_order_group_message(order_id: int) -> None:
+    """Запланировать обновление служебного сообщения заказа и сразу вернуться.
+
+    Если обновление этого заказа уже ждет своей очереди, новое не создается:
+    отложенное прочитает заказ уже после всех изменений.
+    """
+    if not get_bot():
+        return
+    pending = _group_refreshes.get(order_id)
+    if pending and not pending.done():
+        return
+    _group_refreshes[order_id] = asyncio.create_task(_refresh_order_group_message_later(order_id))
+
+
+async def _refresh_order_group_message_later(order_id: int) -> None:
+    await asyncio.sleep(ORDER_GROUP_REFRESH_DELAY_SECONDS)
+    # Снимаем отметку до чтения заказа: изменения после этого момента
+    # запланируют следующее обновление.
+    _group_refreshes.pop(order_id, None)
+    try:
+        await refresh_order_group_message_now(order_id)
+    except Exception as exc:
+        logger.warning("Не удалось обновить сообщение заказа #%s: %s", order_id, exc)
+
+
+async def refresh_order_group_message_now(order_id: int) -> None:
     bot = get_bot()
     if not bot:
         return
 
-    @sync_to_async
-    def _meta():
-        order = Order.objects.filter(pk=order_id).first()
-        if not order:
-            return None, None
-        return order.service_chat_id, order.service_message_id
-
-    service_chat_id, service_message_id = await _meta()
-    if not service_chat_id or not service_message_id:
+    order = await sync_to_async(Order.objects.prefetch_related('items').filter(pk=order_id).first)()
+    if not order or not order.service_chat_id or not order.service_message_id:
         return
 
-    text, keyboard = await build_order_group_message(order_id)
+    text, keyboard = await build_order_group_message(order)
+    digest = _group_message_hash(text, keyboard)
+    if _group_message_hashes.get(order_id) == (order.service_message_id, digest):
+        return
     try:
         await bot.edit_message_text(
-            chat_id=service_chat_id,
-            message_id=service_message_id,
+            chat_id=order.service_chat_id,
+            message_id=order.service_message_id,
             text=text,
             reply_markup=keyboard,
             disable_web_page_preview=True,
@@ -367,13 +510,17 @@ async def refresh_order_group_message(order_id: int) -> None:
     except TelegramBadRequest as exc:
         msg = str(exc).lower()
         if "message is not modified" in msg:
+            _remember_group_message(order_id, order.service_message_id, digest)
             return
         if "message to edit not found" in msg or "can't be edited" in msg:
-            await post_order_to_group(order_id)
+            await post_order_to_group(order)
             return
         logger.warning("Не удалось отредактировать служебное сообщение заказа #%s: %s", order_id, exc)
+        return
     except Exception as exc:
         logger.warning("Не удалось обновить сообщение заказа #%s: %s", order_id, exc)
+        return
+    _remember_group_message(order_id, order.service_message_id, digest)
 
 
 # ── Transfer template ────────────────────────────────────────────
@@ -388,13 +535,10 @@ def apply_current_transfer_template(order_id: int) -> tuple[bool, str]:
     if not template:
         return False, "Нет активного шаблона реквизитов. Добавьте его в админке."
 
-    order.transfer_details = (template.details or '').strip()
-    order.payment_method = 'transfer'
-    update_fields = ['transfer_details', 'payment_method', 'updated_at', 'phone_normalized']
-    if order.payment_status == 'not_paid':
-        order.payment_status = 'pending'
-        update_fields.append('payment_status')
-    order.save(update_fields=update_fields)
+    OrderStateMachine.update_payment(
+        order, 'pending', only_from={'not_paid'},
+        transfer_details=(template.details or '').strip(), payment_method='transfer',
+    )
     return True, template.name
 
 
@@ -421,83 +565,62 @@ async def notify_customer_transfer_details(order_id: int) -> None:
 
 # ── Order group actions ──────────────────────────────────────────
 
+# action -> (статус, из каких статусов, запрет для оплаченного, ответ, отказ).
+# None — любые статусы, из которых переход разрешает OrderStateMachine.
+GROUP_STATUS_ACTIONS = {
+    'take': ('processing', {'new'}, False, "Взято в работу", "Заказ уже взят в работу"),
+    'complete': (
+        'completed', {'processing', 'ready'}, False, "Заказ завершен", "Нельзя завершить заказ в текущем статусе",
+    ),
+    'cancel': ('cancelled', None, False, "Заказ отменен", "Нельзя отменить заказ в текущем статусе"),
+    'expire': ('expired', None, True, "Заказ помечен как expired", "Нельзя пометить заказ как expired"),
+}
+
+
 async def apply_group_order_action(
     order_id: int,
     action: str,
     actor_id: int,
     actor_username: str | None,
 ) -> tuple[bool, str]:
-    from django.utils import timezone
-
-    terminal = {'completed', 'cancelled', 'expired'}
-
     @sync_to_async
     def _apply() -> tuple[bool, str]:
-        try:
-            order = Order.objects.get(pk=order_id)
-        except Order.DoesNotExist:
-            return False, "Заказ не найден"
-
-        if order.status in terminal:
-            return False, "Заказ уже закрыт"
-
-        update_fields = ['updated_at', 'phone_normalized']
-        actor_username_clean = (actor_username or '').strip().lstrip('@')
-
-        if action == 'take':
-            if order.status != 'new':
-                return False, "Заказ уже взят в работу"
-            order.status = 'processing'
-            order.processing_by_user_id = actor_id
-            order.processing_by_username = actor_username_clean
-            update_fields.extend(['status', 'processing_by_user_id', 'processing_by_username'])
-            order.save(update_fields=update_fields)
-            return True, "Взято в работу"
-
         if action == 'ready':
             return False, "Для статуса «Готов» нужно загрузить фото букета"
 
-        if action == 'complete':
-            if order.status not in {'processing', 'ready'}:
-                return False, "Нельзя завершить заказ в текущем статусе"
-            order.status = 'completed'
-            update_fields.append('status')
-            order.save(update_fields=update_fields)
-            return True, "Заказ завершен"
-
-        if action == 'cancel':
-            order.status = 'cancelled'
-            update_fields.append('status')
-            order.save(update_fields=update_fields)
-            return True, "Заказ отменен"
-
-        if action == 'expire':
-            if order.payment_status == 'succeeded':
-                return False, "Заказ уже оплачен"
-            order.status = 'expired'
-            update_fields.append('status')
-            order.save(update_fields=update_fields)
-            return True, "Заказ помечен как expired"
+        if action in GROUP_STATUS_ACTIONS:
+            target, sources, unless_paid, success, refusal = GROUP_STATUS_ACTIONS[action]
+            values = None
+            if target == 'processing':
+                values = {
+                    'processing_by_user_id': actor_id,
+                    'processing_by_username': (actor_username or '').strip().lstrip('@'),
+                }
+            result = OrderStateMachine.transition(
+                order_id, target, sources=sources, unless_paid=unless_paid, values=values, refusal=refusal,
+            )
+            return result.ok, success if result.ok else result.message
+
+        if action not in {'paid', 'unpaid'}:
+            return False, "Неизвестное действие"
+
+        order = Order.objects.filter(pk=order_id).first()
+        if order is None:
+            return False, "Заказ не найден"
+        if order.status in TERMINAL_STATUSES:
+            return False, "Заказ уже закрыт"
 
         if action == 'paid':
-            if order.payment_status == 'succeeded':
+            if order.payment_status == 'succeeded' or not OrderStateMachine.update_payment(
+                order, 'succeeded', payment_method=order.payment_method or 'transfer', paid_at=timezone.now(),
+            ):
                 return False, "Оплата уже отмечена"
-            order.payment_status = 'succeeded'
-            order.payment_method = order.payment_method or 'transfer'
-            order.paid_at = timezone.now()
-            update_fields.extend(['payment_status', 'payment_method', 'paid_at'])
-            order.save(update_fields=update_fields)
             return True, "Оплата отмечена"
 
-        if action == 'unpaid':
-            if order.payment_status == 'not_paid':
-                return False, "Заказ уже в статусе «не оплачен»"
-            order.payment_status = 'not_paid'
-            order.paid_at = None
-            update_fields.extend(['payment_status', 'paid_at'])
-            order.save(update_fields=update_fields)
-            return True, "Оплата сброшена"
-
-        return False, "Неизвестное действие"
+        if order.payment_status == 'not_paid' or not OrderStateMachine.update_payment(
+            order, 'not_paid', paid_at=None,
+        ):
+            return False, "Заказ уже в статусе «не оплачен»"
+        return True, "Оплата сброшена"
 
     return await _apply()
@@ -0,0 +1,57 @@
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+from django.test import TestCase, override_settings
+
+from catalog.models import Order
+from catalog.order_placement import OrderLine, place_order
+
+from .services import apply_group_order_action, build_order_group_message
+
+
+@override_settings(TELEGRAM_BOT_TOKEN='')
+class GroupOrderActionTests(TestCase):
+    def _order(self, status):
+        return Order.objects.create(
+            telegram_user_id=1, customer_name='Тест', phone='+79000000000', address='ул. Тестовая',
+            total_price=Decimal('1500'), status=status,
+        )
+
+    def _apply(self, order, action):
+        return async_to_sync(apply_group_order_action)(order.id, action, 42, 'manager')
+
+    def test_complete_refused_for_new_order(self):
+        order = self._order('new')
+        self.assertEqual(self._apply(order, 'complete'), (False, "Нельзя завершить заказ в текущем статусе"))
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'new')
+
+    def test_complete_refused_for_legacy_statuses(self):
+        for status in ('confirmed', 'in_progress', 'delivering'):
+            order = self._order(status)
+            self.assertEqual(self._apply(order, 'complete'), (False, "Нельзя завершить заказ в текущем статусе"))
+            order.refresh_from_db()
+            self.assertEqual(order.status, status)
+
+    def test_complete_allowed_from_processing_and_ready(self):
+        for status in ('processing', 'ready'):
+            order = self._order(status)
+            self.assertEqual(self._apply(order, 'complete'), (True, "Заказ завершен"))
+            order.refresh_from_db()
+            self.assertEqual(order.status, 'completed')
+
+
+@override_settings(TELEGRAM_BOT_TOKEN='')
+class OrderPlacementTests(TestCase):
+    def test_group_message_built_from_placed_order_without_queries(self):
+        order, items = place_order(
+            [OrderLine(None, 'Розы', Decimal('1500'), 2)],
+            telegram_user_id=1, customer_name='Тест', phone='+79000000000', address='ул. Тестовая',
+            items_subtotal=Decimal('3000'), total_price=Decimal('3000'),
+        )
+        self.assertEqual([(item.product_name, item.quantity) for item in items], [('Розы', 2)])
+        self.assertEqual(list(order.items.values_list('id', flat=True)), [items[0].id])
+
+        with self.assertNumQueries(0):
+            text, _keyboard = async_to_sync(build_order_group_message)(order, items)
+        self.assertIn('Розы', text)
@@ -46,6 +46,37 @@ function resolveMediaUrl(value) {
   }
 }
 
+// Карточки занимают колонку сетки: на мобильных почти всю ширину экрана.
+const CARD_IMAGE_SIZES = '(max-width: 640px) 90vw, (max-width: 1024px) 45vw, 400px';
+
+// srcset из карты {формат: {ширина: url}}, которую отдает API
+function buildSrcset(srcsetMap, format) {
+  const variants = srcsetMap && srcsetMap[format];
+  if (!variants) return '';
+  return Object.entries(variants)
+    .filter(([, url]) => url)
+    .sort(([a], [b]) => Number(a) - Number(b))
+    .map(([width, url]) => `${resolveMediaUrl(url)} ${width}w`)
+    .join(', ');
+}
+
+function largestVariantUrl(srcsetMap, format) {
+  const variants = srcsetMap && srcsetMap[format];
+  if (!variants) return '';
+  const widths = Object.keys(variants).map(Number).sort((a, b) => b - a);
+  return widths.length ? resolveMediaUrl(variants[String(widths[0])]) : '';
+}
+
+function renderPictureSource(srcsetMap, sizes) {
+  const webp = buildSrcset(srcsetMap, 'webp');
+  return webp ? `<source type="image/webp" srcset="${escapeHtml(webp)}" sizes="${sizes}">` : '';
+}
+
+function renderImgSrcset(srcsetMap, sizes) {
+  const jpeg = buildSrcset(srcsetMap, 'jpeg');
+  return jpeg ? `srcset="${escapeHtml(jpeg)}" sizes="${sizes}"` : '';
+}
+
 // Global settings cache
 let siteSettings = {
   telegram_bot_link: 'https://t.me/flowersraevka_bot'
@@ -483,6 +514,12 @@ function renderHero(hero) {
   const heroBg = document.querySelector('.hero-bg');
   if (heroBg && hero.image) {
     heroBg.style.backgroundImage = `url('${resolveMediaUrl(hero.image)}')`;
+    const heroWebp = largestVariantUrl(hero.image_srcset, 'webp');
+    const heroJpeg = largestVariantUrl(hero.image_srcset, 'jpeg');
+    if (heroWebp && heroJpeg) {
+      // Браузеры без image-set() проигнорируют значение и оставят оригинал.
+      heroBg.style.backgroundImage = `image-set(url('${heroWebp}') type('image/webp'), url('${heroJpeg}') type('image/jpeg'))`;
+    }
   }
   
   const heroBenefits = document.querySelector('.hero-benefits');
@@ -535,12 +572,16 @@ function renderCategories(categories) {
   
   container.innerHTML = categories.map((cat, index) => `
     <a class="card category-card category-link" href="catalog.html?category=${encodeURIComponent(cat.id)}" aria-label="Открыть категорию ${escapeHtml(cat.name)}">
-      <img
-        src="${cat.image ? escapeHtml(resolveMediaUrl(cat.image)) : 'https://via.placeholder.com/400x300?text=' + encodeURIComponent(cat.name || '')}"
-        alt="${escapeHtml(cat.name)}"
-        loading="${index < 2 ? 'eager' : 'lazy'}"
-        decoding="async"
-      >
+      <picture>
+        ${renderPictureSource(cat.image_srcset, CARD_IMAGE_SIZES)}
+        <img
+          src="${cat.image ? escapeHtml(resolveMediaUrl(cat.image)) : 'https://via.placeholder.com/400x300?text=' + encodeURIComponent(cat.name || '')}"
+          ${renderImgSrcset(cat.image_srcset, CARD_IMAGE_SIZES)}
+          alt="${escapeHtml(cat.name)}"
+          loading="${index < 2 ? 'eager' : 'lazy'}"
+          decoding="async"
+        >
+      </picture>
       <h3>${escapeHtml(cat.name)}</h3>
       <p>${escapeHtml(cat.description || '')}</p>
     </a>
@@ -595,7 +636,7 @@ function renderReviews(reviews) {
       <article class="card review-card">
         <div class="review-head">
           ${avatar
-            ? `<img class="review-avatar" src="${avatar}" alt="${author}">`
+            ? `<img class="review-avatar" src="${avatar}" ${renderImgSrcset(review.avatar_srcset, '44px')} alt="${author}">`
             : `<div class="review-avatar review-avatar-fallback" aria-hidden="true">${escapeHtml(initial)}</div>`
           }
           <div class="review-head-text">
@@ -644,13 +685,17 @@ function renderProducts(products, containerSelector) {
     return `
     <article class="card product-card">
       <div class="product-photo">
-        <img
-          src="${resolvedImageUrl}"
-          alt="${productName}"
-          loading="${index < 3 ? 'eager' : 'lazy'}"
-          decoding="async"
-          fetchpriority="${index === 0 ? 'high' : 'auto'}"
-        >
+        <picture>
+          ${renderPictureSource(product.image_srcset, CARD_IMAGE_SIZES)}
+          <img
+            src="${resolvedImageUrl}"
+            ${renderImgSrcset(product.image_srcset, CARD_IMAGE_SIZES)}
+            alt="${productName}"
+            loading="${index < 3 ? 'eager' : 'lazy'}"
+            decoding="async"
+            fetchpriority="${index === 0 ? 'high' : 'auto'}"
+          >
+        </picture>
       </div>
       <h3>${productName}</h3>
       <p class="product-desc">${productDesc}</p>